@@ -0,0 +1,40 @@
+"""Add append-only response event log
+
+Revision ID: 002_response_events
+Revises: 001_learning_models
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '002_response_events'
+down_revision = '001_learning_models'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'response_event',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('test_id', sa.String(36), sa.ForeignKey('test.id'), nullable=False),
+        sa.Column('concept_id', sa.String(), nullable=False),
+        sa.Column('question_id', sa.String(36)),
+        sa.Column('is_correct', sa.Boolean(), nullable=False),
+        sa.Column('time_taken_seconds', sa.Float(), nullable=False),
+        sa.Column('had_hint', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('answered_at', sa.DateTime(), nullable=False),
+        sa.Column('recorded_at', sa.DateTime(timezone=True), server_default=sa.func.now())
+    )
+    op.create_index(
+        'ix_response_event_test_concept_id',
+        'response_event',
+        ['test_id', 'concept_id', 'id']
+    )
+
+
+def downgrade():
+    op.drop_index('ix_response_event_test_concept_id', table_name='response_event')
+    op.drop_table('response_event')
@@ -0,0 +1,35 @@
+"""Add due-review indexes to mastery_record
+
+Revision ID: 003_mastery_review_indexes
+Revises: 002_response_events
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '003_mastery_review_indexes'
+down_revision = '002_response_events'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_mastery_record_test_review_due',
+        'mastery_record',
+        ['test_id', 'next_review_due']
+    )
+    op.create_index(
+        'ix_mastery_record_review_pending',
+        'mastery_record',
+        ['next_review_due'],
+        postgresql_where=sa.text('needs_review = false'),
+        sqlite_where=sa.text('needs_review = 0')
+    )
+
+
+def downgrade():
+    op.drop_index('ix_mastery_record_review_pending', table_name='mastery_record')
+    op.drop_index('ix_mastery_record_test_review_due', table_name='mastery_record')
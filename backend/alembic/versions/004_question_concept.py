@@ -0,0 +1,55 @@
+"""Add question_concept association table
+
+Revision ID: 004_question_concept
+Revises: 003_mastery_review_indexes
+Create Date: 2026-10-18
+
+"""
+import json
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '004_question_concept'
+down_revision = '003_mastery_review_indexes'
+branch_labels = None
+depends_on = None
+
+# Questions without a difficulty_score are indexed at grade level
+DEFAULT_DIFFICULTY = 0.5
+
+
+def upgrade():
+    question_concept = op.create_table(
+        'question_concept',
+        sa.Column('question_id', sa.String(36), sa.ForeignKey('question.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('concept_id', sa.String(), primary_key=True),
+        sa.Column('difficulty_score', sa.Float(), nullable=False),
+    )
+    op.create_index(
+        'ix_question_concept_concept_difficulty',
+        'question_concept',
+        ['concept_id', 'difficulty_score', 'question_id']
+    )
+
+    # Backfill from the JSON column
+    conn = op.get_bind()
+    rows = []
+    for question_id, concept_ids, difficulty in conn.execute(
+        sa.text('SELECT id, concept_ids, difficulty_score FROM question WHERE concept_ids IS NOT NULL')
+    ):
+        if isinstance(concept_ids, str):
+            concept_ids = json.loads(concept_ids)
+        for concept_id in dict.fromkeys(concept_ids or []):
+            rows.append({
+                'question_id': question_id,
+                'concept_id': concept_id,
+                'difficulty_score': DEFAULT_DIFFICULTY if difficulty is None else difficulty,
+            })
+    if rows:
+        op.bulk_insert(question_concept, rows)
+
+
+def downgrade():
+    op.drop_index('ix_question_concept_concept_difficulty', table_name='question_concept')
+    op.drop_table('question_concept')
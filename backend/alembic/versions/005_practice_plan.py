@@ -0,0 +1,29 @@
+"""Add precomputed practice plan table
+
+Revision ID: 005_practice_plan
+Revises: 004_question_concept
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '005_practice_plan'
+down_revision = '004_question_concept'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'practice_plan',
+        sa.Column('test_id', sa.String(36), sa.ForeignKey('test.id'), primary_key=True),
+        sa.Column('items', sa.JSON(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=False),
+        sa.Column('source_updated_at', sa.DateTime())
+    )
+
+
+def downgrade():
+    op.drop_table('practice_plan')
@@ -0,0 +1,39 @@
+"""Add per-session attempt counters
+
+Revision ID: 006_attempt_counter
+Revises: 005_practice_plan
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '006_attempt_counter'
+down_revision = '005_practice_plan'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'attempt_counter',
+        sa.Column('test_id', sa.String(36), sa.ForeignKey('test.id'), primary_key=True),
+        sa.Column('session_hash', sa.String(), primary_key=True),
+        sa.Column('attempts_used', sa.Integer(), nullable=False, server_default='0')
+    )
+
+    # Continue numbering after the highest attempt each session already has
+    op.execute(
+        """
+        INSERT INTO attempt_counter (test_id, session_hash, attempts_used)
+        SELECT test_id, session_hash, MAX(attempt_number)
+        FROM exam_attempt
+        WHERE session_hash IS NOT NULL
+        GROUP BY test_id, session_hash
+        """
+    )
+
+
+def downgrade():
+    op.drop_table('attempt_counter')
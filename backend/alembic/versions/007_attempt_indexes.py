@@ -0,0 +1,38 @@
+"""Add access-control indexes to exam_attempt and attempt_request
+
+Revision ID: 007_attempt_indexes
+Revises: 006_attempt_counter
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers
+revision = '007_attempt_indexes'
+down_revision = '006_attempt_counter'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_exam_attempt_test_session',
+        'exam_attempt',
+        ['test_id', 'session_hash', 'is_completed', 'score']
+    )
+    # Superseded: no query filters on session_hash without test_id
+    op.drop_index('ix_exam_attempt_session_hash', table_name='exam_attempt')
+    op.create_index(
+        'ix_attempt_request_pending',
+        'attempt_request',
+        ['created_at'],
+        postgresql_where=sa.text("status = 'pending'"),
+        sqlite_where=sa.text("status = 'pending'")
+    )
+
+
+def downgrade():
+    op.drop_index('ix_attempt_request_pending', table_name='attempt_request')
+    op.create_index('ix_exam_attempt_session_hash', 'exam_attempt', ['session_hash'])
+    op.drop_index('ix_exam_attempt_test_session', table_name='exam_attempt')
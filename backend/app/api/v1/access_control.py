@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
-from app.database import get_db
-from app.services.access_code_service import AccessCodeService
+from app.db.session import get_db
+from app.services.access_code_service import AccessCodeService, invalidate_test_gate
 from app.models.test import Test
 from app.models.exam_attempt import ExamAttempt, AttemptRequest
 from pydantic import BaseModel
@@ -59,27 +59,24 @@ async def validate_access_code(
         test_id = uuid.UUID(req.test_id)
         session_hash = get_session_hash(request)
         
-        is_valid, error_message = AccessCodeService.validate_access_code(
+        check = AccessCodeService.check_access(
             db=db,
             test_id=test_id,
             access_code=req.access_code,
             session_hash=session_hash
         )
         
-        if not is_valid:
+        if not check.is_valid:
             return {
                 "valid": False,
-                "error": error_message
+                "error": check.error
             }
         
-        # Get attempt summary
-        summary = AccessCodeService.get_attempt_summary(db, test_id, session_hash)
-        
         return {
             "valid": True,
             "test_id": str(test_id),
-            "attempts_remaining": summary["attempts_remaining"],
-            "best_score": summary["best_score"]
+            "attempts_remaining": check.attempts_remaining,
+            "best_score": check.best_score
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -131,8 +128,8 @@ async def complete_exam_attempt(
         if not attempt:
             raise HTTPException(status_code=404, detail="Attempt not found")
         
-        test = db.query(Test).filter(Test.id == attempt.test_id).first()
-        passing_score = test.passing_score if test else 0.6
+        gate = AccessCodeService.get_test_gate(db, attempt.test_id)
+        passing_score = gate.passing_score if gate else 0.6
         
         completed_attempt = AccessCodeService.complete_exam_attempt(
             db=db,
@@ -215,7 +212,7 @@ async def get_pending_requests(
     try:
         requests = db.query(AttemptRequest).filter(
             AttemptRequest.status == "pending"
-        ).all()
+        ).order_by(AttemptRequest.created_at).all()
         
         return {
             "pending_requests": [
@@ -259,6 +256,7 @@ async def approve_attempt_request(
             test.max_attempts = attempt_request.requested_attempts
         
         db.commit()
+        invalidate_test_gate(attempt_request.test_id)
         
         return {
             "success": True,
@@ -1,11 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.database import get_db
+from typing import Dict, List, Optional
+from app.db.session import get_db
+from app.core.exceptions import TaxonomyPackError, TaxonomyPackNotFoundError
+from app.data.taxonomy_packs import get_taxonomy, taxonomy_packs
 from app.services.mastery_service import MasteryService
+from app.services.mastery_projection import MasteryProjectionService
+from app.services.cohort_snapshot import CohortSnapshotService
+from app.services.item_retrieval import ItemRetrievalService
+from app.services.practice_plan import PracticePlanService
 from app.services.diagnostic_service import DiagnosticService
-from app.services.adaptive_difficulty import AdaptiveDifficultyService, PersonalizedPracticeQueue
-from pydantic import BaseModel
+from app.services.adaptive_diagnostic import AdaptiveDiagnosticService
+from app.services.diagnostic_batch import DiagnosticBatchService
+from app.services.learning_path import LearningPathService
+from app.services.concept_catalog import ConceptSyncService, concept_catalog
+from app.services.adaptive_difficulty import (
+    AdaptiveDifficultyService, PersonalizedPracticeQueue, recommendation_states
+)
+from pydantic import BaseModel, Field
 import uuid
 
 router = APIRouter(prefix="/learning", tags=["learning"])
@@ -19,6 +31,27 @@ class MasteryUpdateRequest(BaseModel):
     is_correct: bool
     time_taken_seconds: float
     had_hint: bool = False
+    question_id: Optional[str] = None
+
+
+class MasteryEventBatchRequest(BaseModel):
+    events: List[MasteryUpdateRequest] = Field(..., min_length=1, max_length=500)
+
+
+class CohortHeatmapRequest(BaseModel):
+    test_ids: List[str] = Field(..., min_length=1, max_length=CohortSnapshotService.MAX_STUDENTS)
+    concept_ids: Optional[List[str]] = None
+
+
+class RecentResult(BaseModel):
+    concept_id: Optional[str] = None
+    is_correct: bool
+    difficulty_score: float = 0.5
+
+
+class NextQuestionRequest(BaseModel):
+    test_id: str
+    recent_performance: List[RecentResult] = []
 
 
 class DiagnosticRequest(BaseModel):
@@ -27,6 +60,38 @@ class DiagnosticRequest(BaseModel):
     exam_standard: str = "NCDPI"
 
 
+class ConceptSyncRequest(BaseModel):
+    exam_standards: Optional[List[str]] = None  # None = every taxonomy
+
+
+class ClassLearningPathRequest(BaseModel):
+    test_ids: List[str] = Field(..., min_length=1, max_length=CohortSnapshotService.MAX_STUDENTS)
+    grade_level: int
+    exam_standard: str = "NCDPI"
+
+
+class DiagnosticResponse(BaseModel):
+    question_id: str
+    answer: Optional[str] = None
+
+
+class AdaptiveDiagnosticRequest(BaseModel):
+    grade_level: int
+    exam_standard: str = "NCDPI"
+    responses: List[DiagnosticResponse] = Field(default=[], max_length=AdaptiveDiagnosticService.MAX_ITEMS)
+
+
+class DiagnosticSubmission(BaseModel):
+    student_id: str
+    answers: Dict[int, str]  # Question position -> answer
+
+
+class BatchDiagnosticRequest(BaseModel):
+    test_id: str
+    submissions: List[DiagnosticSubmission] = Field(..., min_length=1, max_length=DiagnosticBatchService.MAX_STUDENTS)
+    grade_level: Optional[int] = None
+
+
 class PracticeSessionRequest(BaseModel):
     test_id: str
     target_questions: int = 20
@@ -50,8 +115,10 @@ async def update_mastery(
             concept_id=request.concept_id,
             is_correct=request.is_correct,
             time_taken_seconds=request.time_taken_seconds,
-            had_hint=request.had_hint
+            had_hint=request.had_hint,
+            question_id=uuid.UUID(request.question_id) if request.question_id else None
         )
+        recommendation_states.observe([record])
         
         return {
             "success": True,
@@ -65,6 +132,86 @@ async def update_mastery(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/mastery/update-batch")
+async def update_mastery_batch(
+    request: MasteryEventBatchRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Apply an ordered batch of answer events (one or many test/concept pairs)
+    in a single query and a single commit.
+    """
+    try:
+        events = [
+            {
+                **event.model_dump(),
+                "test_id": uuid.UUID(event.test_id),
+                "question_id": uuid.UUID(event.question_id) if event.question_id else None
+            }
+            for event in request.events
+        ]
+        records = MasteryService.apply_mastery_events(db, events)
+        recommendation_states.observe(records)
+        
+        return {
+            "success": True,
+            "events_applied": len(events),
+            "records": [
+                {
+                    "test_id": str(record.test_id),
+                    "concept_id": record.concept_id,
+                    "current_level": record.current_level,
+                    "is_mastered": record.is_mastered,
+                    "streak_current": record.streak_current,
+                    "next_review_due": record.next_review_due.isoformat() if record.next_review_due else None
+                }
+                for record in records
+            ]
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/mastery/rebuild")
+async def rebuild_mastery_projections(
+    test_id: Optional[str] = None,
+    all_students: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Rebuild mastery records from the response event log, for one student
+    (test_id) or for everyone (all_students=true, admin only). Records
+    with answers from before the event log are left untouched.
+    """
+    try:
+        test_uuid = uuid.UUID(test_id) if test_id else None
+        return MasteryProjectionService.rebuild(db, test_id=test_uuid, all_students=all_students)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/mastery/bkt/reestimate")
+async def reestimate_bkt_mastery(
+    test_id: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Recompute BKT mastery from the response event log for one student
+    (test_id) or the whole cohort, e.g. after refitting parameters.
+    """
+    try:
+        test_uuid = uuid.UUID(test_id) if test_id else None
+        return MasteryProjectionService.reestimate_bkt(db, test_id=test_uuid)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/mastery/summary/{test_id}")
 async def get_mastery_summary(
     test_id: str,
@@ -106,6 +253,53 @@ async def get_concepts_due_for_review(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ===== TAXONOMY ENDPOINTS =====
+
+@router.get("/taxonomy")
+async def list_taxonomies():
+    """Exam standards with a concept taxonomy (packs are not loaded by this call)."""
+    return {"standards": taxonomy_packs.standards(), "loaded": taxonomy_packs.loaded()}
+
+
+@router.get("/taxonomy/{exam_standard}/concepts")
+async def get_taxonomy_concepts(exam_standard: str, grade_level: Optional[int] = None):
+    """Concepts of one exam standard's taxonomy, prerequisites first."""
+    try:
+        taxonomy = get_taxonomy(exam_standard)
+        if grade_level is not None:
+            concepts = taxonomy.concepts_for_grade(grade_level)
+        else:
+            concepts = [taxonomy.concepts[i] for i in taxonomy.topological_order]
+        return {"exam_standard": exam_standard, "total": len(concepts), "concepts": concepts}
+    except (TaxonomyPackNotFoundError, TaxonomyPackError) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+
+
+@router.get("/concepts/{concept_id}")
+async def get_concept(concept_id: str, db: Session = Depends(get_db)):
+    """Concept metadata, served from the in-process concept cache."""
+    concept = concept_catalog.get(db, concept_id)
+    if concept is None:
+        raise HTTPException(status_code=404, detail=f"Concept {concept_id} not found")
+    return concept
+
+
+@router.post("/concepts/sync")
+async def sync_concepts(
+    request: ConceptSyncRequest,
+    db: Session = Depends(get_db)
+):
+    """Upsert taxonomy concepts into the concept table (idempotent) and refresh the cache."""
+    try:
+        return ConceptSyncService.sync(db, request.exam_standards)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (TaxonomyPackNotFoundError, TaxonomyPackError) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ===== DIAGNOSTIC ENDPOINTS =====
 
 @router.post("/diagnostic/create")
@@ -123,6 +317,32 @@ async def create_diagnostic_test(
             exam_standard=request.exam_standard
         )
         return result
+    except (TaxonomyPackNotFoundError, TaxonomyPackError) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/diagnostic/adaptive")
+async def adaptive_diagnostic_step(
+    request: AdaptiveDiagnosticRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Multi-stage diagnostic from the tagged question pool: send every answer so
+    far and get the next testlet, or the results once the diagnostic stops.
+    """
+    try:
+        return AdaptiveDiagnosticService.next_step(
+            db=db,
+            grade_level=request.grade_level,
+            responses=[r.model_dump() for r in request.responses],
+            exam_standard=request.exam_standard
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (TaxonomyPackNotFoundError, TaxonomyPackError) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -141,26 +361,75 @@ async def analyze_diagnostic_results(
         
         # Get questions for this test
         questions = db.query(Question).filter(Question.test_id == test_uuid).all()
+        exam_standard = (questions[0].test.exam_standard if questions else None) or "NCDPI"
         
         service = DiagnosticService()
         results = service.analyze_diagnostic_results(
             db=db,
             test_id=test_uuid,
             answers=answers,
-            questions=questions
+            questions=questions,
+            exam_standard=exam_standard
         )
         
         # Create personalized learning path
         learning_path = service.create_personalized_learning_path(
             db=db,
             diagnostic_results=results,
-            grade_level=questions[0].test.grade_level if questions else 5
+            grade_level=questions[0].test.grade_level if questions else 5,
+            exam_standard=exam_standard
         )
         
         return {
             "diagnostic_results": results,
             "learning_path": learning_path
         }
+    except (TaxonomyPackNotFoundError, TaxonomyPackError) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/path/class")
+async def plan_class_learning_paths(
+    request: ClassLearningPathRequest,
+    db: Session = Depends(get_db)
+):
+    """Prerequisite-ordered learning paths for every student in a class, in one call."""
+    try:
+        test_uuids = [uuid.UUID(t) for t in request.test_ids]
+        paths = LearningPathService.plan_for_class(
+            db=db,
+            test_ids=test_uuids,
+            grade_level=request.grade_level,
+            exam_standard=request.exam_standard
+        )
+        return {"grade_level": request.grade_level, "total_students": len(paths), "learning_paths": paths}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (TaxonomyPackNotFoundError, TaxonomyPackError) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/diagnostic/analyze-batch")
+async def analyze_diagnostic_batch(
+    request: BatchDiagnosticRequest,
+    db: Session = Depends(get_db)
+):
+    """Analyze a whole class's diagnostic answers and plan each student's learning path."""
+    try:
+        return DiagnosticBatchService.analyze_class(
+            db=db,
+            test_id=uuid.UUID(request.test_id),
+            submissions=[s.model_dump() for s in request.submissions],
+            grade_level=request.grade_level
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (TaxonomyPackNotFoundError, TaxonomyPackError) as e:
+        raise HTTPException(status_code=e.status_code, detail=e.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -191,6 +460,28 @@ async def get_current_difficulty(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/adaptive/items/{test_id}/{concept_id}")
+async def get_zpd_items(
+    test_id: str,
+    concept_id: str,
+    k: int = Query(5, ge=1, le=ItemRetrievalService.MAX_ZPD_ITEMS),
+    db: Session = Depends(get_db)
+):
+    """Unseen question-bank items for a concept within the student's ZPD."""
+    try:
+        test_uuid = uuid.UUID(test_id)
+        result = ItemRetrievalService.find_zpd_items(db, test_uuid, concept_id, k)
+        result["items"] = [
+            {"question_id": str(item["question_id"]), "difficulty_score": item["difficulty_score"]}
+            for item in result["items"]
+        ]
+        return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.post("/adaptive/practice-session")
 async def generate_practice_session(
     request: PracticeSessionRequest,
@@ -215,6 +506,46 @@ async def generate_practice_session(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/adaptive/next-question")
+async def get_next_question(
+    request: NextQuestionRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Recommend the next question: stay on the concept at an adjusted
+    difficulty after a streak, otherwise the top of the practice queue.
+    """
+    try:
+        test_uuid = uuid.UUID(request.test_id)
+        return PersonalizedPracticeQueue.get_next_question_recommendation(
+            db=db,
+            test_id=test_uuid,
+            recent_performance=[p.model_dump() for p in request.recent_performance]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/adaptive/daily-plan/{test_id}")
+async def get_daily_plan(
+    test_id: str,
+    db: Session = Depends(get_db)
+):
+    """
+    Today's practice plan, precomputed by the nightly batch; recomputed
+    only if the student has practiced since it was built.
+    """
+    try:
+        test_uuid = uuid.UUID(test_id)
+        return PracticePlanService.get_plan(db, test_uuid)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ===== LEARNING ANALYTICS =====
 
 @router.get("/analytics/progress/{test_id}")
@@ -226,17 +557,34 @@ async def get_learning_progress(
     try:
         test_uuid = uuid.UUID(test_id)
         
-        # Get mastery summary
+        # Mastery summary already carries the due-review count (one query at most)
         mastery_summary = MasteryService.get_mastery_summary(db, test_uuid)
         
-        # Get concepts due for review
-        due_concepts = MasteryService.get_concepts_due_for_review(db, test_uuid, limit=100)
-        
         return {
             "mastery_summary": mastery_summary,
-            "concepts_due_count": len(due_concepts),
+            "concepts_due_count": mastery_summary["concepts_due_review"],
             "learning_streak": mastery_summary.get("best_streak", 0),
             "overall_mastery": mastery_summary.get("overall_mastery", 0.0)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/analytics/cohort-heatmap")
+async def get_cohort_heatmap(
+    request: CohortHeatmapRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Class-wide mastery heatmap (students x concepts).
+    The matrix is returned as base64 of zlib-compressed uint8 percentages,
+    row-major, with 255 marking concepts a student has not attempted.
+    """
+    try:
+        test_ids = [uuid.UUID(t) for t in request.test_ids]
+        snapshot = CohortSnapshotService.load_snapshot(db, test_ids, request.concept_ids)
+        return CohortSnapshotService.encode_heatmap(snapshot)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,15 +1,63 @@
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.models.test import Test, Question
-from app.services.pdf_service import PDFService
+from app.services.pdf_render_pool import pdf_render_pool
+from app.services.classroom_export import ClassroomExportService
+from app.core.exceptions import PDFRenderBusyError, PDFRenderTimeoutError
+from pydantic import BaseModel, Field
+from typing import Optional
+import asyncio
+import secrets
 import uuid
-import os
-import tempfile
 
 router = APIRouter()
 
+PDF_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class ClassroomExportRequest(BaseModel):
+    variant_count: int = Field(..., ge=1, le=ClassroomExportService.MAX_VARIANTS)
+    seed: Optional[int] = None  # Reuse a seed to reprint the same set
+    shuffle_questions: Optional[bool] = None  # Defaults to the test's setting
+    shuffle_options: Optional[bool] = None  # Defaults to the test's setting
+    include_answer_keys: bool = True
+
+
+def _pool_http_error(e):
+    """Map PDF pool errors to HTTP responses."""
+    headers = {"Retry-After": str(e.retry_after)} if isinstance(e, PDFRenderBusyError) else None
+    return HTTPException(status_code=e.status_code, detail=e.message, headers=headers)
+
+
+async def _render_pdf(test_dict, questions_list, template_name="test_template.html"):
+    """Render in the PDF process pool, mapping pool errors to HTTP responses."""
+    try:
+        pdf_bytes = await pdf_render_pool.render(test_dict, questions_list, template_name)
+    except (PDFRenderBusyError, PDFRenderTimeoutError) as e:
+        raise _pool_http_error(e)
+    
+    if pdf_bytes is None:
+        raise HTTPException(status_code=500, detail="PDF Generation failed")
+    return pdf_bytes
+
+
+def _pdf_response(pdf_bytes: bytes, filename: str, media_type: str = "application/pdf") -> StreamingResponse:
+    """Stream an in-memory document back without touching disk."""
+    def iter_chunks():
+        for start in range(0, len(pdf_bytes), PDF_STREAM_CHUNK_SIZE):
+            yield pdf_bytes[start:start + PDF_STREAM_CHUNK_SIZE]
+    
+    return StreamingResponse(
+        iter_chunks(),
+        media_type=media_type,
+        headers={
+            "Content-Length": str(len(pdf_bytes)),
+            "Content-Disposition": f'attachment; filename="{filename}"'
+        }
+    )
+
 @router.get("/{test_id}/download")
 async def download_test_pdf(
     test_id: uuid.UUID,
@@ -38,21 +86,74 @@ async def download_test_pdf(
             "cognitive_level": q.cognitive_level
         })
     
-    # 3. Generate PDF to temporary file
-    pdf_service = PDFService()
-    temp_dir = tempfile.gettempdir()
-    file_name = f"EOG_Practice_{test_id}.pdf"
-    file_path = os.path.join(temp_dir, file_name)
+    # 3. Generate PDF in memory (off the event loop)
+    try:
+        pdf_bytes = await _render_pdf(test_dict, questions_list)
+        return _pdf_response(pdf_bytes, f"{db_test.title.replace(' ', '_')}.pdf")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"PDF Generation failed: {str(e)}")
+
+@router.post("/{test_id}/classroom-export")
+async def export_classroom_set(
+    test_id: uuid.UUID,
+    request: ClassroomExportRequest,
+    db: Session = Depends(get_db)
+):
+    """
+    Render N seeded variants of a test (plus answer keys) in one job and
+    return them as a single ZIP.
+    """
+    db_test = db.query(Test).filter(Test.id == test_id).first()
+    if not db_test:
+        raise HTTPException(status_code=404, detail="Test not found")
+    
+    test_dict = {
+        "title": db_test.title,
+        "grade_level": db_test.grade_level,
+        "subject": db_test.subject,
+        "standard_focus": db_test.standard_focus,
+        "shuffle_questions": db_test.shuffle_questions,
+        "shuffle_options": db_test.shuffle_options
+    }
+    questions_list = [
+        {
+            "sequence": q.sequence,
+            "question_text": q.question_text,
+            "options": q.options,
+            "correct_answer": q.correct_answer,
+            "cognitive_level": q.cognitive_level
+        }
+        for q in db_test.questions
+    ]
+    
+    seed = request.seed if request.seed is not None else secrets.randbelow(2**31)
+    jobs, variants = ClassroomExportService.build_render_jobs(
+        test_id=test_id,
+        test_data=test_dict,
+        questions=questions_list,
+        variant_count=request.variant_count,
+        seed=seed,
+        shuffle_questions=request.shuffle_questions,
+        shuffle_options=request.shuffle_options,
+        include_answer_keys=request.include_answer_keys
+    )
     
     try:
-        pdf_service.generate_test_pdf(test_dict, questions_list, file_path)
-        return FileResponse(
-            path=file_path,
-            filename=f"{db_test.title.replace(' ', '_')}.pdf",
-            media_type="application/pdf"
+        rendered = await pdf_render_pool.render_batch(jobs)
+        manifest = {"test_id": str(test_id), "seed": seed, "variants": variants}
+        zip_bytes = await asyncio.to_thread(ClassroomExportService.build_zip, rendered, manifest)
+        return _pdf_response(
+            zip_bytes,
+            f"Classroom_{db_test.title.replace(' ', '_')}.zip",
+            media_type="application/zip"
         )
+    except (PDFRenderBusyError, PDFRenderTimeoutError) as e:
+        raise _pool_http_error(e)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"PDF Generation failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Classroom export failed: {str(e)}")
+
 @router.get("/{test_id}/results/download")
 async def download_results_pdf(
     test_id: uuid.UUID,
@@ -81,16 +182,10 @@ async def download_results_pdf(
             "explanation": q.explanation
         })
     
-    pdf_service = PDFService()
-    temp_dir = tempfile.gettempdir()
-    file_path = os.path.join(temp_dir, f"Results_{test_id}.pdf")
-    
     try:
-        pdf_service.generate_test_pdf(test_dict, questions_list, file_path, template_name="results_template.html")
-        return FileResponse(
-            path=file_path,
-            filename=f"Report_{db_test.title.replace(' ', '_')}.pdf",
-            media_type="application/pdf"
-        )
+        pdf_bytes = await _render_pdf(test_dict, questions_list, template_name="results_template.html")
+        return _pdf_response(pdf_bytes, f"Report_{db_test.title.replace(' ', '_')}.pdf")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"PDF Generation failed: {str(e)}")
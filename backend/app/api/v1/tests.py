@@ -1,10 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.api import deps
 from app.db.session import get_db
 from app.schemas.test import TestCreate, TestWithQuestions
 from app.services.question_generator import QuestionGenerator
+from app.services.permutation_service import PermutationService
+from app.services.item_retrieval import ItemRetrievalService
 from app.models.test import Test, Question, QuestionTypeEnum, ExamStandardEnum
 import uuid
 
@@ -48,6 +50,7 @@ async def generate_test(
         db.flush() # Get the test ID
 
         # 3. Create question records
+        db_questions = []
         for q_data in questions_data:
             db_question = Question(
                 test_id=db_test.id,
@@ -57,9 +60,16 @@ async def generate_test(
                 options=q_data.get("options"),
                 correct_answer=q_data.get("correct_answer"),
                 explanation=q_data.get("explanation"),
-                cognitive_level=q_data.get("cognitive_level")
+                cognitive_level=q_data.get("cognitive_level"),
+                concept_ids=q_data.get("concept_ids"),
+                difficulty_score=q_data.get("difficulty_score")
             )
             db.add(db_question)
+            db_questions.append(db_question)
+
+        # 4. Index the questions by concept for adaptive item retrieval
+        db.flush()
+        ItemRetrievalService.sync_questions(db, db_questions)
 
         db.commit()
         db.refresh(db_test)
@@ -83,12 +93,32 @@ def get_recent_tests(
     """
     return db.query(Test).order_by(Test.created_at.desc()).limit(limit).all()
 
+def _is_shuffled(db_test: Test) -> bool:
+    return bool(db_test.shuffle_questions or db_test.shuffle_options)
+
 @router.get("/{test_id}", response_model=TestWithQuestions)
-def get_test(test_id: uuid.UUID, db: Session = Depends(get_db)):
+def get_test(
+    test_id: uuid.UUID,
+    attempt_id: Optional[uuid.UUID] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Get a test. With attempt_id, questions/options are served in that
+    attempt's shuffled order when the test has shuffling enabled.
+    """
     db_test = db.query(Test).filter(Test.id == test_id).first()
     if not db_test:
         raise HTTPException(status_code=404, detail="Test not found")
-    return db_test
+    if attempt_id is None or not _is_shuffled(db_test):
+        return db_test
+    
+    view = TestWithQuestions.model_validate(db_test, from_attributes=True).model_dump()
+    permutation = PermutationService.for_attempt(
+        db_test.id, attempt_id, view["questions"],
+        db_test.shuffle_questions, db_test.shuffle_options
+    )
+    view["questions"] = permutation.apply(view["questions"])
+    return view
 
 from app.services.feedback_engine import FeedbackEngine
 
@@ -96,14 +126,23 @@ from app.services.feedback_engine import FeedbackEngine
 async def submit_test(
     test_id: uuid.UUID,
     answers: dict,
+    attempt_id: Optional[uuid.UUID] = None,
     db: Session = Depends(get_db)
 ):
     """
     Submit test answers and calculate score with AI feedback.
+    Answers from a shuffled attempt are mapped back to canonical order first.
     """
     db_test = db.query(Test).filter(Test.id == test_id).first()
     if not db_test:
         raise HTTPException(status_code=404, detail="Test not found")
+    
+    if attempt_id is not None and _is_shuffled(db_test):
+        permutation = PermutationService.for_attempt(
+            db_test.id, attempt_id, [{"options": q.options} for q in db_test.questions],
+            db_test.shuffle_questions, db_test.shuffle_options
+        )
+        answers = permutation.to_canonical(answers)
         
     engine = FeedbackEngine()
     
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional, List
+from typing import Literal, Optional, List
 import os
+import tempfile
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "EOG Practice Test Generator"
@@ -26,6 +27,44 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: Optional[str] = None
     OPENAI_MODEL: str = "gpt-3.5-turbo"
     
+    # Spaced repetition
+    MASTERY_REVIEW_SCAN_INTERVAL_SECONDS: int = 300  # needs_review scheduler
+    MASTERY_SUMMARY_CACHE_TTL_SECONDS: int = 30
+    
+    # Mastery model: "ratio" (correct / attempted) or "bkt" (Bayesian Knowledge Tracing)
+    MASTERY_MODEL: Literal["ratio", "bkt"] = "ratio"
+    BKT_PARAMS_PATH: str = "bkt_params.json"  # Written by fit_bkt.py
+    
+    # Exam-standard taxonomy packs (app/data/packs/<standard>.jsonl)
+    TAXONOMY_PACK_DIR: Optional[str] = None  # Defaults to the bundled packs
+    TAXONOMY_PACK_RELOAD_SECONDS: float = 5.0  # How often loaded packs are checked for changes
+    CONCEPT_SYNC_ON_STARTUP: bool = True  # Upsert all taxonomies into the concept table
+    
+    # Access codes
+    ACCESS_GATE_CACHE_TTL_SECONDS: int = 60  # Cached test gate fields (per process)
+    
+    # Next-question recommendation state (per-process LRU)
+    RECOMMENDATION_STATE_MAX_STUDENTS: int = 10000
+    RECOMMENDATION_STATE_TTL_SECONDS: int = 300  # Reload from the DB after this
+    RECOMMENDATION_STATE_PATH: Optional[str] = None  # Save/restore across restarts
+    
+    # Nightly practice plan batch
+    PRACTICE_PLAN_BATCH_ENABLED: bool = True  # Disable when the batch runs from cron instead
+    PRACTICE_PLAN_BATCH_HOUR: int = 2  # Local hour the batch starts
+    PRACTICE_PLAN_WORKERS: int = max(1, (os.cpu_count() or 2) - 1)
+    PRACTICE_PLAN_CHUNK_SIZE: int = 500  # Students per worker task
+    PRACTICE_PLAN_ACTIVE_DAYS: int = 30  # Plan for students who practiced this recently
+    PRACTICE_PLAN_TARGET_QUESTIONS: int = 20
+    
+    # PDF rendering (process pool)
+    PDF_RENDER_WORKERS: int = max(1, (os.cpu_count() or 2) - 1)
+    PDF_RENDER_MAX_QUEUE: int = 16  # Jobs allowed to wait behind busy workers
+    PDF_RENDER_TIMEOUT_SECONDS: float = 30.0
+    PDF_RENDER_RETRY_AFTER_SECONDS: int = 5
+    PDF_TEMP_SWEEP_INTERVAL_SECONDS: int = 3600  # Cleanup of legacy temp PDFs
+    PDF_TEMP_MAX_AGE_SECONDS: int = 600
+    PDF_TEMPLATE_CACHE_DIR: str = os.path.join(tempfile.gettempdir(), "eduapp-jinja-cache")
+    
     @property
     def is_dev(self) -> bool:
         return self.ENVIRONMENT == "development"
@@ -102,6 +102,24 @@ class MissingRequiredFieldError(EduAppException):
         )
 
 
+# ===== TAXONOMY PACKS =====
+
+class TaxonomyPackNotFoundError(EduAppException):
+    """Raised when no taxonomy exists for an exam standard."""
+    def __init__(self, standard: str):
+        super().__init__(f"No concept taxonomy for exam standard {standard}", status.HTTP_404_NOT_FOUND)
+
+
+class TaxonomyPackError(EduAppException):
+    """Raised when a taxonomy pack file fails validation."""
+    def __init__(self, where: str, reason: str):
+        self.where = where
+        super().__init__(
+            f"Invalid taxonomy pack ({where}): {reason}",
+            status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
 # ===== LEARNING SERVICE ERRORS =====
 
 class PrerequisiteNotMetError(EduAppException):
@@ -183,6 +201,27 @@ class RateLimitExceededError(EduAppException):
         )
 
 
+# ===== PDF RENDERING =====
+
+class PDFRenderBusyError(EduAppException):
+    """Raised when the PDF render pool is saturated."""
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__(
+            f"PDF renderer is busy. Try again in {retry_after} seconds.",
+            status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+
+class PDFRenderTimeoutError(EduAppException):
+    """Raised when a PDF render job exceeds its time budget."""
+    def __init__(self, timeout_seconds: float):
+        super().__init__(
+            f"PDF generation timed out after {timeout_seconds:g} seconds",
+            status.HTTP_504_GATEWAY_TIMEOUT
+        )
+
+
 # ===== HELPER FUNCTIONS =====
 
 def handle_exception(exc: Exception) -> HTTPException:
@@ -2,6 +2,7 @@
 Concept taxonomy for NCDPI Mathematics.
 Hierarchical structure of mathematical concepts with prerequisites.
 """
+from app.data.taxonomy_graph import CompiledTaxonomy
 
 NCDPI_MATH_CONCEPTS = [
     # Grade 3-5: Foundational Concepts
@@ -260,31 +261,20 @@ NCDPI_MATH_CONCEPTS = [
 ]
 
 
+# Compiled once at import: O(1) lookups, grade index and prerequisite closures
+NCDPI_TAXONOMY = CompiledTaxonomy(NCDPI_MATH_CONCEPTS)
+
+
 def get_concept_by_id(concept_id: str):
     """Get a concept by its ID."""
-    for concept in NCDPI_MATH_CONCEPTS:
-        if concept["concept_id"] == concept_id:
-            return concept
-    return None
+    return NCDPI_TAXONOMY.get(concept_id)
 
 
 def get_concepts_by_grade(grade_level: int):
     """Get all concepts appropriate for a grade level."""
-    return [
-        c for c in NCDPI_MATH_CONCEPTS
-        if c["grade_level_min"] <= grade_level <= c["grade_level_max"]
-    ]
+    return NCDPI_TAXONOMY.concepts_for_grade(grade_level)
 
 
 def get_prerequisite_chain(concept_id: str):
-    """Get the full chain of prerequisites for a concept."""
-    concept = get_concept_by_id(concept_id)
-    if not concept:
-        return []
-    
-    chain = []
-    for prereq_id in concept.get("prerequisite_concept_ids", []):
-        chain.append(prereq_id)
-        chain.extend(get_prerequisite_chain(prereq_id))
-    
-    return list(set(chain))  # Remove duplicates
+    """Get the full chain of prerequisites for a concept (prerequisites first)."""
+    return NCDPI_TAXONOMY.prerequisite_closure(concept_id)
@@ -0,0 +1,157 @@
+"""
+Compiled concept taxonomy.
+
+A taxonomy is authored as a list of concept dicts (see concept_taxonomy.py).
+CompiledTaxonomy turns it into lookup structures once, up front:
+
+- id -> index map, so lookups are O(1) instead of a list scan
+- per-grade index of the concepts whose grade interval covers that grade
+- a topological order of the prerequisite graph (prerequisites first)
+- the transitive prerequisite closure of every concept as a bitset (a Python
+  int with bit i set for concept i)
+
+With closures as bitsets, "are all prerequisites of X mastered" is a single
+AND against a bitset of mastered concepts, and the whole build is
+O(concepts x edges / 64), which stays fast for thousands of concepts.
+"""
+from typing import Dict, Iterable, List, Optional
+
+
+class CompiledTaxonomy:
+    """Immutable, indexed view of one taxonomy."""
+
+    def __init__(self, concepts: List[Dict]):
+        self.concepts: List[Dict] = list(concepts)
+        self.ids: List[str] = [c["concept_id"] for c in self.concepts]
+        self.index: Dict[str, int] = {}
+        for i, concept_id in enumerate(self.ids):
+            if concept_id in self.index:
+                raise ValueError(f"Duplicate concept_id: {concept_id}")
+            self.index[concept_id] = i
+
+        n = len(self.concepts)
+
+        # Direct edges by index; references to unknown concepts are kept aside
+        self.prerequisites: List[List[int]] = []
+        self.dependents: List[List[int]] = [[] for _ in range(n)]
+        self.unknown_prerequisites: Dict[str, List[str]] = {}
+        for i, concept in enumerate(self.concepts):
+            direct = []
+            for prereq_id in concept.get("prerequisite_concept_ids") or []:
+                j = self.index.get(prereq_id)
+                if j is None:
+                    self.unknown_prerequisites.setdefault(self.ids[i], []).append(prereq_id)
+                    continue
+                direct.append(j)
+                self.dependents[j].append(i)
+            self.prerequisites.append(direct)
+
+        self.topological_order: List[int] = self._topological_sort()
+        self.position: List[int] = [0] * n
+        for pos, i in enumerate(self.topological_order):
+            self.position[i] = pos
+
+        # Closures in topological order: every prerequisite is done first
+        self.closures: List[int] = [0] * n
+        for i in self.topological_order:
+            closure = 0
+            for j in self.prerequisites[i]:
+                closure |= self.closures[j] | (1 << j)
+            self.closures[i] = closure
+
+        # Grade index: grade -> concept indices (taxonomy order) and bitset
+        self.by_grade: Dict[int, List[int]] = {}
+        for i, concept in enumerate(self.concepts):
+            lo, hi = concept.get("grade_level_min"), concept.get("grade_level_max")
+            if lo is None or hi is None:
+                continue
+            for grade in range(lo, hi + 1):
+                self.by_grade.setdefault(grade, []).append(i)
+        self.grade_masks: Dict[int, int] = {
+            grade: self.mask_of_indices(indices) for grade, indices in self.by_grade.items()
+        }
+
+    def _topological_sort(self) -> List[int]:
+        """Kahn's algorithm; ties keep taxonomy order. Raises ValueError on a cycle."""
+        n = len(self.concepts)
+        remaining = [len(p) for p in self.prerequisites]
+        ready = [i for i in range(n) if remaining[i] == 0]
+        order = []
+        head = 0
+        while head < len(ready):
+            i = ready[head]
+            head += 1
+            order.append(i)
+            for d in self.dependents[i]:
+                remaining[d] -= 1
+                if remaining[d] == 0:
+                    ready.append(d)
+        if len(order) != n:
+            cyclic = [self.ids[i] for i in range(n) if remaining[i] > 0]
+            raise ValueError(f"Prerequisite cycle among: {', '.join(cyclic[:10])}")
+        return order
+
+    def __len__(self) -> int:
+        return len(self.concepts)
+
+    def __contains__(self, concept_id: str) -> bool:
+        return concept_id in self.index
+
+    # ===== LOOKUPS =====
+
+    def get(self, concept_id: str) -> Optional[Dict]:
+        i = self.index.get(concept_id)
+        return self.concepts[i] if i is not None else None
+
+    def concepts_for_grade(self, grade_level: int) -> List[Dict]:
+        return [self.concepts[i] for i in self.by_grade.get(grade_level, [])]
+
+    def dependents_of(self, concept_id: str) -> List[str]:
+        """Concepts that list this one as a direct prerequisite."""
+        i = self.index.get(concept_id)
+        return [self.ids[d] for d in self.dependents[i]] if i is not None else []
+
+    def prerequisite_closure(self, concept_id: str) -> List[str]:
+        """All direct and indirect prerequisites, in topological order."""
+        i = self.index.get(concept_id)
+        if i is None:
+            return []
+        return self.ids_of_mask(self.closures[i])
+
+    # ===== BITSETS =====
+
+    @staticmethod
+    def mask_of_indices(indices: Iterable[int]) -> int:
+        mask = 0
+        for i in indices:
+            mask |= 1 << i
+        return mask
+
+    def mask(self, concept_ids: Iterable[str]) -> int:
+        """Bitset of the given concepts (unknown ids are ignored)."""
+        return self.mask_of_indices(
+            self.index[c] for c in concept_ids if c in self.index
+        )
+
+    def ids_of_mask(self, mask: int) -> List[str]:
+        """Concept ids in a bitset, in topological order."""
+        indices = []
+        while mask:
+            low = mask & -mask
+            indices.append(low.bit_length() - 1)
+            mask ^= low
+        indices.sort(key=self.position.__getitem__)
+        return [self.ids[i] for i in indices]
+
+    def prerequisites_met(self, concept_id: str, mastered_mask: int) -> bool:
+        """True if every transitive prerequisite is in mastered_mask (one AND)."""
+        i = self.index.get(concept_id)
+        if i is None:
+            return True
+        return self.closures[i] & ~mastered_mask == 0
+
+    def missing_prerequisites(self, concept_id: str, mastered_mask: int) -> List[str]:
+        i = self.index.get(concept_id)
+        if i is None:
+            return []
+        return self.ids_of_mask(self.closures[i] & ~mastered_mask)
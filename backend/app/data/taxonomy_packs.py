@@ -0,0 +1,281 @@
+"""
+Taxonomy packs for exam standards other than the built-in NCDPI taxonomy.
+
+Each standard lives in packs/<standard>.jsonl: a header line followed by one
+concept per line.
+
+    {"standard": "SAT", "version": 1, "defaults": {"subject": "mathematics", ...}}
+    {"concept_id": "sat.algebra.linear-equations", "name": "...", ...}
+
+Fields missing from a concept line are taken from the header's defaults;
+exam_standard always comes from the header. A pack is read, validated and
+compiled into a CompiledTaxonomy the first time its standard is requested, so
+importing the app costs nothing for packs it never touches. Loaded packs are
+re-checked against the file's mtime/size at most every
+TAXONOMY_PACK_RELOAD_SECONDS and recompiled when the file changes; a pack that
+fails validation on reload is logged and the previous version keeps serving.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from app.config import settings
+from app.core.exceptions import TaxonomyPackError, TaxonomyPackNotFoundError
+from app.data.concept_taxonomy import NCDPI_TAXONOMY
+from app.data.taxonomy_graph import CompiledTaxonomy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PACK_DIR = os.path.join(os.path.dirname(__file__), "packs")
+PACK_SUFFIX = ".jsonl"
+PACK_FORMAT_VERSION = 1
+
+CONCEPT_FIELDS = {
+    "concept_id", "name", "description", "subject", "grade_level_min",
+    "grade_level_max", "parent_concept_id", "prerequisite_concept_ids",
+}
+MIN_GRADE, MAX_GRADE = 1, 12
+
+
+def normalize_standard(standard) -> str:
+    """'NEET', 'neet' and ExamStandardEnum.NEET all name the pack 'neet'."""
+    return str(getattr(standard, "value", standard)).strip().lower()
+
+
+def _validate_concept(concept: Dict, where: str) -> None:
+    unknown = set(concept) - CONCEPT_FIELDS - {"exam_standard"}
+    if unknown:
+        raise TaxonomyPackError(where, f"unknown fields {sorted(unknown)}")
+    for field in ("concept_id", "name", "subject"):
+        if not isinstance(concept.get(field), str) or not concept[field]:
+            raise TaxonomyPackError(where, f"'{field}' must be a non-empty string")
+
+    lo, hi = concept.get("grade_level_min"), concept.get("grade_level_max")
+    for field, grade in (("grade_level_min", lo), ("grade_level_max", hi)):
+        if not isinstance(grade, int) or isinstance(grade, bool) or not MIN_GRADE <= grade <= MAX_GRADE:
+            raise TaxonomyPackError(where, f"'{field}' must be an integer grade {MIN_GRADE}-{MAX_GRADE}")
+    if lo > hi:
+        raise TaxonomyPackError(where, "grade_level_min is above grade_level_max")
+
+    prereqs = concept["prerequisite_concept_ids"]
+    if not isinstance(prereqs, list) or not all(isinstance(p, str) for p in prereqs):
+        raise TaxonomyPackError(where, "'prerequisite_concept_ids' must be a list of concept ids")
+
+
+def parse_pack(path: str, expected_standard: Optional[str] = None) -> Tuple[str, int, List[Dict]]:
+    """
+    Read and validate one pack file.
+
+    Args:
+        path: Pack file
+        expected_standard: Normalized standard the file name implies
+
+    Returns:
+        (standard as written in the header, version, concept dicts)
+
+    Raises:
+        TaxonomyPackError: with file:line of the first problem found
+    """
+    name = os.path.basename(path)
+    concepts: List[Dict] = []
+    lines: List[int] = []
+    header = None
+
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            where = f"{name}:{line_no}"
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise TaxonomyPackError(where, f"invalid JSON ({e.msg})")
+            if not isinstance(record, dict):
+                raise TaxonomyPackError(where, "expected a JSON object")
+
+            if header is None:
+                header = record
+                standard = header.get("standard")
+                if not isinstance(standard, str) or not standard:
+                    raise TaxonomyPackError(where, "header needs a 'standard'")
+                if expected_standard and normalize_standard(standard) != expected_standard:
+                    raise TaxonomyPackError(where, f"header standard {standard} does not match file name")
+                if header.get("version") != PACK_FORMAT_VERSION:
+                    raise TaxonomyPackError(where, f"unsupported pack version {header.get('version')!r}")
+                defaults = header.get("defaults") or {}
+                if not isinstance(defaults, dict) or set(defaults) - CONCEPT_FIELDS:
+                    raise TaxonomyPackError(where, "'defaults' may only set concept fields")
+                continue
+
+            concept = {
+                "description": "",
+                "parent_concept_id": None,
+                "prerequisite_concept_ids": [],
+                **defaults,
+                **record,
+                "exam_standard": standard,
+            }
+            _validate_concept(concept, where)
+            concepts.append(concept)
+            lines.append(line_no)
+
+    if header is None:
+        raise TaxonomyPackError(name, "empty pack")
+
+    # References must resolve inside the pack
+    line_of = {}
+    for concept, line_no in zip(concepts, lines):
+        if concept["concept_id"] in line_of:
+            raise TaxonomyPackError(
+                f"{name}:{line_no}",
+                f"duplicate concept_id {concept['concept_id']} (first on line {line_of[concept['concept_id']]})"
+            )
+        line_of[concept["concept_id"]] = line_no
+    for concept, line_no in zip(concepts, lines):
+        refs = list(concept["prerequisite_concept_ids"])
+        if concept["parent_concept_id"] is not None:
+            refs.append(concept["parent_concept_id"])
+        missing = [ref for ref in refs if ref not in line_of]
+        if missing:
+            raise TaxonomyPackError(f"{name}:{line_no}", f"unknown concepts {missing}")
+
+    return standard, header["version"], concepts
+
+
+@dataclass
+class _LoadedPack:
+    taxonomy: CompiledTaxonomy
+    version: int
+    signature: Tuple[int, int]  # (mtime_ns, size) of the file it was read from
+    checked_at: float
+
+
+class TaxonomyPackRegistry:
+    """
+    Lazily loaded, hot-reloaded taxonomies keyed by normalized exam standard.
+
+    Built-in taxonomies (compiled Python data) are served as-is; every other
+    standard is looked up as a pack file in pack_dir.
+    """
+
+    def __init__(
+        self,
+        pack_dir: Optional[str] = None,
+        builtin: Optional[Dict[str, CompiledTaxonomy]] = None,
+        reload_seconds: Optional[float] = None
+    ):
+        self.pack_dir = pack_dir or settings.TAXONOMY_PACK_DIR or DEFAULT_PACK_DIR
+        self.reload_seconds = (
+            settings.TAXONOMY_PACK_RELOAD_SECONDS if reload_seconds is None else reload_seconds
+        )
+        self._builtin = dict(builtin or {})
+        self._packs: Dict[str, _LoadedPack] = {}
+        self._lock = threading.Lock()
+
+    def path_for(self, standard: str) -> str:
+        return os.path.join(self.pack_dir, normalize_standard(standard) + PACK_SUFFIX)
+
+    def standards(self) -> List[str]:
+        """Every standard with a taxonomy (built-in or pack file), without loading any."""
+        found = set(self._builtin)
+        if os.path.isdir(self.pack_dir):
+            found.update(
+                name[:-len(PACK_SUFFIX)] for name in os.listdir(self.pack_dir)
+                if name.endswith(PACK_SUFFIX)
+            )
+        return sorted(found)
+
+    def loaded(self) -> List[str]:
+        """Standards whose packs have been compiled in this process."""
+        with self._lock:
+            return sorted(self._packs)
+
+    @staticmethod
+    def _signature(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, key: str, path: str, signature: Tuple[int, int]) -> _LoadedPack:
+        started = time.perf_counter()
+        _, version, concepts = parse_pack(path, key)
+        try:
+            taxonomy = CompiledTaxonomy(concepts)
+        except ValueError as e:
+            raise TaxonomyPackError(os.path.basename(path), str(e))
+        logger.info(
+            "Loaded taxonomy pack %s v%s: %d concepts in %.1f ms",
+            key, version, len(taxonomy), (time.perf_counter() - started) * 1000
+        )
+        return _LoadedPack(taxonomy, version, signature, time.monotonic())
+
+    def get(self, standard) -> CompiledTaxonomy:
+        """
+        Compiled taxonomy for an exam standard, loading or reloading its pack
+        file as needed.
+
+        Raises:
+            TaxonomyPackNotFoundError: No built-in taxonomy or pack for the standard
+            TaxonomyPackError: The pack's first load failed validation
+        """
+        key = normalize_standard(standard)
+        builtin = self._builtin.get(key)
+        if builtin is not None:
+            return builtin
+
+        pack = self._packs.get(key)
+        now = time.monotonic()
+        if pack is not None and now - pack.checked_at < self.reload_seconds:
+            return pack.taxonomy
+
+        with self._lock:
+            pack = self._packs.get(key)
+            if pack is not None and now - pack.checked_at < self.reload_seconds:
+                return pack.taxonomy
+
+            path = self.path_for(key)
+            signature = self._signature(path)
+            if signature is None:
+                if pack is not None:
+                    logger.warning("Taxonomy pack %s was removed; keeping the loaded version", path)
+                    pack.checked_at = now
+                    return pack.taxonomy
+                raise TaxonomyPackNotFoundError(str(standard))
+
+            if pack is not None and pack.signature == signature:
+                pack.checked_at = now
+                return pack.taxonomy
+
+            try:
+                self._packs[key] = self._load(key, path, signature)
+            except TaxonomyPackError as e:
+                if pack is None:
+                    raise
+                # Keep serving the last good version until the file is fixed
+                logger.error("Taxonomy pack reload failed, keeping v%s: %s", pack.version, e.message)
+                pack.signature = signature
+                pack.checked_at = now
+                return pack.taxonomy
+            return self._packs[key].taxonomy
+
+    def invalidate(self, standard=None) -> None:
+        """Drop loaded packs so the next get() reads the file again."""
+        with self._lock:
+            if standard is None:
+                self._packs.clear()
+            else:
+                self._packs.pop(normalize_standard(standard), None)
+
+
+taxonomy_packs = TaxonomyPackRegistry(builtin={"ncdpi": NCDPI_TAXONOMY})
+
+
+def get_taxonomy(standard) -> CompiledTaxonomy:
+    """Compiled taxonomy for an exam standard (see TaxonomyPackRegistry.get)."""
+    return taxonomy_packs.get(standard)
@@ -0,0 +1,94 @@
+"""
+Carry data over from tables Base.metadata.create_all made under auto-generated
+names (the lowercased class name) before the models declared the names the
+migrations use.
+
+Without this, a database built by create_all would keep its history in the old
+table while the app starts on a new, empty one. Runs at startup before
+create_all. A legacy table is renamed when the current name is free or holds
+an empty table (e.g. created by a migration or an earlier start); if both hold
+rows, nothing is touched and a warning is logged.
+
+Tables introduced alongside a rename are seeded from the renamed data, as the
+migration introducing them does: attempt_counter continues numbering after
+the highest attempt each session already has in exam_attempt.
+"""
+import logging
+from typing import Dict, List
+from sqlalchemy import func, inspect, select, table
+from sqlalchemy.engine import Engine
+from app.models.base_class import Base
+
+logger = logging.getLogger(__name__)
+
+# Auto-generated name -> name the model declares now
+LEGACY_TABLE_NAMES: Dict[str, str] = {
+    "masteryrecord": "mastery_record",
+    "examattempt": "exam_attempt",
+    "attemptrequest": "attempt_request",
+}
+
+# Current name -> statements run once the table was renamed into place
+BACKFILLS: Dict[str, List[str]] = {
+    # Same as migration 006; NOT EXISTS keeps counters a previous start wrote
+    "exam_attempt": [
+        """
+        INSERT INTO attempt_counter (test_id, session_hash, attempts_used)
+        SELECT test_id, session_hash, MAX(attempt_number)
+        FROM exam_attempt
+        WHERE session_hash IS NOT NULL
+          AND NOT EXISTS (
+            SELECT 1 FROM attempt_counter c
+            WHERE c.test_id = exam_attempt.test_id
+              AND c.session_hash = exam_attempt.session_hash
+          )
+        GROUP BY test_id, session_hash
+        """,
+    ],
+}
+
+
+def rename_legacy_tables(engine: Engine) -> List[str]:
+    """
+    Rename legacy auto-named tables to their current names.
+
+    Returns:
+        Current names of the tables that were renamed
+    """
+    existing = set(inspect(engine).get_table_names())
+    renamed = []
+    with engine.begin() as conn:
+        for legacy, current in LEGACY_TABLE_NAMES.items():
+            if legacy not in existing:
+                continue
+            if current in existing:
+                rows = conn.execute(select(func.count()).select_from(table(current))).scalar()
+                if rows:
+                    logger.warning(
+                        "Tables %s and %s both hold rows; leaving %s in place, migrate it by hand",
+                        legacy, current, legacy
+                    )
+                    continue
+                conn.exec_driver_sql(f"DROP TABLE {current}")
+            conn.exec_driver_sql(f"ALTER TABLE {legacy} RENAME TO {current}")
+
+            # Indexes added to the model since the legacy table was created
+            model_table = Base.metadata.tables.get(current)
+            if model_table is not None:
+                columns = {c["name"] for c in inspect(conn).get_columns(current)}
+                for index in model_table.indexes:
+                    if {c.name for c in index.columns} <= columns:
+                        index.create(conn, checkfirst=True)
+                    else:
+                        logger.warning("Skipping index %s: %s lacks its columns", index.name, current)
+            renamed.append(current)
+            logger.info("Renamed legacy table %s to %s", legacy, current)
+
+        for current in renamed:
+            statements = BACKFILLS.get(current, [])
+            if statements:
+                # Tables the backfill writes may not exist before create_all
+                Base.metadata.create_all(bind=conn, checkfirst=True)
+            for statement in statements:
+                conn.exec_driver_sql(statement)
+    return renamed
@@ -0,0 +1,21 @@
+"""
+INSERT ... ON CONFLICT for the dialects the app runs on (SQLite and
+PostgreSQL). Both expose the same on_conflict_do_nothing /
+on_conflict_do_update API on their dialect-specific insert().
+"""
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+_DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def dialect_insert(db: Session, table):
+    """insert(table) for the session's dialect, with ON CONFLICT support."""
+    name = db.get_bind().dialect.name
+    try:
+        return _DIALECT_INSERTS[name](table)
+    except KeyError:
+        raise NotImplementedError(f"INSERT ... ON CONFLICT is not supported on {name}")
@@ -1,17 +1,116 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.api.v1.router import api_router
-from app.db.session import engine
+from app.db.session import engine, SessionLocal
+from app.db.legacy_tables import rename_legacy_tables
 from app.models.base_class import Base
 from app import models # Ensure models are registered
+from app.services.pdf_render_pool import pdf_render_pool
+from app.services.pdf_service import get_pdf_service, sweep_legacy_pdf_files
+from app.services.mastery_service import MasteryService
+from app.services.adaptive_difficulty import recommendation_states
+from app.services.practice_plan import PracticePlanService
+from app.services.concept_catalog import ConceptSyncService, concept_catalog
 
-# Create database tables
+logger = logging.getLogger(__name__)
+
+# Create database tables (after moving data out of legacy auto-named ones)
+rename_legacy_tables(engine)
 Base.metadata.create_all(bind=engine)
 
+
+async def run_periodically(job, interval_seconds: float):
+    """Run a blocking job in a thread every interval; failures don't stop the loop."""
+    while True:
+        try:
+            await asyncio.to_thread(job)
+        except Exception:
+            logger.exception("Periodic job %s failed", job.__name__)
+        await asyncio.sleep(interval_seconds)
+
+
+async def run_daily(job, hour: int):
+    """Run a blocking job in a thread every day at the given local hour."""
+    while True:
+        now = datetime.now()
+        next_run = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        await asyncio.sleep((next_run - now).total_seconds())
+        try:
+            await asyncio.to_thread(job)
+        except Exception:
+            logger.exception("Daily job %s failed", job.__name__)
+
+
+def sweep_temp_pdfs():
+    """Remove PDFs left in the temp dir by the old file-based downloads."""
+    return sweep_legacy_pdf_files(settings.PDF_TEMP_MAX_AGE_SECONDS)
+
+
+def flag_due_reviews():
+    """Mark mastery records whose spaced-repetition review is due."""
+    db = SessionLocal()
+    try:
+        return MasteryService.flag_due_reviews(db)
+    finally:
+        db.close()
+
+
+def precompute_practice_plans():
+    """Build tomorrow's practice plans for all active students."""
+    db = SessionLocal()
+    try:
+        result = PracticePlanService.run_batch(db)
+        logger.info("Practice plans precomputed: %s", result)
+        return result
+    finally:
+        db.close()
+
+
+def load_concepts():
+    """Sync taxonomies into the concept table (or just load it) and warm the concept cache."""
+    db = SessionLocal()
+    try:
+        if settings.CONCEPT_SYNC_ON_STARTUP:
+            return ConceptSyncService.sync(db)
+        return {"cached": concept_catalog.warm(db)}
+    finally:
+        db.close()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile templates into the shared bytecode cache before the PDF workers
+    # fork, so the first download doesn't pay for parsing
+    await asyncio.to_thread(get_pdf_service)
+    pdf_render_pool.start()
+    await asyncio.to_thread(recommendation_states.load)
+    await asyncio.to_thread(load_concepts)
+    background_tasks = [
+        asyncio.create_task(run_periodically(sweep_temp_pdfs, settings.PDF_TEMP_SWEEP_INTERVAL_SECONDS)),
+        asyncio.create_task(run_periodically(flag_due_reviews, settings.MASTERY_REVIEW_SCAN_INTERVAL_SECONDS)),
+    ]
+    if settings.PRACTICE_PLAN_BATCH_ENABLED:
+        background_tasks.append(asyncio.create_task(
+            run_daily(precompute_practice_plans, settings.PRACTICE_PLAN_BATCH_HOUR)
+        ))
+    yield
+    for task in background_tasks:
+        task.cancel()
+    pdf_render_pool.shutdown()
+    await asyncio.to_thread(recommendation_states.save)
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
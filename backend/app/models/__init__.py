@@ -1,3 +1,6 @@
 from app.models.user import User
 from app.models.test import Test, Question
 from app.models.session import TestSession
+from app.models.response_event import ResponseEvent
+from app.models.question_concept import QuestionConcept
+from app.models.practice_plan import PracticePlan
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Float, Boolean, Text, TypeDecorator
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Float, Boolean, Text, TypeDecorator, Index, false
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.models.base_class import Base
@@ -73,6 +73,8 @@ class MasteryRecord(Base):
     Tracks a student's mastery of a specific concept.
     Uses spaced repetition (SM-2 algorithm) for optimal review scheduling.
     """
+    __tablename__ = "mastery_record"
+
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     
     # Links to test access (not user, to maintain PII-minimal design)
@@ -110,3 +112,15 @@ class MasteryRecord(Base):
     # Relationships
     test = relationship("Test")
     concept = relationship("Concept")
+    
+    __table_args__ = (
+        # Due-review lookups and counts per student
+        Index("ix_mastery_record_test_review_due", "test_id", "next_review_due"),
+        # Scheduler scan for records whose review time has passed
+        Index(
+            "ix_mastery_record_review_pending",
+            "next_review_due",
+            postgresql_where=needs_review == false(),
+            sqlite_where=needs_review == false()
+        ),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Float, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Float, Boolean, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.models.base_class import Base
@@ -11,6 +11,8 @@ class ExamAttempt(Base):
     Tracks individual exam attempts for PII-minimal access control.
     Links TEST_ID + ACCESS_CODE without requiring user accounts.
     """
+    __tablename__ = "exam_attempt"
+
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     
     # Test identification
@@ -23,7 +25,7 @@ class ExamAttempt(Base):
     completed_at = Column(DateTime, nullable=True)
     
     # Session identification (no PII)
-    session_hash = Column(String, index=True)  # Hashed IP + User Agent for basic tracking
+    session_hash = Column(String)  # Hashed IP + User Agent for basic tracking
     
     # Results
     answers = Column(JSON)  # {question_index: answer}
@@ -37,12 +39,20 @@ class ExamAttempt(Base):
     # Relationships
     test = relationship("Test")
 
+    __table_args__ = (
+        # Every access-control lookup is per (test, session); is_completed and
+        # score make the attempt count / best score aggregate index-only
+        Index("ix_exam_attempt_test_session", "test_id", "session_hash", "is_completed", "score"),
+    )
+
 
 class AttemptRequest(Base):
     """
     Tracks requests for additional attempts beyond the default limit.
     Requires admin approval.
     """
+    __tablename__ = "attempt_request"
+
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     
     # Test identification
@@ -64,3 +74,25 @@ class AttemptRequest(Base):
     
     # Relationships
     test = relationship("Test")
+
+    __table_args__ = (
+        # Admin queue of pending requests, oldest first
+        Index(
+            "ix_attempt_request_pending",
+            "created_at",
+            postgresql_where=status == "pending",
+            sqlite_where=status == "pending"
+        ),
+    )
+
+
+class AttemptCounter(Base):
+    """
+    Attempts started per (test, session). Incremented atomically when an
+    attempt starts; the value is that attempt's attempt_number.
+    """
+    __tablename__ = "attempt_counter"
+
+    test_id = Column(UUID, ForeignKey("test.id"), primary_key=True)
+    session_hash = Column(String, primary_key=True)
+    attempts_used = Column(Integer, nullable=False, default=0)
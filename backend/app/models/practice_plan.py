@@ -0,0 +1,18 @@
+from sqlalchemy import Column, DateTime, ForeignKey, JSON
+from app.models.base_class import Base
+from app.models.test import UUID
+
+
+class PracticePlan(Base):
+    """
+    Precomputed daily practice plan for one student (test access).
+    Written by the nightly batch; items are compact
+    [concept_id, section, difficulty_score, current_mastery] rows.
+    """
+    __tablename__ = "practice_plan"
+
+    test_id = Column(UUID, ForeignKey("test.id"), primary_key=True)
+    items = Column(JSON, nullable=False)
+    computed_at = Column(DateTime, nullable=False)
+    # Latest mastery update the plan was built from
+    source_updated_at = Column(DateTime)
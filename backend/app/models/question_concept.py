@@ -0,0 +1,21 @@
+from sqlalchemy import Column, String, ForeignKey, Float, Index
+from app.models.base_class import Base
+from app.models.test import UUID
+
+
+class QuestionConcept(Base):
+    """
+    Normalized question <-> concept mapping (Question.concept_ids as rows).
+    difficulty_score is copied from the question so "items for concept X in
+    a difficulty range" is a single index range scan.
+    """
+    __tablename__ = "question_concept"
+
+    question_id = Column(UUID, ForeignKey("question.id", ondelete="CASCADE"), primary_key=True)
+    concept_id = Column(String, primary_key=True)
+    difficulty_score = Column(Float, nullable=False)
+
+    __table_args__ = (
+        # Range lookups by concept and difficulty; question_id makes the scan index-only
+        Index("ix_question_concept_concept_difficulty", "concept_id", "difficulty_score", "question_id"),
+    )
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Float, Boolean, Index
+from sqlalchemy.sql import func
+from app.models.base_class import Base
+from app.models.test import UUID
+
+
+class ResponseEvent(Base):
+    """
+    Append-only log of answered questions.
+    MasteryRecord rows are a projection of these events and can be rebuilt
+    from them whenever the mastery algorithm changes.
+    """
+    __tablename__ = "response_event"
+
+    # Monotonic key: gives a total order for replay, even within one batch
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    
+    # Links to test access (not user, to maintain PII-minimal design)
+    test_id = Column(UUID, ForeignKey("test.id"), nullable=False)
+    concept_id = Column(String, nullable=False)
+    question_id = Column(UUID, nullable=True)
+    
+    # Response
+    is_correct = Column(Boolean, nullable=False)
+    time_taken_seconds = Column(Float, nullable=False)
+    had_hint = Column(Boolean, default=False, nullable=False)
+    answered_at = Column(DateTime, nullable=False)
+    
+    recorded_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Replay streams events per (student, concept) in log order
+        Index("ix_response_event_test_concept_id", "test_id", "concept_id", "id"),
+    )
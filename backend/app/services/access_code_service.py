@@ -1,14 +1,139 @@
+"""
+Access code authentication and attempt limiting.
+
+Validation is on the path of every exam start, so it costs one query: the
+test's gate fields (code, attempt limit, expiration, active flag) joined with
+the session's attempt count and best score. Gate fields rarely change, so they
+are kept in a small per-process cache; on a hit only the attempt aggregate is
+queried. Admin changes to a test's gate call invalidate_test_gate(); the TTL
+bounds staleness in other worker processes.
+
+Starting an attempt does not count rows: attempt_counter holds one row per
+(test, session), and a single INSERT ... ON CONFLICT DO UPDATE ... WHERE
+attempts_used < max_attempts both hands out the next attempt number and
+enforces the limit. The row lock taken by the upsert serializes concurrent
+starts from the same session, so numbers are never duplicated and the limit
+can't be overshot.
+"""
 import secrets
 import string
 import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Optional, Tuple
 from datetime import datetime, timedelta
+from sqlalchemy import case, func, select, true
 from sqlalchemy.orm import Session
+from app.config import settings
+from app.db.upsert import dialect_insert
 from app.models.test import Test
-from app.models.exam_attempt import ExamAttempt, AttemptRequest
+from app.models.exam_attempt import AttemptCounter, ExamAttempt, AttemptRequest
 import uuid
 
 
+@dataclass(frozen=True)
+class TestGate:
+    """The fields of a test that decide whether a code opens it."""
+    title: Optional[str]
+    access_code: Optional[str]
+    max_attempts: int
+    code_expiration: Optional[datetime]
+    is_active: bool
+    passing_score: float
+
+
+GATE_COLUMNS = (
+    Test.title, Test.access_code, Test.max_attempts, Test.code_expiration,
+    Test.is_active, Test.passing_score,
+)
+
+
+def _gate_from_row(row) -> TestGate:
+    return TestGate(
+        title=row.title,
+        access_code=row.access_code,
+        max_attempts=row.max_attempts if row.max_attempts is not None else 3,
+        code_expiration=row.code_expiration,
+        is_active=row.is_active is not False,
+        passing_score=row.passing_score if row.passing_score is not None else 0.6,
+    )
+
+
+class _TestGateCache:
+    """Per-process LRU of TestGate by test_id, entries expire after ttl_seconds."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[uuid.UUID, Tuple[TestGate, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, test_id: uuid.UUID) -> Optional[TestGate]:
+        with self._lock:
+            entry = self._entries.get(test_id)
+            if entry is None:
+                return None
+            gate, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[test_id]
+                return None
+            self._entries.move_to_end(test_id)
+            return gate
+
+    def put(self, test_id: uuid.UUID, gate: TestGate) -> None:
+        with self._lock:
+            self._entries[test_id] = (gate, time.monotonic() + self.ttl)
+            self._entries.move_to_end(test_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, test_id: Optional[uuid.UUID] = None) -> None:
+        with self._lock:
+            if test_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(test_id, None)
+
+
+_gate_cache = _TestGateCache(settings.ACCESS_GATE_CACHE_TTL_SECONDS)
+
+
+def _gate_error(gate: TestGate, access_code: str, attempts_used: int) -> Optional[str]:
+    if not gate.is_active:
+        return "This test is no longer active"
+    if gate.access_code != access_code.replace("-", "").upper():
+        return "Invalid access code"
+    if gate.code_expiration and gate.code_expiration < datetime.now():
+        return "Access code has expired"
+    if attempts_used >= gate.max_attempts:
+        return f"Maximum attempts ({gate.max_attempts}) reached. Request additional attempts if needed."
+    return None
+
+
+def invalidate_test_gate(test_id: Optional[uuid.UUID] = None) -> None:
+    """Drop cached gate fields after a test's code, limit, expiration or status changes."""
+    _gate_cache.invalidate(test_id)
+
+
+@dataclass
+class AccessCheck:
+    """Result of AccessCodeService.check_access."""
+    gate: Optional[TestGate]
+    attempts_used: int
+    best_score: float
+    error: Optional[str] = None
+
+    @property
+    def is_valid(self) -> bool:
+        return self.error is None
+
+    @property
+    def attempts_remaining(self) -> int:
+        return max(0, self.gate.max_attempts - self.attempts_used) if self.gate else 0
+
+
 class AccessCodeService:
     """
     Service for managing TEST_ID + ACCESS_CODE authentication.
@@ -45,6 +170,60 @@ class AccessCodeService:
         session_string = f"{ip_address}:{user_agent}"
         return hashlib.sha256(session_string.encode()).hexdigest()
     
+    @staticmethod
+    def get_test_gate(db: Session, test_id: uuid.UUID) -> Optional[TestGate]:
+        """Gate fields of a test (cached), or None if the test does not exist."""
+        gate = _gate_cache.get(test_id)
+        if gate is None:
+            row = db.execute(select(*GATE_COLUMNS).where(Test.id == test_id)).first()
+            if row is None:
+                return None
+            gate = _gate_from_row(row)
+            _gate_cache.put(test_id, gate)
+        return gate
+    
+    @staticmethod
+    def check_access(
+        db: Session,
+        test_id: uuid.UUID,
+        access_code: str,
+        session_hash: str
+    ) -> AccessCheck:
+        """
+        Validate access code and check attempt limits in one query.
+        
+        Returns:
+            AccessCheck with the gate, the session's attempt count and best
+            completed score, and an error message if access is denied
+        """
+        stats = (
+            select(
+                func.count().label("attempts_used"),
+                func.max(case((ExamAttempt.is_completed == True, ExamAttempt.score))).label("best_score"),  # noqa: E712
+            )
+            .where(ExamAttempt.test_id == test_id, ExamAttempt.session_hash == session_hash)
+        )
+        
+        gate = _gate_cache.get(test_id)
+        if gate is not None:
+            row = db.execute(stats).one()
+        else:
+            # Cache miss: fetch the gate alongside the (single-row) aggregate
+            stats = stats.subquery()
+            row = db.execute(
+                select(*GATE_COLUMNS, stats.c.attempts_used, stats.c.best_score)
+                .join(stats, true())
+                .where(Test.id == test_id)
+            ).first()
+            if row is None:
+                return AccessCheck(None, 0, 0.0, "Test not found")
+            gate = _gate_from_row(row)
+            _gate_cache.put(test_id, gate)
+        
+        check = AccessCheck(gate, row.attempts_used, row.best_score or 0.0)
+        check.error = _gate_error(gate, access_code, check.attempts_used)
+        return check
+    
     @staticmethod
     def validate_access_code(
         db: Session,
@@ -58,33 +237,49 @@ class AccessCodeService:
         Returns:
             (is_valid, error_message)
         """
-        # Get test
-        test = db.query(Test).filter(Test.id == test_id).first()
-        if not test:
-            return False, "Test not found"
-        
-        # Check if test is active
-        if not test.is_active:
-            return False, "This test is no longer active"
-        
-        # Verify access code
-        if test.access_code != access_code.replace("-", "").upper():
-            return False, "Invalid access code"
-        
-        # Check expiration
-        if test.code_expiration and test.code_expiration < datetime.now():
-            return False, "Access code has expired"
-        
-        # Count attempts for this session
-        attempts = db.query(ExamAttempt).filter(
-            ExamAttempt.test_id == test_id,
-            ExamAttempt.session_hash == session_hash
-        ).count()
+        check = AccessCodeService.check_access(db, test_id, access_code, session_hash)
+        return check.is_valid, check.error
+    
+    @staticmethod
+    def allocate_attempt_number(
+        db: Session,
+        test_id: uuid.UUID,
+        session_hash: str
+    ) -> Optional[int]:
+        """
+        Atomically reserve the session's next attempt number.
         
-        if attempts >= test.max_attempts:
-            return False, f"Maximum attempts ({test.max_attempts}) reached. Request additional attempts if needed."
+        The limit is read from the test row inside the same statement, so it
+        is never stale. Does not commit: the reservation is rolled back with
+        the transaction if the attempt is not created.
         
-        return True, None
+        Returns:
+            The attempt number, or None if max_attempts is used up
+        """
+        counter = AttemptCounter.__table__
+        max_attempts = select(Test.max_attempts).where(Test.id == test_id).scalar_subquery()
+        stmt = (
+            dialect_insert(db, counter)
+            .values(test_id=test_id, session_hash=session_hash, attempts_used=1)
+            .on_conflict_do_update(
+                index_elements=[counter.c.test_id, counter.c.session_hash],
+                set_={"attempts_used": counter.c.attempts_used + 1},
+                where=counter.c.attempts_used < max_attempts
+            )
+            .returning(counter.c.attempts_used)
+        )
+        return db.execute(stmt).scalar()
+    
+    @staticmethod
+    def get_attempts_used(db: Session, test_id: uuid.UUID, session_hash: str) -> int:
+        """Attempts started by a session (primary-key lookup on its counter)."""
+        used = db.execute(
+            select(AttemptCounter.attempts_used).where(
+                AttemptCounter.test_id == test_id,
+                AttemptCounter.session_hash == session_hash
+            )
+        ).scalar()
+        return used or 0
     
     @staticmethod
     def start_exam_attempt(
@@ -99,19 +294,14 @@ class AccessCodeService:
         Returns:
             ExamAttempt object or None if validation fails
         """
-        # Validate access
-        is_valid, error = AccessCodeService.validate_access_code(
-            db, test_id, access_code, session_hash
-        )
-        
-        if not is_valid:
+        # Validate the code (the attempt limit is enforced by the counter)
+        gate = AccessCodeService.get_test_gate(db, test_id)
+        if gate is None or _gate_error(gate, access_code, 0):
             return None
         
-        # Count existing attempts
-        attempt_number = db.query(ExamAttempt).filter(
-            ExamAttempt.test_id == test_id,
-            ExamAttempt.session_hash == session_hash
-        ).count() + 1
+        attempt_number = AccessCodeService.allocate_attempt_number(db, test_id, session_hash)
+        if attempt_number is None:
+            return None
         
         # Create new attempt
         attempt = ExamAttempt(
@@ -170,11 +360,7 @@ class AccessCodeService:
         Submit a request for additional attempts.
         Requires admin approval.
         """
-        # Count current attempts
-        current_attempts = db.query(ExamAttempt).filter(
-            ExamAttempt.test_id == test_id,
-            ExamAttempt.session_hash == session_hash
-        ).count()
+        current_attempts = AccessCodeService.get_attempts_used(db, test_id, session_hash)
         
         # Create request
         request = AttemptRequest(
@@ -201,7 +387,7 @@ class AccessCodeService:
         """
         Get summary of attempts for a session.
         """
-        test = db.query(Test).filter(Test.id == test_id).first()
+        gate = AccessCodeService.get_test_gate(db, test_id)
         attempts = db.query(ExamAttempt).filter(
             ExamAttempt.test_id == test_id,
             ExamAttempt.session_hash == session_hash
@@ -212,12 +398,12 @@ class AccessCodeService:
         
         return {
             "test_id": str(test_id),
-            "test_title": test.title if test else "Unknown",
+            "test_title": gate.title if gate else "Unknown",
             "attempts_used": len(attempts),
-            "max_attempts": test.max_attempts if test else 0,
-            "attempts_remaining": max(0, (test.max_attempts if test else 0) - len(attempts)),
+            "max_attempts": gate.max_attempts if gate else 0,
+            "attempts_remaining": max(0, (gate.max_attempts if gate else 0) - len(attempts)),
             "best_score": best_score,
-            "passed": best_score >= (test.passing_score if test else 0.6),
+            "passed": best_score >= (gate.passing_score if gate else 0.6),
             "attempts": [
                 {
                     "attempt_number": a.attempt_number,
@@ -0,0 +1,347 @@
+"""
+Multi-stage adaptive diagnostic.
+
+Instead of generating a fixed 12-question test per request, the diagnostic
+is served as a series of short testlets drawn from the tagged question pool
+(question_concept):
+
+1. A routing testlet covers the grade's foundational concepts (no in-grade
+   prerequisites), most-depended-on first.
+2. Each answer updates P(mastered) for its concept using that concept's BKT
+   slip/guess rates. A concept is settled once the posterior crosses
+   MASTERED_AT / NOT_MASTERED_AT, or after MAX_ITEMS_PER_CONCEPT items.
+3. Settled concepts prune the prerequisite graph: a mastered concept implies
+   its prerequisites, and a concept that is not mastered implies the same
+   for everything built on it, so neither side is probed.
+4. Later testlets branch to the open concepts whose answers are expected to
+   settle the most others, and the diagnostic stops when nothing is left to
+   probe or MAX_ITEMS have been asked.
+
+The protocol is stateless: the client sends back every answer so far, and
+the server grades them against the stored questions and decides the next step.
+"""
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app.data.taxonomy_graph import CompiledTaxonomy
+from app.data.taxonomy_packs import get_taxonomy
+from app.models.test import Question
+from app.services import bkt
+from app.services.item_retrieval import ItemRetrievalService
+from app.services.learning_path import LearningPathPlanner
+import uuid
+
+MASTERED = "mastered"
+NOT_MASTERED = "not_mastered"
+INFERRED_MASTERED = "inferred_mastered"
+INFERRED_NOT_MASTERED = "inferred_not_mastered"
+UNCERTAIN = "uncertain"  # Item budget for the concept spent without a decision
+NO_ITEMS = "no_items"  # Nothing left in the pool for the concept
+OPEN = "open"
+
+
+@dataclass
+class ConceptEstimate:
+    concept_id: str
+    p_mastered: float
+    items: int = 0
+    correct: int = 0
+    last_correct: Optional[bool] = None
+    status: str = OPEN
+
+
+class AdaptiveDiagnosticService:
+    """Service for the early-stopping, testlet-based diagnostic."""
+
+    PRIOR = 0.5
+    GRAPH_PRIOR_RANGE = (0.2, 0.8)  # Never settled by the prior alone
+    MASTERED_AT = 0.85
+    NOT_MASTERED_AT = 0.1  # One wrong answer from the prior stays open (a slip)
+    MAX_ITEMS_PER_CONCEPT = 3
+    MAX_ITEMS = 12
+    ROUTING_SIZE = 3
+    TESTLET_SIZE = 4
+
+    # Difficulty bands: grade level first, then harder after a correct answer
+    # and easier after a wrong one
+    FIRST_BAND = (0.35, 0.65)
+    HARDER_BAND = (0.5, 0.85)
+    EASIER_BAND = (0.15, 0.5)
+
+    @staticmethod
+    def posterior(p_mastered: float, is_correct: bool, params: bkt.BKTParams) -> float:
+        """P(mastered | answer): Bayes with the concept's slip and guess rates."""
+        if is_correct:
+            known, unknown = p_mastered * (1 - params.p_slip), (1 - p_mastered) * params.p_guess
+        else:
+            known, unknown = p_mastered * params.p_slip, (1 - p_mastered) * (1 - params.p_guess)
+        return known / (known + unknown)
+
+    @staticmethod
+    def grade_responses(
+        db: Session,
+        taxonomy: CompiledTaxonomy,
+        responses: List[Dict]
+    ) -> List[Tuple[uuid.UUID, str, bool]]:
+        """
+        Grade answers against the stored questions (one query).
+
+        Args:
+            responses: [{"question_id", "answer"}, ...] in the order answered
+
+        Returns:
+            [(question_id, concept_id, is_correct), ...] for questions tagged
+            with a concept of this taxonomy
+        """
+        question_ids = list(dict.fromkeys(uuid.UUID(str(r["question_id"])) for r in responses))
+        if not question_ids:
+            return []
+        questions = {
+            q.id: q for q in db.query(Question).filter(Question.id.in_(question_ids)).all()
+        }
+
+        graded = []
+        seen: Set[uuid.UUID] = set()
+        for response in responses:
+            question = questions.get(uuid.UUID(str(response["question_id"])))
+            if question is None or question.id in seen:
+                continue
+            seen.add(question.id)
+            concept_id = next((c for c in question.concept_ids or [] if c in taxonomy), None)
+            if concept_id is None:
+                continue
+            graded.append((question.id, concept_id, response.get("answer") == question.correct_answer))
+        return graded
+
+    @staticmethod
+    def _in_scope_closure(i: int, scope: Set[int], edges: List[List[int]]) -> List[int]:
+        """Concepts reachable from i along edges (prerequisites or dependents), within scope."""
+        found, queue = set(), deque([i])
+        while queue:
+            for j in edges[queue.popleft()]:
+                if j in scope and j not in found:
+                    found.add(j)
+                    queue.append(j)
+        return list(found)
+
+    @staticmethod
+    def estimate(
+        taxonomy: CompiledTaxonomy,
+        scope: List[int],
+        graded: List[Tuple[uuid.UUID, str, bool]]
+    ) -> Dict[int, ConceptEstimate]:
+        """
+        Posterior and status for every in-scope concept, with graph inference
+        applied. Concepts are visited prerequisites first, and a concept's
+        prior is the mean P(mastered) of its in-grade prerequisites (clamped
+        to GRAPH_PRIOR_RANGE), so answers on foundations shift the starting
+        belief for what builds on them.
+        """
+        service = AdaptiveDiagnosticService
+        scope_set = set(scope)
+        answers: Dict[int, List[bool]] = {}
+        for _, concept_id, is_correct in graded:
+            i = taxonomy.index[concept_id]
+            if i in scope_set:
+                answers.setdefault(i, []).append(is_correct)
+
+        lo, hi = service.GRAPH_PRIOR_RANGE
+        estimates: Dict[int, ConceptEstimate] = {}
+        for i in taxonomy.topological_order:
+            if i not in scope_set:
+                continue
+            prereqs = [estimates[j].p_mastered for j in taxonomy.prerequisites[i] if j in scope_set]
+            p = min(hi, max(lo, sum(prereqs) / len(prereqs))) if prereqs else service.PRIOR
+            estimate = ConceptEstimate(taxonomy.ids[i], p)
+            params = bkt.get_params(estimate.concept_id)
+            for is_correct in answers.get(i, []):
+                estimate.p_mastered = service.posterior(estimate.p_mastered, is_correct, params)
+                estimate.items += 1
+                estimate.correct += int(is_correct)
+                estimate.last_correct = is_correct
+
+            if estimate.items:
+                if estimate.p_mastered >= service.MASTERED_AT:
+                    estimate.status = MASTERED
+                elif estimate.p_mastered <= service.NOT_MASTERED_AT:
+                    estimate.status = NOT_MASTERED
+                elif estimate.items >= service.MAX_ITEMS_PER_CONCEPT:
+                    estimate.status = UNCERTAIN
+            estimates[i] = estimate
+
+        # Propagate settled answers through the in-grade prerequisite graph;
+        # a concept implied both ways stays open so it gets probed
+        implied_mastered: Set[int] = set()
+        implied_not: Set[int] = set()
+        for i, estimate in estimates.items():
+            if estimate.status == MASTERED:
+                implied_mastered.update(service._in_scope_closure(i, scope_set, taxonomy.prerequisites))
+            elif estimate.status == NOT_MASTERED:
+                implied_not.update(service._in_scope_closure(i, scope_set, taxonomy.dependents))
+        for i in implied_mastered ^ implied_not:
+            estimate = estimates[i]
+            if estimate.status == OPEN:
+                estimate.status = INFERRED_MASTERED if i in implied_mastered else INFERRED_NOT_MASTERED
+        return estimates
+
+    @staticmethod
+    def _next_concepts(
+        taxonomy: CompiledTaxonomy,
+        scope: List[int],
+        estimates: Dict[int, ConceptEstimate],
+        first_stage: bool
+    ) -> List[int]:
+        """
+        Concepts for the next testlet. After routing, each open concept is
+        scored by how many open concepts its answer is expected to settle:
+        P(mastered) x open prerequisites + P(not mastered) x open dependents.
+        Concepts on one prerequisite chain are not asked in the same testlet.
+        """
+        service = AdaptiveDiagnosticService
+        scope_set = set(scope)
+        ancestors = {i: set(service._in_scope_closure(i, scope_set, taxonomy.prerequisites)) for i in scope}
+        descendants = {i: set(service._in_scope_closure(i, scope_set, taxonomy.dependents)) for i in scope}
+
+        if first_stage:
+            roots = [i for i in scope if not ancestors[i]]
+            return sorted(roots, key=lambda i: -len(descendants[i]))[:service.ROUTING_SIZE]
+
+        open_concepts = {i for i in scope if estimates[i].status == OPEN}
+
+        def expected_settled(i: int) -> float:
+            p = estimates[i].p_mastered
+            return p * len(ancestors[i] & open_concepts) + (1 - p) * len(descendants[i] & open_concepts)
+
+        testlet: List[int] = []
+        related: Set[int] = set()
+        for i in sorted(open_concepts, key=lambda i: (-expected_settled(i), taxonomy.position[i])):
+            if i in related:
+                continue
+            testlet.append(i)
+            related |= ancestors[i] | descendants[i]
+            if len(testlet) == service.TESTLET_SIZE:
+                break
+        return testlet
+
+    @staticmethod
+    def _pick_item(db: Session, estimate: ConceptEstimate, used: Set[uuid.UUID]) -> Optional[Dict]:
+        service = AdaptiveDiagnosticService
+        if estimate.last_correct is None:
+            band = service.FIRST_BAND
+        else:
+            band = service.HARDER_BAND if estimate.last_correct else service.EASIER_BAND
+        for lo, hi in (band, (0.0, 1.0)):
+            items = ItemRetrievalService.find_items(db, estimate.concept_id, lo, hi, 1, exclude=used)
+            if items:
+                return items[0]
+        return None
+
+    @staticmethod
+    def _question_payloads(db: Session, picks: List[Tuple[str, Dict]]) -> List[Dict]:
+        """Client-facing items (no answers) for the picked questions, one query."""
+        if not picks:
+            return []
+        questions = {
+            q.id: q for q in db.query(Question).filter(
+                Question.id.in_([item["question_id"] for _, item in picks])
+            ).all()
+        }
+        return [
+            {
+                "question_id": str(item["question_id"]),
+                "concept_id": concept_id,
+                "difficulty_score": item["difficulty_score"],
+                "question_text": questions[item["question_id"]].question_text,
+                "question_type": questions[item["question_id"]].question_type,
+                "options": questions[item["question_id"]].options,
+            }
+            for concept_id, item in picks
+            if item["question_id"] in questions
+        ]
+
+    @staticmethod
+    def _results(taxonomy: CompiledTaxonomy, grade_level: int, estimates: Dict[int, ConceptEstimate]) -> Dict:
+        levels = {}
+        for estimate in estimates.values():
+            if estimate.status == INFERRED_MASTERED:
+                levels[estimate.concept_id] = 1.0
+            elif estimate.items:
+                levels[estimate.concept_id] = estimate.p_mastered
+        path = LearningPathPlanner(taxonomy, grade_level).plan(levels)
+
+        by_status: Dict[str, List[str]] = {}
+        for estimate in estimates.values():
+            by_status.setdefault(estimate.status, []).append(estimate.concept_id)
+        return {
+            "mastered": by_status.get(MASTERED, []) + by_status.get(INFERRED_MASTERED, []),
+            "needs_work": by_status.get(NOT_MASTERED, []) + by_status.get(INFERRED_NOT_MASTERED, []),
+            "uncertain": by_status.get(UNCERTAIN, []) + by_status.get(OPEN, []),
+            "not_assessable": by_status.get(NO_ITEMS, []),
+            "recommended_starting_point": path[0]["concept_id"] if path else None,
+            "learning_path": path,
+        }
+
+    @staticmethod
+    def next_step(
+        db: Session,
+        grade_level: int,
+        responses: List[Dict],
+        exam_standard: str = "NCDPI"
+    ) -> Dict:
+        """
+        Grade the answers so far and return the next testlet, or the final
+        results once every concept is settled or the item budget is spent.
+
+        Args:
+            db: Database session
+            grade_level: Grade whose concepts are diagnosed
+            responses: [{"question_id", "answer"}, ...] for every item answered so far
+            exam_standard: Taxonomy to diagnose against
+
+        Returns:
+            {"status": "in_progress", "testlet": [...], ...} or
+            {"status": "complete", "results": {...}, ...}
+        """
+        service = AdaptiveDiagnosticService
+        taxonomy = get_taxonomy(exam_standard)
+        scope = list(taxonomy.by_grade.get(grade_level, []))
+        if not scope:
+            raise ValueError(f"No {exam_standard} concepts for grade {grade_level}")
+
+        graded = service.grade_responses(db, taxonomy, responses)
+        estimates = service.estimate(taxonomy, scope, graded)
+        used = {question_id for question_id, _, _ in graded}
+
+        picks: List[Tuple[str, Dict]] = []
+        budget = service.MAX_ITEMS - len(graded)
+        first_stage = not graded
+        while budget > 0 and not picks:
+            concepts = service._next_concepts(taxonomy, scope, estimates, first_stage)[:budget]
+            if not concepts:
+                break
+            for i in concepts:
+                item = service._pick_item(db, estimates[i], used)
+                if item is None:
+                    estimates[i].status = NO_ITEMS
+                    continue
+                used.add(item["question_id"])
+                picks.append((estimates[i].concept_id, item))
+            # Concepts without items are settled now; look again for ready ones
+            first_stage = False
+
+        summary = {
+            "items_answered": len(graded),
+            "concepts": [asdict(estimates[i]) for i in scope],
+        }
+        if picks:
+            return {
+                "status": "in_progress",
+                "testlet": service._question_payloads(db, picks),
+                **summary,
+            }
+        return {
+            "status": "complete",
+            "results": service._results(taxonomy, grade_level, estimates),
+            **summary,
+        }
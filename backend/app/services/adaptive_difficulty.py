@@ -1,7 +1,20 @@
-from typing import List, Dict, Optional
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+import heapq
+import json
+import os
+import threading
 from sqlalchemy.orm import Session
+from app.config import settings
+from app.core.exceptions import TaxonomyPackError, TaxonomyPackNotFoundError
+from app.data.concept_taxonomy import get_concept_by_id
+from app.data.taxonomy_packs import get_taxonomy
 from app.models.concept import MasteryRecord
 from app.models.test import Question, DifficultyEnum
+from app.services.concept_catalog import concept_catalog
+from app.services.mastery_service import MasteryService
 import uuid
 
 
@@ -46,6 +59,19 @@ class AdaptiveDifficultyService:
             MasteryRecord.concept_id == concept_id
         ).first()
         
+        return AdaptiveDifficultyService.difficulty_for_record(mastery_record)
+    
+    @staticmethod
+    def difficulty_for_record(mastery_record: Optional[MasteryRecord]) -> float:
+        """
+        Appropriate difficulty (0.0-1.0) from an already-loaded mastery record.
+        
+        Args:
+            mastery_record: The student's record for the concept, or None
+        
+        Returns:
+            Difficulty score 0.0-1.0
+        """
         if not mastery_record or mastery_record.questions_attempted < 3:
             # Start at medium difficulty (0.5) for new concepts
             return 0.5
@@ -126,6 +152,148 @@ class PersonalizedPracticeQueue:
     Prioritizes weak concepts and mixes review with new learning.
     """
     
+    # Maintenance questions on mastered concepts are kept challenging
+    MAINTENANCE_DIFFICULTY = 0.7
+    
+    @staticmethod
+    def overdue_fraction(record: MasteryRecord, now: datetime) -> float:
+        """How far past its review date a record is, in review intervals (capped at 1)."""
+        if record.next_review_due is None or record.next_review_due > now:
+            return 0.0
+        overdue_days = (now - record.next_review_due).total_seconds() / 86400
+        return min(1.0, overdue_days / max(1, record.interval_days or 1))
+    
+    @staticmethod
+    def prerequisite_readiness(concept_id: str, levels: Dict[str, float]) -> float:
+        """
+        Share of a concept's prerequisites the student is ready to build on
+        (0.0-1.0). Prerequisites without a record count as ready, since they
+        may simply never have been assessed.
+        """
+        concept = concept_catalog.peek(concept_id) or get_concept_by_id(concept_id)
+        prerequisites = concept.get("prerequisite_concept_ids", []) if concept else []
+        if not prerequisites:
+            return 1.0
+        
+        proficient = MasteryService.PROFICIENT_THRESHOLD
+        return sum(
+            min(1.0, levels[p] / proficient) if p in levels else 1.0
+            for p in prerequisites
+        ) / len(prerequisites)
+    
+    @staticmethod
+    def dependents_of(concept_id: str) -> List[str]:
+        """
+        Concepts that list this one as a direct prerequisite, from the
+        concept's own exam-standard taxonomy (the same concept metadata
+        prerequisite_readiness reads).
+        """
+        concept = concept_catalog.peek(concept_id) or get_concept_by_id(concept_id)
+        if not concept or not concept.get("exam_standard"):
+            return []
+        try:
+            return get_taxonomy(concept["exam_standard"]).dependents_of(concept_id)
+        except (TaxonomyPackNotFoundError, TaxonomyPackError):
+            return []
+    
+    # Queue sections, in the order they appear in a session
+    WEAK, REVIEW, MAINTENANCE = 0, 1, 2
+    SECTIONS = {
+        WEAK: ("Building mastery", "high"),
+        REVIEW: ("Spaced repetition review", "medium"),
+        MAINTENANCE: ("Maintaining mastery", "low"),
+    }
+    
+    @staticmethod
+    def section_scores(
+        record: MasteryRecord,
+        levels: Dict[str, float],
+        now: datetime
+    ) -> List[Tuple[int, float]]:
+        """
+        (section, priority score) for every queue section a record belongs in,
+        best section first; higher scores come first within a section.
+        - weak: weakness (1 - mastery) scaled by prerequisite readiness, so a
+          concept is not drilled before the concepts it builds on
+        - review: how overdue the review is, then weakness
+        - maintenance: mastered concepts, most overdue first
+        """
+        overdue = PersonalizedPracticeQueue.overdue_fraction(record, now)
+        weakness = 1.0 - record.current_level
+        
+        scores = []
+        if record.current_level < MasteryService.MASTERY_THRESHOLD and not record.is_mastered:
+            readiness = PersonalizedPracticeQueue.prerequisite_readiness(record.concept_id, levels)
+            scores.append((PersonalizedPracticeQueue.WEAK, weakness * readiness + 0.5 * overdue))
+        if record.needs_review or overdue > 0:
+            scores.append((PersonalizedPracticeQueue.REVIEW, overdue + 0.5 * weakness))
+        if record.is_mastered:
+            scores.append((PersonalizedPracticeQueue.MAINTENANCE, overdue))
+        return scores
+    
+    @staticmethod
+    def queue_item(record: MasteryRecord, section: int) -> Dict:
+        """Question specification for a record in the given queue section."""
+        if section == PersonalizedPracticeQueue.MAINTENANCE:
+            difficulty = PersonalizedPracticeQueue.MAINTENANCE_DIFFICULTY
+        else:
+            difficulty = AdaptiveDifficultyService.difficulty_for_record(record)
+        reason, priority = PersonalizedPracticeQueue.SECTIONS[section]
+        return {
+            "concept_id": record.concept_id,
+            "difficulty_score": difficulty,
+            "reason": reason,
+            "current_mastery": record.current_level,
+            "priority": priority
+        }
+    
+    @staticmethod
+    def build_queue(
+        records: List[MasteryRecord],
+        target_questions: int = 20,
+        mix_ratio: float = 0.7,
+        now: Optional[datetime] = None
+    ) -> List[Dict]:
+        """
+        Build a practice queue from already-loaded mastery records (no DB access).
+        
+        One pass scores every record into a weak, review or maintenance heap
+        (see section_scores); the top entries of each heap fill the
+        mix_ratio split.
+        
+        Returns:
+            Question specifications in priority order
+        """
+        now = now or datetime.now()
+        levels = {r.concept_id: r.current_level for r in records}
+        
+        # heapq is a min-heap: negate scores; i breaks ties in load order
+        heaps = {section: [] for section in PersonalizedPracticeQueue.SECTIONS}
+        for i, record in enumerate(records):
+            for section, score in PersonalizedPracticeQueue.section_scores(record, levels, now):
+                heaps[section].append((-score, i, record))
+        
+        weak_count = int(target_questions * mix_ratio)
+        review_count = target_questions - weak_count
+        
+        practice_queue = [
+            PersonalizedPracticeQueue.queue_item(record, PersonalizedPracticeQueue.WEAK)
+            for _, _, record in heapq.nsmallest(weak_count, heaps[PersonalizedPracticeQueue.WEAK])
+        ]
+        practice_queue += [
+            PersonalizedPracticeQueue.queue_item(record, PersonalizedPracticeQueue.REVIEW)
+            for _, _, record in heapq.nsmallest(review_count, heaps[PersonalizedPracticeQueue.REVIEW])
+        ]
+        
+        # Fill remaining with mastered concepts (maintenance)
+        remaining = target_questions - len(practice_queue)
+        practice_queue += [
+            PersonalizedPracticeQueue.queue_item(record, PersonalizedPracticeQueue.MAINTENANCE)
+            for _, _, record in heapq.nsmallest(max(0, remaining), heaps[PersonalizedPracticeQueue.MAINTENANCE])
+        ]
+        
+        return practice_queue
+    
     @staticmethod
     def generate_practice_session(
         db: Session,
@@ -134,7 +302,7 @@ class PersonalizedPracticeQueue:
         mix_ratio: float = 0.7  # 70% weak concepts, 30% review
     ) -> List[Dict]:
         """
-        Generate a personalized practice session.
+        Generate a personalized practice session with a single query.
         
         Strategy:
         1. Identify weak concepts (mastery < 80%)
@@ -163,56 +331,7 @@ class PersonalizedPracticeQueue:
                 "message": "Start with a diagnostic assessment to identify your current level"
             }]
         
-        # Categorize concepts
-        weak_concepts = [r for r in records if r.current_level < 0.8 and not r.is_mastered]
-        review_concepts = [r for r in records if r.needs_review]
-        mastered_concepts = [r for r in records if r.is_mastered]
-        
-        # Calculate question distribution
-        weak_count = int(target_questions * mix_ratio)
-        review_count = target_questions - weak_count
-        
-        practice_queue = []
-        
-        # Add weak concept questions
-        for i, record in enumerate(weak_concepts[:weak_count]):
-            difficulty = AdaptiveDifficultyService.calculate_current_difficulty(
-                db, test_id, record.concept_id
-            )
-            practice_queue.append({
-                "concept_id": record.concept_id,
-                "difficulty_score": difficulty,
-                "reason": "Building mastery",
-                "current_mastery": record.current_level,
-                "priority": "high"
-            })
-        
-        # Add review questions
-        for i, record in enumerate(review_concepts[:review_count]):
-            difficulty = AdaptiveDifficultyService.calculate_current_difficulty(
-                db, test_id, record.concept_id
-            )
-            practice_queue.append({
-                "concept_id": record.concept_id,
-                "difficulty_score": difficulty,
-                "reason": "Spaced repetition review",
-                "current_mastery": record.current_level,
-                "priority": "medium"
-            })
-        
-        # Fill remaining with mastered concepts (maintenance)
-        remaining = target_questions - len(practice_queue)
-        for i, record in enumerate(mastered_concepts[:remaining]):
-            difficulty = 0.7  # Keep mastered concepts challenging
-            practice_queue.append({
-                "concept_id": record.concept_id,
-                "difficulty_score": difficulty,
-                "reason": "Maintaining mastery",
-                "current_mastery": record.current_level,
-                "priority": "low"
-            })
-        
-        return practice_queue
+        return PersonalizedPracticeQueue.build_queue(records, target_questions, mix_ratio)
     
     @staticmethod
     def get_next_question_recommendation(
@@ -259,13 +378,244 @@ class PersonalizedPracticeQueue:
                 "adjustment": adjustment
             }
         
-        # Move to next concept in queue
-        practice_queue = PersonalizedPracticeQueue.generate_practice_session(
-            db, test_id, target_questions=1
+        # Move to the top of the student's queue (kept in memory, see
+        # RecommendationStateStore; the DB is only read on a cache miss)
+        state = recommendation_states.get(db, test_id)
+        if not state.concepts:
+            # New student - start with diagnostic
+            return {
+                "type": "diagnostic",
+                "message": "Start with a diagnostic assessment to identify your current level"
+            }
+        
+        top = state.peek()
+        if top is None:
+            return {
+                "concept_id": None,
+                "difficulty_score": 0.5,
+                "reason": "No recommendations available"
+            }
+        section, snapshot = top
+        return PersonalizedPracticeQueue.queue_item(snapshot, section)
+
+
+@dataclass
+class ConceptSnapshot:
+    """The MasteryRecord fields the practice queue ranks on."""
+    concept_id: str
+    current_level: float
+    questions_attempted: int
+    questions_correct: int
+    is_mastered: bool
+    needs_review: bool
+    next_review_due: Optional[datetime]
+    interval_days: int
+    
+    @classmethod
+    def from_record(cls, record: MasteryRecord) -> "ConceptSnapshot":
+        return cls(
+            concept_id=record.concept_id,
+            current_level=record.current_level or 0.0,
+            questions_attempted=record.questions_attempted or 0,
+            questions_correct=record.questions_correct or 0,
+            is_mastered=bool(record.is_mastered),
+            needs_review=bool(record.needs_review),
+            next_review_due=record.next_review_due,
+            interval_days=record.interval_days or 1
+        )
+    
+    def to_json(self) -> Dict:
+        data = asdict(self)
+        data["next_review_due"] = self.next_review_due.isoformat() if self.next_review_due else None
+        return data
+    
+    @classmethod
+    def from_json(cls, data: Dict) -> "ConceptSnapshot":
+        due = data.get("next_review_due")
+        return cls(**{**data, "next_review_due": datetime.fromisoformat(due) if due else None})
+
+
+class StudentRecommendationState:
+    """
+    One student's practice queue as a heap, updated answer by answer.
+    
+    Heap entries are (section, -score, version, concept_id). Re-scoring a
+    concept pushes a new entry and bumps its version, so older entries are
+    skipped when they reach the top instead of being searched for. Overdue
+    scores drift with time, so the heap is rebuilt from the snapshots (no DB
+    access) when the next review falls due or after RESCORE_INTERVAL.
+    """
+    
+    RESCORE_INTERVAL = timedelta(minutes=5)
+    
+    def __init__(self, concepts: List[ConceptSnapshot], loaded_at: datetime):
+        self.concepts: Dict[str, ConceptSnapshot] = {c.concept_id: c for c in concepts}
+        self.loaded_at = loaded_at
+        self._levels = {c.concept_id: c.current_level for c in concepts}
+        self._rescore(datetime.now())
+    
+    def _rescore(self, now: datetime) -> None:
+        self._heap: List[Tuple] = []
+        self._live: Dict[str, int] = {}
+        self._version = 0
+        self._rescore_at = now + self.RESCORE_INTERVAL
+        for concept_id in self.concepts:
+            self._push(concept_id, now, heapify=False)
+        heapq.heapify(self._heap)
+    
+    def _push(self, concept_id: str, now: datetime, heapify: bool = True) -> None:
+        snapshot = self.concepts[concept_id]
+        due = snapshot.next_review_due
+        if due is not None and due > now:
+            self._rescore_at = min(self._rescore_at, due)
+        
+        scores = PersonalizedPracticeQueue.section_scores(snapshot, self._levels, now)
+        if not scores:
+            self._live.pop(concept_id, None)
+            return
+        
+        section, score = scores[0]
+        self._version += 1
+        self._live[concept_id] = self._version
+        entry = (section, -score, self._version, concept_id)
+        if heapify:
+            heapq.heappush(self._heap, entry)
+        else:
+            self._heap.append(entry)
+    
+    def observe(self, record: MasteryRecord, now: Optional[datetime] = None) -> None:
+        """Re-rank a concept after an answer, plus the concepts that build on it."""
+        now = now or datetime.now()
+        snapshot = ConceptSnapshot.from_record(record)
+        self.concepts[snapshot.concept_id] = snapshot
+        self._levels[snapshot.concept_id] = snapshot.current_level
+        
+        self._push(snapshot.concept_id, now)
+        for dependent in PersonalizedPracticeQueue.dependents_of(snapshot.concept_id):
+            if dependent in self.concepts:
+                self._push(dependent, now)
+        
+        # Drop superseded entries once they outnumber the live ones
+        if len(self._heap) > 2 * len(self.concepts) + 32:
+            self._rescore(now)
+    
+    def peek(self, now: Optional[datetime] = None) -> Optional[Tuple[int, ConceptSnapshot]]:
+        """(section, snapshot) of the highest-priority concept, or None."""
+        now = now or datetime.now()
+        if now >= self._rescore_at:
+            self._rescore(now)
+        
+        heap = self._heap
+        while heap and self._live.get(heap[0][3]) != heap[0][2]:
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        section, _, _, concept_id = heap[0]
+        return section, self.concepts[concept_id]
+
+
+class RecommendationStateStore:
+    """
+    Per-process LRU of StudentRecommendationState.
+    
+    A student's state is loaded with one query on first use and then kept
+    current from answer events, so next-question recommendations read no
+    rows. Entries are reloaded after ttl_seconds, which bounds staleness when
+    several worker processes serve the same student. If a path is set the
+    store is saved on shutdown and reloaded on startup.
+    """
+    
+    def __init__(self, ttl_seconds: float, max_students: int, path: Optional[str] = None):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_students = max_students
+        self.path = path
+        self._states: "OrderedDict[uuid.UUID, StudentRecommendationState]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _put(self, test_id: uuid.UUID, state: StudentRecommendationState) -> None:
+        self._states[test_id] = state
+        self._states.move_to_end(test_id)
+        while len(self._states) > self.max_students:
+            self._states.popitem(last=False)
+    
+    def get(self, db: Session, test_id: uuid.UUID) -> StudentRecommendationState:
+        """The student's state, loading it from the database on a miss."""
+        now = datetime.now()
+        with self._lock:
+            state = self._states.get(test_id)
+            if state is not None and now - state.loaded_at < self.ttl:
+                self._states.move_to_end(test_id)
+                return state
+        
+        records = db.query(MasteryRecord).filter(MasteryRecord.test_id == test_id).all()
+        state = StudentRecommendationState(
+            [ConceptSnapshot.from_record(r) for r in records], now
         )
+        with self._lock:
+            self._put(test_id, state)
+        return state
+    
+    def observe(self, records: List[MasteryRecord]) -> None:
+        """Apply updated mastery records to the states already in memory."""
+        now = datetime.now()
+        with self._lock:
+            for record in records:
+                state = self._states.get(record.test_id)
+                if state is not None:
+                    state.observe(record, now)
+    
+    def invalidate(self, test_id: Optional[uuid.UUID] = None) -> None:
+        """Drop one student's state, or everyone's if None."""
+        with self._lock:
+            if test_id is None:
+                self._states.clear()
+            else:
+                self._states.pop(test_id, None)
+    
+    def save(self) -> None:
+        """Write every fresh state to self.path (no-op without a path)."""
+        if not self.path:
+            return
+        with self._lock:
+            data = {
+                str(test_id): {
+                    "loaded_at": state.loaded_at.isoformat(),
+                    "concepts": [c.to_json() for c in state.concepts.values()]
+                }
+                for test_id, state in self._states.items()
+            }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+    
+    def load(self) -> int:
+        """
+        Restore states saved by save(), skipping ones past the TTL.
         
-        return practice_queue[0] if practice_queue else {
-            "concept_id": None,
-            "difficulty_score": 0.5,
-            "reason": "No recommendations available"
-        }
+        Returns:
+            Number of students restored
+        """
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        
+        now = datetime.now()
+        restored = 0
+        with self._lock:
+            for test_id, entry in data.items():
+                loaded_at = datetime.fromisoformat(entry["loaded_at"])
+                if now - loaded_at >= self.ttl:
+                    continue
+                concepts = [ConceptSnapshot.from_json(c) for c in entry["concepts"]]
+                self._put(uuid.UUID(test_id), StudentRecommendationState(concepts, loaded_at))
+                restored += 1
+        return restored
+
+
+recommendation_states = RecommendationStateStore(
+    ttl_seconds=settings.RECOMMENDATION_STATE_TTL_SECONDS,
+    max_students=settings.RECOMMENDATION_STATE_MAX_STUDENTS,
+    path=settings.RECOMMENDATION_STATE_PATH
+)
@@ -0,0 +1,388 @@
+"""
+Bayesian Knowledge Tracing (BKT) mastery engine.
+
+Each concept has four parameters: the chance a student already knows it
+(p_init), learns it from one practice opportunity (p_learn), answers wrong
+despite knowing it (p_slip) and answers right without knowing it (p_guess).
+Mastery is the posterior probability that the concept is known, so one early
+wrong answer stops mattering once later answers show the student has it.
+
+- Online: BKTParams.update is O(1) per answer and is what MasteryService uses
+  when MASTERY_MODEL is "bkt".
+- Offline: fit_em estimates per-concept parameters from the response log by
+  Baum-Welch over every sequence at once; forward re-estimates a whole cohort
+  in one batched pass.
+
+Batched passes use the same layout as sm2_batch.replay: sequences sorted
+longest-first, so the sequences still active at step k are always a prefix.
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from app.config import settings
+
+# Fitted parameters are clipped to these ranges; without an upper bound on
+# guess and slip, EM can settle on a degenerate "known means wrong" solution
+PARAM_FLOOR = 1e-4
+MAX_GUESS = 0.3
+MAX_SLIP = 0.1
+MAX_LEARN = 0.5
+
+
+@dataclass(frozen=True)
+class BKTParams:
+    """BKT parameters for one concept."""
+    p_init: float = 0.2
+    p_learn: float = 0.15
+    p_slip: float = 0.1
+    p_guess: float = 0.25
+
+    def update(self, p_known: float, is_correct: bool) -> float:
+        """
+        Apply one answer: Bayes update on the evidence, then the chance of
+        learning from the attempt.
+
+        Args:
+            p_known: P(known) before this answer
+            is_correct: Whether the answer was correct
+
+        Returns:
+            P(known) after this answer
+        """
+        if is_correct:
+            evidence = p_known * (1 - self.p_slip)
+            posterior = evidence / (evidence + (1 - p_known) * self.p_guess)
+        else:
+            evidence = p_known * self.p_slip
+            posterior = evidence / (evidence + (1 - p_known) * (1 - self.p_guess))
+        return posterior + (1 - posterior) * self.p_learn
+
+
+DEFAULT_PARAMS = BKTParams()
+
+
+@dataclass
+class BKTParamTable:
+    """Parameters for many concepts as parallel arrays (index = concept code)."""
+    p_init: np.ndarray
+    p_learn: np.ndarray
+    p_slip: np.ndarray
+    p_guess: np.ndarray
+
+    @classmethod
+    def from_params(cls, params: Sequence[BKTParams]) -> "BKTParamTable":
+        return cls(*(
+            np.array([getattr(p, name) for p in params], dtype=np.float64)
+            for name in ("p_init", "p_learn", "p_slip", "p_guess")
+        ))
+
+    def to_params(self) -> List[BKTParams]:
+        return [
+            BKTParams(float(i), float(l), float(s), float(g))
+            for i, l, s, g in zip(self.p_init, self.p_learn, self.p_slip, self.p_guess)
+        ]
+
+    def __len__(self) -> int:
+        return len(self.p_init)
+
+
+# ===== PARAMETER STORE =====
+
+_params: Optional[Dict[str, BKTParams]] = None
+_params_lock = threading.Lock()
+
+
+def load_params(path: Optional[str] = None) -> Dict[str, BKTParams]:
+    """Read fitted parameters ({concept_id: {p_init, ...}}); empty if no file yet."""
+    path = path or settings.BKT_PARAMS_PATH
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return {concept_id: BKTParams(**values) for concept_id, values in raw.items()}
+
+
+def save_params(params: Dict[str, BKTParams], path: Optional[str] = None) -> None:
+    """Write fitted parameters atomically and make them live in this process."""
+    path = path or settings.BKT_PARAMS_PATH
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({c: asdict(p) for c, p in sorted(params.items())}, f, indent=2)
+    os.replace(tmp_path, path)
+    reload_params()
+
+
+def reload_params() -> None:
+    """Drop the in-process parameter cache; the next lookup re-reads the file."""
+    global _params
+    with _params_lock:
+        _params = None
+
+
+def get_params(concept_id: Optional[str]) -> BKTParams:
+    """Parameters for a concept, falling back to the defaults if it was never fitted."""
+    global _params
+    if _params is None:
+        with _params_lock:
+            if _params is None:
+                _params = load_params()
+    return _params.get(concept_id, DEFAULT_PARAMS)
+
+
+def param_table(concept_ids: Sequence[str]) -> BKTParamTable:
+    """Parameter arrays for the given concepts, in the given order."""
+    return BKTParamTable.from_params([get_params(c) for c in concept_ids])
+
+
+# ===== BATCHED PASSES =====
+
+@dataclass
+class _Layout:
+    """Longest-first sequence layout shared by the batched passes."""
+    sequence_ids: np.ndarray  # unique sequence ids, longest first
+    starts: np.ndarray  # flat index of each sequence's first event
+    counts: np.ndarray
+    active_counts: np.ndarray  # active_counts[k] = sequences with more than k events
+
+    @classmethod
+    def build(cls, sequence_ids: np.ndarray) -> "_Layout":
+        unique_ids, starts, counts = np.unique(sequence_ids, return_index=True, return_counts=True)
+        order = np.argsort(-counts, kind="stable")
+        unique_ids, starts, counts = unique_ids[order], starts[order], counts[order]
+        max_len = int(counts[0]) if len(counts) else 0
+        active_counts = np.searchsorted(-counts, -np.arange(max_len), side="left")
+        return cls(unique_ids, starts, counts, active_counts)
+
+
+def _emissions(correct: np.ndarray, slip: np.ndarray, guess: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """P(observation | known), P(observation | not known)."""
+    return np.where(correct, 1 - slip, slip), np.where(correct, guess, 1 - guess)
+
+
+def _forward(
+    layout: _Layout,
+    correct: np.ndarray,
+    table: BKTParamTable,
+    seq_concepts: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Scaled forward pass.
+
+    Returns:
+        (filtered P(known) per event, evidence scale per event,
+         P(known) after each sequence's last answer and log-likelihood per
+         sequence, both in layout order)
+    """
+    init = table.p_init[seq_concepts]
+    learn = table.p_learn[seq_concepts]
+    slip = table.p_slip[seq_concepts]
+    guess = table.p_guess[seq_concepts]
+
+    filtered = np.empty(len(correct), dtype=np.float64)
+    scale = np.empty(len(correct), dtype=np.float64)
+    prior = init.copy()
+    log_likelihood = np.zeros(len(init), dtype=np.float64)
+
+    for step, a in enumerate(layout.active_counts):
+        a = int(a)
+        idx = layout.starts[:a] + step
+        known_e, unknown_e = _emissions(correct[idx], slip[:a], guess[:a])
+        evidence = prior[:a] * known_e
+        total = evidence + (1 - prior[:a]) * unknown_e
+        posterior = evidence / total
+        filtered[idx] = posterior
+        scale[idx] = total
+        log_likelihood[:a] += np.log(total)
+        prior[:a] = posterior + (1 - posterior) * learn[:a]
+
+    return filtered, scale, prior, log_likelihood
+
+
+def forward(
+    sequence_ids: np.ndarray,
+    is_correct: np.ndarray,
+    concept_of_sequence: np.ndarray,
+    table: BKTParamTable
+) -> Dict[str, np.ndarray]:
+    """
+    Re-estimate P(known) for every sequence in one batched pass.
+
+    Args:
+        sequence_ids: Sequence id per event; events grouped by sequence, in answer order
+        is_correct: Correctness per event
+        concept_of_sequence: Concept code (index into table) per sequence id
+        table: Parameters per concept code
+
+    Returns:
+        "sequence_ids", "p_known" (after the last answer) and "log_likelihood"
+        per sequence
+    """
+    sequence_ids = np.asarray(sequence_ids)
+    correct = np.asarray(is_correct, dtype=bool)
+    layout = _Layout.build(sequence_ids)
+    seq_concepts = np.asarray(concept_of_sequence)[layout.sequence_ids]
+
+    _, _, p_known, log_likelihood = _forward(layout, correct, table, seq_concepts)
+
+    return {
+        "sequence_ids": layout.sequence_ids,
+        "p_known": p_known,
+        "log_likelihood": log_likelihood,
+    }
+
+
+def _em_step(
+    layout: _Layout,
+    correct: np.ndarray,
+    event_concepts: np.ndarray,
+    seq_concepts: np.ndarray,
+    table: BKTParamTable
+) -> Tuple[Dict[str, np.ndarray], float]:
+    """One Baum-Welch iteration: expected counts per concept and total log-likelihood."""
+    n_concepts = len(table)
+    learn = table.p_learn[seq_concepts]
+    slip = table.p_slip[seq_concepts]
+    guess = table.p_guess[seq_concepts]
+
+    filtered, scale, _, log_likelihood = _forward(layout, correct, table, seq_concepts)
+
+    # Scaled backward pass; known_b/unknown_b hold beta at the step after the current one
+    n_events = len(correct)
+    gamma_known = np.empty(n_events, dtype=np.float64)
+    learned = np.zeros(n_events, dtype=np.float64)  # expected unknown -> known transitions
+    has_next = np.zeros(n_events, dtype=bool)
+    known_b = np.ones(len(layout.sequence_ids), dtype=np.float64)
+    unknown_b = np.ones(len(layout.sequence_ids), dtype=np.float64)
+
+    max_len = len(layout.active_counts)
+    for step in range(max_len - 1, -1, -1):
+        a = int(layout.active_counts[step])
+        idx = layout.starts[:a] + step
+        # Sequences that continue past this step are the first n of the active prefix
+        n = int(layout.active_counts[step + 1]) if step + 1 < max_len else 0
+        if n:
+            nxt = idx[:n] + 1
+            known_e, unknown_e = _emissions(correct[nxt], slip[:n], guess[:n])
+            c = scale[nxt]
+            to_known = known_e * known_b[:n] / c
+            learned[idx[:n]] = (1 - filtered[idx[:n]]) * learn[:n] * to_known
+            has_next[idx[:n]] = True
+            unknown_b[:n] = learn[:n] * to_known + (1 - learn[:n]) * unknown_e * unknown_b[:n] / c
+            known_b[:n] = to_known
+        known_weight = filtered[idx] * known_b[:a]
+        unknown_weight = (1 - filtered[idx]) * unknown_b[:a]
+        gamma_known[idx] = known_weight / (known_weight + unknown_weight)
+
+    gamma_unknown = 1 - gamma_known
+
+    def per_concept(weights, index=event_concepts):
+        return np.bincount(index, weights=weights, minlength=n_concepts)
+
+    counts = {
+        "sequences": per_concept(None, seq_concepts).astype(np.float64),
+        "init_known": per_concept(gamma_known[layout.starts], seq_concepts),
+        "learned": per_concept(learned),
+        "unknown_with_next": per_concept(gamma_unknown * has_next),
+        "unknown_correct": per_concept(gamma_unknown * correct),
+        "unknown": per_concept(gamma_unknown),
+        "known_wrong": per_concept(gamma_known * ~correct),
+        "known": per_concept(gamma_known),
+    }
+    return counts, float(log_likelihood.sum())
+
+
+def fit_em(
+    sequence_ids: np.ndarray,
+    is_correct: np.ndarray,
+    concept_of_sequence: np.ndarray,
+    initial: BKTParamTable,
+    max_iter: int = 100,
+    tol: float = 1e-6,
+    min_sequences: int = 10
+) -> Tuple[BKTParamTable, List[float]]:
+    """
+    Fit per-concept BKT parameters by expectation-maximisation, with every
+    sequence of every concept processed together on each iteration.
+
+    Args:
+        sequence_ids: Sequence id per event; events grouped by sequence, in answer order
+        is_correct: Correctness per event
+        concept_of_sequence: Concept code (index into initial) per sequence id
+        initial: Starting parameters per concept code
+        max_iter: Iteration limit
+        tol: Stop when the relative log-likelihood gain falls below this
+        min_sequences: Concepts with fewer sequences keep their initial parameters
+
+    Returns:
+        (fitted table, log-likelihood after each iteration)
+    """
+    sequence_ids = np.asarray(sequence_ids)
+    correct = np.asarray(is_correct, dtype=bool)
+    concept_of_sequence = np.asarray(concept_of_sequence)
+    layout = _Layout.build(sequence_ids)
+    seq_concepts = concept_of_sequence[layout.sequence_ids]
+    event_concepts = concept_of_sequence[sequence_ids]
+
+    table = BKTParamTable(
+        initial.p_init.copy(), initial.p_learn.copy(),
+        initial.p_slip.copy(), initial.p_guess.copy()
+    )
+    history: List[float] = []
+
+    for _ in range(max_iter):
+        counts, log_likelihood = _em_step(layout, correct, event_concepts, seq_concepts, table)
+        history.append(log_likelihood)
+
+        fit = counts["sequences"] >= min_sequences
+
+        def estimate(numerator, denominator, current, upper):
+            with np.errstate(divide="ignore", invalid="ignore"):
+                value = numerator / denominator
+            value = np.where(fit & (denominator > 0), value, current)
+            return np.clip(value, PARAM_FLOOR, upper)
+
+        table = BKTParamTable(
+            p_init=estimate(counts["init_known"], counts["sequences"], table.p_init, 1 - PARAM_FLOOR),
+            p_learn=estimate(counts["learned"], counts["unknown_with_next"], table.p_learn, MAX_LEARN),
+            p_slip=estimate(counts["known_wrong"], counts["known"], table.p_slip, MAX_SLIP),
+            p_guess=estimate(counts["unknown_correct"], counts["unknown"], table.p_guess, MAX_GUESS),
+        )
+
+        if len(history) > 1 and abs(history[-1] - history[-2]) <= tol * abs(history[-2]):
+            break
+
+    return table, history
+
+
+def synthetic_sequences(
+    table: BKTParamTable,
+    n_sequences: int,
+    length: int,
+    seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Sample answer sequences from known parameters, to check that fit_em
+    recovers them.
+
+    Returns:
+        (sequence_ids, is_correct, concept_of_sequence)
+    """
+    rng = np.random.default_rng(seed)
+    concept_of_sequence = rng.integers(0, len(table), size=n_sequences)
+    init = table.p_init[concept_of_sequence]
+    learn = table.p_learn[concept_of_sequence]
+    slip = table.p_slip[concept_of_sequence]
+    guess = table.p_guess[concept_of_sequence]
+
+    known = rng.random(n_sequences) < init
+    answers = np.empty((n_sequences, length), dtype=bool)
+    for step in range(length):
+        p_correct = np.where(known, 1 - slip, guess)
+        answers[:, step] = rng.random(n_sequences) < p_correct
+        known |= rng.random(n_sequences) < learn
+
+    sequence_ids = np.repeat(np.arange(n_sequences), length)
+    return sequence_ids, answers.ravel(), concept_of_sequence
@@ -0,0 +1,86 @@
+import io
+import json
+import zipfile
+from typing import Any, Dict, List, Optional, Tuple
+from app.services.permutation_service import PermutationService
+import uuid
+
+
+class ClassroomExportService:
+    """
+    Service for building printable classroom sets of a test.
+    Each variant is a seeded shuffle of the questions and/or options, so the
+    same (test_id, seed) always reproduces the same set of papers.
+    """
+
+    MAX_VARIANTS = 60
+
+    @staticmethod
+    def build_render_jobs(
+        test_id: uuid.UUID,
+        test_data: Dict[str, Any],
+        questions: List[Dict[str, Any]],
+        variant_count: int,
+        seed: int,
+        shuffle_questions: Optional[bool] = None,
+        shuffle_options: Optional[bool] = None,
+        include_answer_keys: bool = True
+    ) -> Tuple[List[Tuple[str, Dict[str, Any], List[Dict[str, Any]], str]], List[Dict]]:
+        """
+        Build the render jobs for a classroom set.
+
+        shuffle_questions / shuffle_options default to the test's own
+        settings (test_data["shuffle_questions"] / ["shuffle_options"]).
+
+        Returns:
+            (jobs for PDFRenderPool.render_batch, manifest entries)
+        """
+        if shuffle_questions is None:
+            shuffle_questions = bool(test_data.get("shuffle_questions"))
+        if shuffle_options is None:
+            shuffle_options = bool(test_data.get("shuffle_options"))
+
+        jobs = []
+        manifest = []
+
+        for i in range(variant_count):
+            label = str(i + 1)
+            variant = PermutationService.for_attempt(
+                test_id, f"classroom:{seed}:{i}", questions, shuffle_questions, shuffle_options
+            ).apply(questions)
+
+            student_data = {**test_data, "variant_label": label, "hide_answer_key": True}
+            jobs.append((f"version_{label}.pdf", student_data, variant, "test_template.html"))
+
+            if include_answer_keys:
+                key_data = {**test_data, "variant_label": label}
+                jobs.append((f"answer_key_{label}.pdf", key_data, variant, "answer_key_template.html"))
+
+            manifest.append({
+                "version": label,
+                "answers": [q.get("correct_answer") for q in variant]
+            })
+
+        return jobs, manifest
+
+    @staticmethod
+    def build_zip(
+        rendered: List[Tuple[str, Optional[bytes]]],
+        manifest: Dict[str, Any]
+    ) -> bytes:
+        """
+        Pack rendered PDFs into one ZIP archive.
+        PDFs are already Flate-compressed, so they are stored rather than deflated.
+        """
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+            for name, pdf_bytes in rendered:
+                if pdf_bytes is None:
+                    raise ValueError(f"Rendering failed for {name}")
+                archive.writestr(name, pdf_bytes)
+            archive.writestr(
+                "manifest.json",
+                json.dumps(manifest, indent=2),
+                compress_type=zipfile.ZIP_DEFLATED
+            )
+        return buffer.getvalue()
@@ -0,0 +1,124 @@
+"""
+Columnar cohort mastery snapshots for class dashboards.
+
+Mastery rows are streamed straight into NumPy arrays (no ORM objects), with
+students and concept ids dictionary-encoded to small integers. The heatmap is
+a students x concepts uint8 matrix of mastery percentages, zlib-compressed for
+the wire.
+"""
+import base64
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.concept import MasteryRecord
+import uuid
+
+# Heatmap cell for a concept the student has no record for
+NO_DATA = 255
+
+SNAPSHOT_DTYPE = np.dtype([
+    ("student", np.uint32),
+    ("concept", np.uint16),
+    ("level", np.float32),
+])
+
+
+@dataclass
+class CohortSnapshot:
+    """Dictionary-encoded mastery rows for a set of students."""
+    students: List[uuid.UUID]  # student index -> test_id
+    concepts: List[str]  # concept index -> concept_id
+    rows: np.ndarray  # SNAPSHOT_DTYPE structured array
+
+    def heatmap(self) -> np.ndarray:
+        """Students x concepts matrix of mastery percent (NO_DATA where missing)."""
+        matrix = np.full((len(self.students), len(self.concepts)), NO_DATA, dtype=np.uint8)
+        percent = np.rint(np.clip(self.rows["level"], 0.0, 1.0) * 100).astype(np.uint8)
+        matrix[self.rows["student"], self.rows["concept"]] = percent
+        return matrix
+
+
+class CohortSnapshotService:
+    """Service for building class-wide mastery snapshots."""
+
+    MAX_STUDENTS = 5000
+    FETCH_CHUNK_SIZE = 20000
+    IN_CLAUSE_BATCH = 500
+
+    @staticmethod
+    def load_snapshot(
+        db: Session,
+        test_ids: List[uuid.UUID],
+        concept_ids: Optional[List[str]] = None
+    ) -> CohortSnapshot:
+        """
+        Stream mastery rows for the given students into a columnar snapshot.
+
+        Args:
+            db: Database session
+            test_ids: Students in the cohort (rows keep this order)
+            concept_ids: Optional concept filter; also fixes column order
+        """
+        students = list(dict.fromkeys(test_ids))
+        student_index = {test_id: i for i, test_id in enumerate(students)}
+
+        concepts: List[str] = list(dict.fromkeys(concept_ids)) if concept_ids else []
+        concept_index: Dict[str, int] = {c: i for i, c in enumerate(concepts)}
+
+        student_codes: List[int] = []
+        concept_codes: List[int] = []
+        levels: List[float] = []
+
+        # Chunk the IN list to stay under bind-parameter limits
+        batch = CohortSnapshotService.IN_CLAUSE_BATCH
+        for start in range(0, len(students), batch):
+            stmt = select(
+                MasteryRecord.test_id,
+                MasteryRecord.concept_id,
+                MasteryRecord.current_level,
+            ).where(MasteryRecord.test_id.in_(students[start:start + batch]))
+            if concept_ids:
+                stmt = stmt.where(MasteryRecord.concept_id.in_(concepts))
+
+            result = db.execute(stmt.execution_options(
+                stream_results=True, yield_per=CohortSnapshotService.FETCH_CHUNK_SIZE
+            ))
+            for test_id, concept_id, level in result:
+                code = concept_index.get(concept_id)
+                if code is None:
+                    code = concept_index[concept_id] = len(concepts)
+                    concepts.append(concept_id)
+                student_codes.append(student_index[test_id])
+                concept_codes.append(code)
+                levels.append(level or 0.0)
+
+        rows = np.empty(len(levels), dtype=SNAPSHOT_DTYPE)
+        rows["student"] = student_codes
+        rows["concept"] = concept_codes
+        rows["level"] = levels
+
+        if not concept_ids:
+            # Stable, readable column order: sort concepts and remap the codes
+            order = np.argsort(np.array(concepts, dtype=object)) if concepts else np.empty(0, dtype=np.intp)
+            remap = np.empty(len(concepts), dtype=np.uint16)
+            remap[order] = np.arange(len(concepts), dtype=np.uint16)
+            rows["concept"] = remap[rows["concept"]]
+            concepts = [concepts[i] for i in order]
+
+        return CohortSnapshot(students, concepts, rows)
+
+    @staticmethod
+    def encode_heatmap(snapshot: CohortSnapshot) -> Dict:
+        """Compact JSON payload: row-major uint8 matrix, zlib + base64."""
+        matrix = snapshot.heatmap()
+        return {
+            "students": [str(s) for s in snapshot.students],
+            "concepts": snapshot.concepts,
+            "shape": list(matrix.shape),
+            "encoding": "uint8-percent;zlib;base64",
+            "no_data": NO_DATA,
+            "data": base64.b64encode(zlib.compress(matrix.tobytes(), 6)).decode("ascii"),
+        }
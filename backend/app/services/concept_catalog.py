@@ -0,0 +1,270 @@
+"""
+Concept metadata: syncing taxonomies into the concept table, and an
+in-process read-through cache over it.
+
+The taxonomies (built-in NCDPI plus the exam-standard packs) are the source of
+truth; ConceptSyncService upserts them into `concept` so mastery records'
+foreign keys resolve. The sync compares against what is stored and only writes
+new or changed rows, so running it on every startup is cheap and idempotent.
+
+ConceptCatalog keeps concept rows as plain dicts keyed by concept_id. It is
+warmed from the table after a sync, so reads on the request path are dict
+lookups; a miss reads that concept through from the DB once.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+from sqlalchemy import bindparam, event, select, update
+from sqlalchemy.orm import Session
+from app.data.taxonomy_packs import get_taxonomy, taxonomy_packs
+from app.db.upsert import dialect_insert
+from app.models.concept import Concept
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Columns owned by the taxonomies (learning_resources is edited in the DB)
+SYNCED_COLUMNS = (
+    "name", "description", "parent_concept_id", "subject", "grade_level_min",
+    "grade_level_max", "exam_standard", "prerequisite_concept_ids",
+)
+CACHED_COLUMNS = ("concept_id",) + SYNCED_COLUMNS + ("learning_resources",)
+_PENDING_KEY = "concept_catalog_pending"  # Session.info key for rows awaiting commit
+
+
+class ConceptCatalog:
+    """
+    Read-through cache of concept rows.
+
+    Returned dicts are shared; treat them as read-only. Lookups for ids that
+    are not in the table are remembered for MISS_TTL_SECONDS so a bad id
+    can't turn every request into a query.
+    """
+
+    MISS_TTL_SECONDS = 60.0
+
+    def __init__(self):
+        self._concepts: Dict[str, Dict] = {}
+        self._misses: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._concepts)
+
+    @staticmethod
+    def _query(db: Session, concept_ids: Optional[List[str]] = None) -> List[Dict]:
+        stmt = select(*(getattr(Concept, col) for col in CACHED_COLUMNS))
+        if concept_ids is not None:
+            stmt = stmt.where(Concept.concept_id.in_(concept_ids))
+        return [dict(row._mapping) for row in db.execute(stmt)]
+
+    def warm(self, db: Session) -> int:
+        """Replace the cache with every row of the concept table."""
+        concepts = {row["concept_id"]: row for row in self._query(db)}
+        with self._lock:
+            self._concepts = concepts
+            self._misses.clear()
+        return len(concepts)
+
+    def peek(self, concept_id: str) -> Optional[Dict]:
+        """Cached concept, or None; never touches the DB."""
+        return self._concepts.get(concept_id)
+
+    def get(self, db: Session, concept_id: str) -> Optional[Dict]:
+        """Concept metadata, read through from the DB on a cache miss."""
+        concept = self._concepts.get(concept_id)
+        if concept is not None:
+            return concept
+        return self.get_many(db, [concept_id]).get(concept_id)
+
+    def get_many(self, db: Session, concept_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Concepts by id; all cache misses are fetched with one query."""
+        found: Dict[str, Dict] = {}
+        missing: List[str] = []
+        now = time.monotonic()
+        for concept_id in dict.fromkeys(concept_ids):
+            concept = self._concepts.get(concept_id)
+            if concept is not None:
+                found[concept_id] = concept
+            elif now - self._misses.get(concept_id, -self.MISS_TTL_SECONDS) >= self.MISS_TTL_SECONDS:
+                missing.append(concept_id)
+
+        if missing:
+            rows = {row["concept_id"]: row for row in self._query(db, missing)}
+            with self._lock:
+                for concept_id in missing:
+                    if concept_id in rows:
+                        self._concepts[concept_id] = rows[concept_id]
+                        self._misses.pop(concept_id, None)
+                    else:
+                        self._misses[concept_id] = now
+            found.update(rows)
+        return found
+
+    def ensure(self, db: Session, concept_ids: Iterable[str]) -> None:
+        """
+        Make sure rows exist for the given concept ids before mastery records
+        reference them. Known ids cost a dict lookup; ids outside every
+        taxonomy (e.g. tags on AI-generated questions) get a placeholder row
+        named after the id. Does not commit.
+
+        Rows read or inserted here are only cached once the session commits:
+        a placeholder inserted by a transaction that rolls back must not be
+        remembered as existing.
+        """
+        unknown = [c for c in dict.fromkeys(concept_ids) if c not in self._concepts]
+        if not unknown:
+            return
+
+        # Read without caching: the session may see its own uncommitted placeholders
+        found = {row["concept_id"]: row for row in self._query(db, unknown)}
+        placeholders = [c for c in unknown if c not in found]
+        if placeholders:
+            stmt = dialect_insert(db, Concept.__table__).on_conflict_do_nothing(
+                index_elements=["concept_id"]
+            )
+            db.execute(stmt, [
+                {"id": uuid.uuid4(), "concept_id": c, "name": c, "prerequisite_concept_ids": []}
+                for c in placeholders
+            ])
+            for concept_id in placeholders:
+                found[concept_id] = {
+                    **dict.fromkeys(CACHED_COLUMNS),
+                    "concept_id": concept_id,
+                    "name": concept_id,
+                    "prerequisite_concept_ids": [],
+                }
+        self._cache_on_commit(db, found)
+
+    def _cache_on_commit(self, db: Session, rows: Dict[str, Dict]) -> None:
+        """Add rows to the cache when the session commits; drop them on rollback."""
+        pending = db.info.get(_PENDING_KEY)
+        if pending is None:
+            pending = db.info[_PENDING_KEY] = {}
+            event.listen(db, "after_commit", self._on_commit)
+            event.listen(db, "after_rollback", self._on_rollback)
+        pending.update(rows)
+
+    def _on_commit(self, db: Session) -> None:
+        rows = db.info.get(_PENDING_KEY)
+        if not rows:
+            return
+        with self._lock:
+            for concept_id, row in rows.items():
+                self._concepts[concept_id] = row
+                self._misses.pop(concept_id, None)
+        rows.clear()
+
+    @staticmethod
+    def _on_rollback(db: Session) -> None:
+        rows = db.info.get(_PENDING_KEY)
+        if rows:
+            rows.clear()
+
+    def invalidate(self, concept_ids: Optional[Iterable[str]] = None) -> None:
+        with self._lock:
+            if concept_ids is None:
+                self._concepts.clear()
+                self._misses.clear()
+            else:
+                for concept_id in concept_ids:
+                    self._concepts.pop(concept_id, None)
+                    self._misses.pop(concept_id, None)
+
+
+concept_catalog = ConceptCatalog()
+
+
+class ConceptSyncService:
+    """Service for mirroring taxonomies into the concept table."""
+
+    @staticmethod
+    def taxonomy_rows(standards: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """
+        concept_id -> synced column values for the given standards (default:
+        the built-in taxonomy and every pack). Loads any pack not yet loaded.
+        """
+        rows: Dict[str, Dict] = {}
+        for standard in standards or taxonomy_packs.standards():
+            for concept in get_taxonomy(standard).concepts:
+                concept_id = concept["concept_id"]
+                if concept_id in rows:
+                    raise ValueError(
+                        f"Concept {concept_id} is defined by both "
+                        f"{rows[concept_id]['exam_standard']} and {concept.get('exam_standard')}"
+                    )
+                row = {col: concept.get(col) for col in SYNCED_COLUMNS}
+                row["prerequisite_concept_ids"] = list(row["prerequisite_concept_ids"] or [])
+                rows[concept_id] = row
+        return rows
+
+    @staticmethod
+    def _parents_first(concept_ids: List[str], rows: Dict[str, Dict]) -> List[str]:
+        """Order new rows so a parent is inserted before its children (FK)."""
+        def depth(concept_id: str) -> int:
+            seen = set()
+            parent = rows[concept_id]["parent_concept_id"]
+            while parent in rows and parent not in seen:
+                seen.add(parent)
+                parent = rows[parent]["parent_concept_id"]
+            return len(seen)
+
+        return sorted(concept_ids, key=depth)
+
+    @staticmethod
+    def sync(db: Session, standards: Optional[List[str]] = None) -> Dict:
+        """
+        Upsert taxonomy concepts into the concept table and refresh the
+        catalog. Idempotent: unchanged rows are not written.
+
+        Args:
+            db: Database session
+            standards: Exam standards to sync (default: all)
+
+        Returns:
+            Counts of inserted, updated and unchanged concepts
+        """
+        started = time.perf_counter()
+        rows = ConceptSyncService.taxonomy_rows(standards)
+
+        stored = {
+            r.concept_id: tuple(getattr(r, col) for col in SYNCED_COLUMNS)
+            for r in db.execute(select(Concept.concept_id, *(getattr(Concept, c) for c in SYNCED_COLUMNS)))
+        }
+        new_ids = [c for c in rows if c not in stored]
+        changed_ids = [
+            c for c in rows
+            if c in stored and stored[c] != tuple(rows[c][col] for col in SYNCED_COLUMNS)
+        ]
+
+        table = Concept.__table__
+        if new_ids:
+            # ON CONFLICT DO NOTHING: another worker may be syncing at startup too
+            stmt = dialect_insert(db, table).on_conflict_do_nothing(index_elements=["concept_id"])
+            db.execute(stmt, [
+                {"id": uuid.uuid4(), "concept_id": c, **rows[c]}
+                for c in ConceptSyncService._parents_first(new_ids, rows)
+            ])
+        if changed_ids:
+            stmt = (
+                update(table)
+                .where(table.c.concept_id == bindparam("b_concept_id"))
+                .values({col: bindparam(f"b_{col}") for col in SYNCED_COLUMNS})
+            )
+            db.execute(stmt, [
+                {"b_concept_id": c, **{f"b_{col}": rows[c][col] for col in SYNCED_COLUMNS}}
+                for c in changed_ids
+            ])
+        db.commit()
+        cached = concept_catalog.warm(db)
+
+        result = {
+            "inserted": len(new_ids),
+            "updated": len(changed_ids),
+            "unchanged": len(rows) - len(new_ids) - len(changed_ids),
+            "cached": cached,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        logger.info("Concept taxonomy synced: %s", result)
+        return result
@@ -0,0 +1,186 @@
+"""
+Batch diagnostic analysis for a whole class.
+
+analyze_diagnostic_results walks one student's answers through nested dicts.
+Here a class is analyzed at once: answers become a students x questions
+correctness matrix, per-concept mastery for everyone is one matrix product
+with a questions x concepts incidence matrix, and "are this concept's
+prerequisites mastered" is a product of the mastered matrix with the
+taxonomy's prerequisite-closure matrix. Only the learning path is planned
+per student (LearningPathPlanner, linear in the grade's graph).
+"""
+from typing import Dict, List, Optional
+import numpy as np
+from sqlalchemy.orm import Session
+from app.data.taxonomy_graph import CompiledTaxonomy
+from app.data.taxonomy_packs import get_taxonomy
+from app.models.test import Question, Test
+from app.services.learning_path import LearningPathPlanner
+from app.services.mastery_service import MasteryService
+import uuid
+
+
+def closure_matrix(taxonomy: CompiledTaxonomy, concept_ids: List[str]) -> np.ndarray:
+    """taxonomy concepts x given concepts: [p, c] is True if p is a transitive prerequisite of c."""
+    matrix = np.zeros((len(taxonomy), len(concept_ids)), dtype=bool)
+    for col, concept_id in enumerate(concept_ids):
+        i = taxonomy.index.get(concept_id)
+        if i is None:
+            continue
+        closure = taxonomy.closures[i]
+        while closure:
+            low = closure & -closure
+            matrix[low.bit_length() - 1, col] = True
+            closure ^= low
+    return matrix
+
+
+class DiagnosticBatchService:
+    """Service for analyzing many students' diagnostic answers in one pass."""
+
+    MAX_STUDENTS = 500
+
+    @staticmethod
+    def correctness_matrix(questions: List[Question], submissions: List[Dict]) -> np.ndarray:
+        """
+        Students x questions boolean matrix. Answers are keyed by question
+        position (as int or string); unanswered questions count as wrong.
+        """
+        correct = np.array([q.correct_answer for q in questions], dtype=object)
+        answers = np.full((len(submissions), len(questions)), None, dtype=object)
+        for s, submission in enumerate(submissions):
+            for position, answer in submission["answers"].items():
+                q = int(position)
+                if 0 <= q < len(questions):
+                    answers[s, q] = answer
+        return (answers == correct[None, :]) & (answers != None)  # noqa: E711 (elementwise)
+
+    @staticmethod
+    def analyze_matrix(
+        taxonomy: CompiledTaxonomy,
+        question_concepts: List[List[str]],
+        is_correct: np.ndarray
+    ) -> Dict:
+        """
+        Per-concept mastery, categories and starting points for every student.
+
+        Args:
+            taxonomy: Compiled taxonomy the concepts belong to
+            question_concepts: concept_ids of each question (matrix column order)
+            is_correct: students x questions boolean matrix
+
+        Returns:
+            concept_ids (first-seen order), mastery (students x concepts) and
+            per-student starting concept index (-1 = none)
+        """
+        concept_ids = list(dict.fromkeys(c for concepts in question_concepts for c in concepts))
+        column = {c: j for j, c in enumerate(concept_ids)}
+        incidence = np.zeros((len(question_concepts), len(concept_ids)), dtype=np.float64)
+        for q, concepts in enumerate(question_concepts):
+            for concept_id in concepts:
+                incidence[q, column[concept_id]] = 1.0
+
+        attempted = incidence.sum(axis=0)
+        mastery = (is_correct.astype(np.float64) @ incidence) / np.maximum(attempted, 1.0)
+
+        mastered = mastery >= MasteryService.MASTERY_THRESHOLD
+        needs_work = mastery < MasteryService.PROFICIENT_THRESHOLD
+
+        # Prerequisites met = no transitive prerequisite outside the mastered
+        # set; concepts that were not assessed count as not mastered
+        mastered_all = np.zeros((is_correct.shape[0], len(taxonomy)), dtype=bool)
+        in_taxonomy = [j for j, c in enumerate(concept_ids) if c in taxonomy]
+        mastered_all[:, [taxonomy.index[concept_ids[j]] for j in in_taxonomy]] = mastered[:, in_taxonomy]
+        closure = closure_matrix(taxonomy, concept_ids)
+        unmet = (~mastered_all).astype(np.int32) @ closure.astype(np.int32)
+        ready = unmet == 0
+
+        # Lowest-mastery needs-work concept with prerequisites met, else the
+        # lowest-mastery needs-work concept (argmin keeps first-seen order on ties)
+        start = np.full(is_correct.shape[0], -1, dtype=np.int64)
+        if concept_ids:
+            any_score = np.where(needs_work, mastery, np.inf)
+            ready_score = np.where(needs_work & ready, mastery, np.inf)
+            start = np.where(np.isfinite(any_score.min(axis=1)), any_score.argmin(axis=1), start)
+            start = np.where(np.isfinite(ready_score.min(axis=1)), ready_score.argmin(axis=1), start)
+
+        return {
+            "concept_ids": concept_ids,
+            "mastery": mastery,
+            "mastered": mastered,
+            "needs_work": needs_work,
+            "starting_point": start,
+        }
+
+    @staticmethod
+    def analyze_class(
+        db: Session,
+        test_id: uuid.UUID,
+        submissions: List[Dict],
+        grade_level: Optional[int] = None
+    ) -> Dict:
+        """
+        Analyze a class's answers to one diagnostic test.
+
+        Args:
+            db: Database session
+            test_id: Diagnostic test the answers are for
+            submissions: [{"student_id", "answers": {position: answer}}, ...]
+            grade_level: Grade for the learning paths (defaults to the test's)
+
+        Returns:
+            Per-student results in the shape of analyze_diagnostic_results
+            (without per-question detail) plus a class summary per concept
+        """
+        test = db.get(Test, test_id)
+        if test is None:
+            raise ValueError(f"Test {test_id} not found")
+        questions = (
+            db.query(Question)
+            .filter(Question.test_id == test_id)
+            .order_by(Question.sequence)
+            .all()
+        )
+        taxonomy = get_taxonomy(test.exam_standard or "NCDPI")
+        grade_level = grade_level or test.grade_level
+
+        is_correct = DiagnosticBatchService.correctness_matrix(questions, submissions)
+        analysis = DiagnosticBatchService.analyze_matrix(
+            taxonomy, [q.concept_ids or [] for q in questions], is_correct
+        )
+        concept_ids = analysis["concept_ids"]
+        mastery = analysis["mastery"]
+        proficient = ~analysis["mastered"] & ~analysis["needs_work"]
+        planner = LearningPathPlanner(taxonomy, grade_level)
+        ids = np.array(concept_ids, dtype=object)
+        overall = mastery.mean(axis=1) if concept_ids else np.zeros(len(submissions))
+
+        students = []
+        for s, submission in enumerate(submissions):
+            levels = dict(zip(concept_ids, mastery[s].tolist()))
+            start = int(analysis["starting_point"][s])
+            students.append({
+                "student_id": submission["student_id"],
+                "overall_mastery": float(overall[s]),
+                "concepts_assessed": len(concept_ids),
+                "mastered": ids[analysis["mastered"][s]].tolist(),
+                "proficient": ids[proficient[s]].tolist(),
+                "needs_work": ids[analysis["needs_work"][s]].tolist(),
+                "recommended_starting_point": concept_ids[start] if start >= 0 else None,
+                "concept_mastery": levels,
+                "learning_path": planner.plan(levels),
+            })
+
+        return {
+            "test_id": str(test_id),
+            "total_students": len(submissions),
+            "concepts": [
+                {
+                    "concept_id": concept_id,
+                    "mean_mastery": float(mastery[:, j].mean()) if submissions else 0.0,
+                    "students_needing_work": int(analysis["needs_work"][:, j].sum()),
+                }
+                for j, concept_id in enumerate(concept_ids)
+            ],
+            "students": students,
+        }
@@ -3,7 +3,9 @@ from sqlalchemy.orm import Session
 from app.models.concept import Concept, MasteryRecord
 from app.models.test import Question
 from app.services.question_generator import QuestionGenerator
-from app.data.concept_taxonomy import get_concepts_by_grade, get_prerequisite_chain
+from app.data.taxonomy_graph import CompiledTaxonomy
+from app.data.taxonomy_packs import get_taxonomy
+from app.services.learning_path import LearningPathPlanner
 import uuid
 
 
@@ -35,8 +37,10 @@ class DiagnosticService:
         Returns:
             Dict with test_id, questions, and concept coverage
         """
-        # Get concepts for this grade level
-        concepts = get_concepts_by_grade(grade_level)
+        # Get concepts for this grade level from the exam standard's taxonomy
+        # (packs other than NCDPI are loaded on first use)
+        concepts = get_taxonomy(exam_standard).concepts_for_grade(grade_level)
+        concepts = [c for c in concepts if c["subject"] == subject] or concepts
         
         # Select key concepts to assess (limit to 5-7 for 10-15 minute test)
         key_concepts = self._select_key_concepts(concepts, limit=6)
@@ -114,10 +118,12 @@ class DiagnosticService:
         db: Session,
         test_id: uuid.UUID,
         answers: Dict[int, str],
-        questions: List[Question]
+        questions: List[Question],
+        exam_standard: str = "NCDPI"
     ) -> Dict:
         """
         Analyze diagnostic test results to create a learning profile.
+        Prerequisites are checked against the exam standard's taxonomy.
         
         Returns:
             Learning profile with strengths, weaknesses, and recommended path
@@ -160,7 +166,8 @@ class DiagnosticService:
         # Determine starting point (lowest mastery concept with prerequisites met)
         recommended_start = self._find_optimal_starting_point(
             needs_work,
-            mastered
+            mastered,
+            get_taxonomy(exam_standard)
         )
         
         return {
@@ -176,7 +183,8 @@ class DiagnosticService:
     def _find_optimal_starting_point(
         self,
         needs_work: Dict,
-        mastered: Dict
+        mastered: Dict,
+        taxonomy: CompiledTaxonomy
     ) -> Optional[str]:
         """
         Find the best concept to start learning.
@@ -191,10 +199,10 @@ class DiagnosticService:
             key=lambda x: x[1]["mastery_level"]
         )
         
-        # Find first concept whose prerequisites are mastered
+        # Find first concept whose prerequisites are mastered (one AND each)
+        mastered_mask = taxonomy.mask(mastered)
         for concept_id, _ in sorted_concepts:
-            prereqs = get_prerequisite_chain(concept_id)
-            if all(p in mastered for p in prereqs):
+            if taxonomy.prerequisites_met(concept_id, mastered_mask):
                 return concept_id
         
         # If no concept has all prerequisites, return the lowest mastery one
@@ -204,49 +212,23 @@ class DiagnosticService:
         self,
         db: Session,
         diagnostic_results: Dict,
-        grade_level: int
+        grade_level: int,
+        exam_standard: str = "NCDPI"
     ) -> List[Dict]:
         """
         Create a personalized learning path based on diagnostic results.
         
+        Every unmastered concept for the grade (and any unmastered
+        prerequisite it depends on) is placed after its prerequisites;
+        among concepts that are ready, larger gaps and concepts that unlock
+        more of the path come first (see LearningPathPlanner).
+        
         Returns:
-            Ordered list of concepts to learn with estimated time
+            Ordered list of concepts to learn
         """
-        needs_work = diagnostic_results["needs_work"]
-        mastered = diagnostic_results["mastered"]
-        
-        # Get all concepts for grade level
-        all_concepts = get_concepts_by_grade(grade_level)
-        
-        # Build learning path
-        learning_path = []
-        
-        # Start with recommended starting point
-        current = diagnostic_results["recommended_starting_point"]
-        if current:
-            learning_path.append({
-                "concept_id": current,
-                "reason": "Starting point - foundational concept that needs work",
-                "priority": "high"
-            })
-        
-        # Add other concepts that need work, ordered by prerequisites
-        for concept_id in needs_work:
-            if concept_id != current:
-                learning_path.append({
-                    "concept_id": concept_id,
-                    "reason": "Identified gap in diagnostic",
-                    "priority": "medium"
-                })
-        
-        # Add advanced concepts not yet assessed
-        assessed_ids = set(mastered + diagnostic_results["proficient"] + needs_work)
-        for concept in all_concepts:
-            if concept["concept_id"] not in assessed_ids:
-                learning_path.append({
-                    "concept_id": concept["concept_id"],
-                    "reason": "Advanced topic for future learning",
-                    "priority": "low"
-                })
-        
-        return learning_path
+        levels = {
+            concept_id: perf["mastery_level"]
+            for concept_id, perf in diagnostic_results["detailed_performance"].items()
+        }
+        planner = LearningPathPlanner(get_taxonomy(exam_standard), grade_level)
+        return planner.plan(levels)
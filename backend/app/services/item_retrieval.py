@@ -0,0 +1,239 @@
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+from sqlalchemy import delete, insert, select, union
+from sqlalchemy.orm import Session
+from app.models.concept import MasteryRecord
+from app.models.question_concept import QuestionConcept
+from app.models.response_event import ResponseEvent
+from app.models.test import Question
+from app.services.adaptive_difficulty import AdaptiveDifficultyService
+import threading
+import uuid
+
+
+@dataclass
+class ConceptItems:
+    """All items for one concept, sorted by difficulty (parallel lists)."""
+    difficulties: List[float]
+    question_ids: List[uuid.UUID]
+    loaded_at: datetime
+
+
+class _HotConceptIndex:
+    """
+    In-memory sorted item lists for frequently requested concepts.
+
+    A concept is loaded after HOT_AFTER lookups; until then lookups go to the
+    (concept_id, difficulty_score) index. Entries are LRU-evicted, dropped
+    when questions for the concept are re-synced in this process, and
+    reloaded after TTL so other processes' syncs show up.
+    """
+
+    HOT_AFTER = 3
+    MAX_CONCEPTS = 256
+    TTL = timedelta(minutes=10)
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, ConceptItems]" = OrderedDict()
+        self._lookups: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def get(self, concept_id: str, now: datetime) -> Optional[ConceptItems]:
+        with self._lock:
+            entry = self._entries.get(concept_id)
+            if entry is not None and now - entry.loaded_at < self.TTL:
+                self._entries.move_to_end(concept_id)
+                return entry
+            self._entries.pop(concept_id, None)
+            return None
+
+    def should_load(self, concept_id: str) -> bool:
+        """Count a cold lookup; True once the concept has become hot."""
+        with self._lock:
+            self._lookups[concept_id] += 1
+            if len(self._lookups) > 10 * self.MAX_CONCEPTS:
+                self._lookups = Counter(dict(self._lookups.most_common(self.MAX_CONCEPTS)))
+            return self._lookups[concept_id] >= self.HOT_AFTER
+
+    def put(self, concept_id: str, items: ConceptItems) -> None:
+        with self._lock:
+            self._entries[concept_id] = items
+            self._entries.move_to_end(concept_id)
+            self._lookups.pop(concept_id, None)
+            while len(self._entries) > self.MAX_CONCEPTS:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, concept_ids: Optional[Set[str]] = None) -> None:
+        with self._lock:
+            if concept_ids is None:
+                self._entries.clear()
+            else:
+                for concept_id in concept_ids:
+                    self._entries.pop(concept_id, None)
+
+
+_hot_index = _HotConceptIndex()
+
+
+class ItemRetrievalService:
+    """
+    Service for finding question-bank items by concept and difficulty,
+    backed by the question_concept association table.
+    """
+
+    # Questions without a difficulty_score are indexed at grade level
+    DEFAULT_DIFFICULTY = 0.5
+    MAX_ZPD_ITEMS = 50  # Upper bound on k for ZPD lookups from the API
+
+    @staticmethod
+    def sync_questions(db: Session, questions: List[Question]) -> int:
+        """
+        Mirror the questions' concept_ids into question_concept (replacing
+        any existing rows for them). Does not commit.
+
+        Returns:
+            Number of association rows written
+        """
+        question_ids = [q.id for q in questions]
+        if not question_ids:
+            return 0
+
+        rows = []
+        touched: Set[str] = set()
+        for q in questions:
+            difficulty = q.difficulty_score
+            if difficulty is None:
+                difficulty = ItemRetrievalService.DEFAULT_DIFFICULTY
+            for concept_id in dict.fromkeys(q.concept_ids or []):
+                rows.append({
+                    "question_id": q.id,
+                    "concept_id": concept_id,
+                    "difficulty_score": difficulty
+                })
+                touched.add(concept_id)
+
+        db.execute(delete(QuestionConcept).where(QuestionConcept.question_id.in_(question_ids)))
+        if rows:
+            db.execute(insert(QuestionConcept), rows)
+        _hot_index.invalidate(touched)
+        return len(rows)
+
+    @staticmethod
+    def _seen_questions(test_id: uuid.UUID):
+        """Questions a student has answered or been given in their own test."""
+        return union(
+            select(ResponseEvent.question_id).where(
+                ResponseEvent.test_id == test_id,
+                ResponseEvent.question_id.is_not(None)
+            ),
+            select(Question.id).where(Question.test_id == test_id)
+        )
+
+    @staticmethod
+    def _load_concept(db: Session, concept_id: str) -> ConceptItems:
+        rows = db.execute(
+            select(QuestionConcept.difficulty_score, QuestionConcept.question_id)
+            .where(QuestionConcept.concept_id == concept_id)
+            .order_by(QuestionConcept.difficulty_score, QuestionConcept.question_id)
+        ).all()
+        return ConceptItems([r[0] for r in rows], [r[1] for r in rows], datetime.now())
+
+    @staticmethod
+    def find_items(
+        db: Session,
+        concept_id: str,
+        lo: float,
+        hi: float,
+        k: int,
+        test_id: Optional[uuid.UUID] = None,
+        exclude: Optional[Set[uuid.UUID]] = None
+    ) -> List[Dict]:
+        """
+        Up to k items for a concept with difficulty in [lo, hi], easiest first,
+        skipping items the student has already seen.
+
+        Args:
+            db: Database session
+            concept_id: Concept identifier
+            lo: Minimum difficulty (inclusive)
+            hi: Maximum difficulty (inclusive)
+            k: Number of items wanted
+            test_id: Student whose seen items are excluded (None = exclude nothing)
+            exclude: Further question ids to skip (e.g. already given in this session)
+
+        Returns:
+            [{"question_id", "difficulty_score"}, ...]
+        """
+        now = datetime.now()
+        items = _hot_index.get(concept_id, now)
+        if items is None and _hot_index.should_load(concept_id):
+            items = ItemRetrievalService._load_concept(db, concept_id)
+            _hot_index.put(concept_id, items)
+
+        if items is None:
+            # Cold concept: one range scan on (concept_id, difficulty_score)
+            stmt = (
+                select(QuestionConcept.question_id, QuestionConcept.difficulty_score)
+                .where(
+                    QuestionConcept.concept_id == concept_id,
+                    QuestionConcept.difficulty_score.between(lo, hi)
+                )
+                .order_by(QuestionConcept.difficulty_score, QuestionConcept.question_id)
+                .limit(k)
+            )
+            if test_id is not None:
+                stmt = stmt.where(
+                    QuestionConcept.question_id.not_in(ItemRetrievalService._seen_questions(test_id))
+                )
+            if exclude:
+                stmt = stmt.where(QuestionConcept.question_id.not_in(exclude))
+            return [
+                {"question_id": question_id, "difficulty_score": difficulty}
+                for question_id, difficulty in db.execute(stmt)
+            ]
+
+        # Hot concept: bisect to the range, then skip seen items
+        seen: Set[uuid.UUID] = set()
+        if test_id is not None:
+            seen = set(db.execute(ItemRetrievalService._seen_questions(test_id)).scalars())
+        if exclude:
+            seen |= exclude
+
+        found = []
+        start = bisect_left(items.difficulties, lo)
+        end = bisect_right(items.difficulties, hi)
+        for i in range(start, end):
+            if items.question_ids[i] in seen:
+                continue
+            found.append({"question_id": items.question_ids[i], "difficulty_score": items.difficulties[i]})
+            if len(found) >= k:
+                break
+        return found
+
+    @staticmethod
+    def find_zpd_items(
+        db: Session,
+        test_id: uuid.UUID,
+        concept_id: str,
+        k: int = 5
+    ) -> Dict:
+        """
+        Unseen items for a concept inside the student's Zone of Proximal
+        Development (AdaptiveDifficultyService.calculate_zpd_range).
+        """
+        level = db.execute(
+            select(MasteryRecord.current_level).where(
+                MasteryRecord.test_id == test_id,
+                MasteryRecord.concept_id == concept_id
+            )
+        ).scalar()
+        lo, hi = AdaptiveDifficultyService.calculate_zpd_range(level or 0.0)
+
+        return {
+            "concept_id": concept_id,
+            "zpd_range": [lo, hi],
+            "items": ItemRetrievalService.find_items(db, concept_id, lo, hi, k, test_id)
+        }
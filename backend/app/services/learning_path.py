@@ -0,0 +1,181 @@
+"""
+Prerequisite-ordered learning paths.
+
+A path is a topological order of the prerequisite DAG restricted to the
+concepts a student has not mastered: the grade's concepts plus any unmastered
+prerequisites they reach into (earlier grades included). Among the concepts
+whose prerequisites are already placed, the planner takes the one with the
+highest weight, where weight combines the mastery gap with how many other
+path concepts it directly unlocks.
+
+Weights are quantized into a fixed number of buckets and Kahn's algorithm
+pops from the highest non-empty bucket, so a plan is O(concepts + edges) with
+no heap. A planner holds the per-taxonomy, per-grade setup and can be reused
+for every student in a class.
+"""
+from collections import deque
+from typing import Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.data.taxonomy_graph import CompiledTaxonomy
+from app.data.taxonomy_packs import get_taxonomy
+from app.models.concept import MasteryRecord
+from app.services.mastery_service import MasteryService
+import uuid
+
+
+class LearningPathPlanner:
+    """Plans learning paths over one taxonomy, optionally scoped to a grade."""
+
+    BUCKETS = 64
+    FANOUT_WEIGHT = 0.5  # Unlocking the most concepts counts half as much as a full gap
+    UNASSESSED_GAP = 0.5  # Gap assumed for concepts with no mastery estimate
+
+    def __init__(self, taxonomy: CompiledTaxonomy, grade_level: Optional[int] = None):
+        self.taxonomy = taxonomy
+        self.grade_level = grade_level
+        if grade_level is None:
+            self.scope = list(range(len(taxonomy)))
+        else:
+            self.scope = list(taxonomy.by_grade.get(grade_level, []))
+        self.in_scope = set(self.scope)
+
+    def _bucket(self, gap: float, fanout: int, max_fanout: int) -> int:
+        weight = gap + (self.FANOUT_WEIGHT * fanout / max_fanout if max_fanout else 0.0)
+        return min(self.BUCKETS - 1, int(weight / (1.0 + self.FANOUT_WEIGHT) * self.BUCKETS))
+
+    def _item(self, i: int, level: Optional[float], fanout: int) -> Dict:
+        concept = self.taxonomy.concepts[i]
+        if level is not None and level < MasteryService.PROFICIENT_THRESHOLD:
+            reason, priority = "Identified gap - mastery below proficient", "high"
+        elif level is not None:
+            reason, priority = "Close to mastery - practice to consolidate", "medium"
+        elif i not in self.in_scope:
+            reason, priority = "Unmastered prerequisite from another grade", "medium"
+        else:
+            reason, priority = "Advanced topic for future learning", "low"
+        return {
+            "concept_id": concept["concept_id"],
+            "name": concept["name"],
+            "reason": reason,
+            "priority": priority,
+            "current_mastery": level,
+            "unlocks": fanout,
+        }
+
+    def plan(self, levels: Dict[str, float]) -> List[Dict]:
+        """
+        Learning path for one student.
+
+        Args:
+            levels: concept_id -> mastery level (0.0-1.0); missing = not assessed
+
+        Returns:
+            Path items in learning order; every concept comes after all of its
+            unmastered prerequisites
+        """
+        taxonomy = self.taxonomy
+        threshold = MasteryService.MASTERY_THRESHOLD
+
+        # 1. Unmastered concepts in scope, plus their unmastered prerequisites
+        level_of: Dict[int, Optional[float]] = {}
+        stack = []
+        for i in self.scope:
+            level = levels.get(taxonomy.ids[i])
+            if level is None or level < threshold:
+                level_of[i] = level
+                stack.append(i)
+        while stack:
+            for j in taxonomy.prerequisites[stack.pop()]:
+                if j in level_of:
+                    continue
+                level = levels.get(taxonomy.ids[j])
+                if level is None or level < threshold:
+                    level_of[j] = level
+                    stack.append(j)
+
+        # 2. In-degree and fan-out within the unmastered subgraph
+        remaining: Dict[int, int] = {}
+        fanout: Dict[int, int] = {}
+        for i in level_of:
+            remaining[i] = sum(1 for j in taxonomy.prerequisites[i] if j in level_of)
+            fanout[i] = sum(1 for d in taxonomy.dependents[i] if d in level_of)
+        max_fanout = max(fanout.values(), default=0)
+
+        def bucket(i: int) -> int:
+            level = level_of[i]
+            gap = 1.0 - level if level is not None else self.UNASSESSED_GAP
+            return self._bucket(gap, fanout[i], max_fanout)
+
+        # 3. Kahn's algorithm over a bucket queue (FIFO within a bucket, so
+        #    ties keep discovery order: grade concepts in taxonomy order first)
+        buckets = [deque() for _ in range(self.BUCKETS)]
+        top = -1
+        for i in level_of:
+            if remaining[i] == 0:
+                b = bucket(i)
+                buckets[b].append(i)
+                top = max(top, b)
+
+        path = []
+        while top >= 0:
+            if not buckets[top]:
+                top -= 1
+                continue
+            i = buckets[top].popleft()
+            path.append(self._item(i, level_of[i], fanout[i]))
+            for d in taxonomy.dependents[i]:
+                if d in remaining:
+                    remaining[d] -= 1
+                    if remaining[d] == 0:
+                        b = bucket(d)
+                        buckets[b].append(d)
+                        top = max(top, b)
+        return path
+
+    def plan_class(self, levels_by_student: Dict[str, Dict[str, float]]) -> Dict[str, List[Dict]]:
+        """Paths for many students sharing this planner's taxonomy and grade."""
+        return {student: self.plan(levels) for student, levels in levels_by_student.items()}
+
+
+class LearningPathService:
+    """Service for building learning paths from stored mastery records."""
+
+    IN_CLAUSE_BATCH = 500
+
+    @staticmethod
+    def load_levels(db: Session, test_ids: List[uuid.UUID]) -> Dict[uuid.UUID, Dict[str, float]]:
+        """concept_id -> current_level for each student, in one query per IN batch."""
+        levels: Dict[uuid.UUID, Dict[str, float]] = {test_id: {} for test_id in test_ids}
+        batch = LearningPathService.IN_CLAUSE_BATCH
+        for start in range(0, len(test_ids), batch):
+            rows = db.execute(
+                select(MasteryRecord.test_id, MasteryRecord.concept_id, MasteryRecord.current_level)
+                .where(MasteryRecord.test_id.in_(test_ids[start:start + batch]))
+            )
+            for test_id, concept_id, level in rows:
+                levels[test_id][concept_id] = level or 0.0
+        return levels
+
+    @staticmethod
+    def plan_for_class(
+        db: Session,
+        test_ids: List[uuid.UUID],
+        grade_level: int,
+        exam_standard: str = "NCDPI"
+    ) -> Dict[str, List[Dict]]:
+        """
+        Learning paths for a whole class in one call.
+
+        Args:
+            db: Database session
+            test_ids: Students (one test per student)
+            grade_level: Grade whose concepts the paths cover
+            exam_standard: Taxonomy to plan over
+
+        Returns:
+            str(test_id) -> ordered path items
+        """
+        planner = LearningPathPlanner(get_taxonomy(exam_standard), grade_level)
+        levels = LearningPathService.load_levels(db, test_ids)
+        return planner.plan_class({str(test_id): student_levels for test_id, student_levels in levels.items()})
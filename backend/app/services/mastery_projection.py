@@ -0,0 +1,235 @@
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import Boolean, bindparam, case, delete, exists, func, insert, select, update
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.concept import MasteryRecord
+from app.models.response_event import ResponseEvent
+from app.services import bkt
+from app.services.adaptive_difficulty import recommendation_states
+from app.services.mastery_service import MasteryService
+from app.services.sm2_batch import load_response_arrays
+import uuid
+
+
+class MasteryProjectionService:
+    """
+    Rebuilds MasteryRecord projections from the append-only ResponseEvent log.
+
+    Events are streamed in (test_id, concept_id, id) order, so every
+    projection is folded from a contiguous run of rows and memory stays
+    bounded by chunk_size no matter how long the log is.
+    """
+
+    DEFAULT_CHUNK_SIZE = 10000
+    SKIPPED_REPORT_LIMIT = 100  # Skipped keys listed in the rebuild result
+
+    # Columns copied from the in-memory state into the rebuilt row
+    PROJECTED_COLUMNS = (
+        "current_level", "questions_attempted", "questions_correct",
+        "streak_current", "streak_best", "ease_factor", "interval_days",
+        "repetitions", "avg_time_to_correct", "mastery_achieved_date",
+        "is_mastered", "needs_review", "last_practiced", "next_review_due",
+    )
+
+    @staticmethod
+    def _stream_events(
+        db: Session,
+        test_id: Optional[uuid.UUID],
+        chunk_size: int
+    ) -> Iterator[Tuple]:
+        """Yield (test_id, concept_id, is_correct, time, had_hint, answered_at) rows."""
+        stmt = select(
+            ResponseEvent.test_id,
+            ResponseEvent.concept_id,
+            ResponseEvent.is_correct,
+            ResponseEvent.time_taken_seconds,
+            ResponseEvent.had_hint,
+            ResponseEvent.answered_at,
+        ).order_by(ResponseEvent.test_id, ResponseEvent.concept_id, ResponseEvent.id)
+        if test_id is not None:
+            stmt = stmt.where(ResponseEvent.test_id == test_id)
+
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=chunk_size))
+        for partition in result.partitions():
+            yield from partition
+
+    @staticmethod
+    def _to_row(key: Tuple[uuid.UUID, str], state: SimpleNamespace, first_at) -> Dict:
+        row = {col: getattr(state, col) for col in MasteryProjectionService.PROJECTED_COLUMNS}
+        row["id"] = uuid.uuid4()
+        row["test_id"], row["concept_id"] = key
+        row["first_attempt_date"] = first_at
+        return row
+
+    @staticmethod
+    def rebuild(
+        db: Session,
+        test_id: Optional[uuid.UUID] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        all_students: bool = False
+    ) -> Dict:
+        """
+        Replay the event log into fresh MasteryRecord rows.
+
+        Only records the log fully covers are replaced: (test_id, concept_id)
+        pairs whose event count is at least the record's questions_attempted,
+        plus event pairs that have no record. Records with answers from before
+        the log existed (none or fewer events than attempts) are kept as they
+        are, since a replay would drop those answers; partially covered ones
+        are reported as skipped.
+
+        Args:
+            db: Database session
+            test_id: Rebuild one student's projections
+            chunk_size: Events fetched and rows inserted per round trip
+            all_students: Must be set to rebuild everyone's (test_id None)
+
+        Returns:
+            Counts of events replayed, projections written and records
+            skipped, with up to SKIPPED_REPORT_LIMIT skipped keys
+        """
+        if test_id is None and not all_students:
+            raise ValueError("Pass a test_id, or set all_students to rebuild every student's records")
+
+        same_key = (
+            (ResponseEvent.test_id == MasteryRecord.test_id)
+            & (ResponseEvent.concept_id == MasteryRecord.concept_id)
+        )
+        event_count = select(func.count()).where(same_key).correlate(MasteryRecord).scalar_subquery()
+        attempted = func.coalesce(MasteryRecord.questions_attempted, 0)
+
+        partial_stmt = select(MasteryRecord.test_id, MasteryRecord.concept_id).where(
+            exists().where(same_key), attempted > event_count
+        )
+        delete_stmt = delete(MasteryRecord).where(
+            exists().where(same_key), attempted <= event_count
+        )
+        if test_id is not None:
+            partial_stmt = partial_stmt.where(MasteryRecord.test_id == test_id)
+            delete_stmt = delete_stmt.where(MasteryRecord.test_id == test_id)
+        skipped = {tuple(row) for row in db.execute(partial_stmt)}
+        db.execute(delete_stmt)
+
+        pending: List[Dict] = []
+        events_replayed = 0
+        projections = 0
+        key = None
+        state = None
+        first_at = None
+
+        def flush():
+            if pending:
+                db.execute(insert(MasteryRecord), pending)
+                pending.clear()
+
+        for ev_test_id, concept_id, is_correct, time_taken, had_hint, answered_at in \
+                MasteryProjectionService._stream_events(db, test_id, chunk_size):
+            if (ev_test_id, concept_id) in skipped:
+                continue
+            if (ev_test_id, concept_id) != key:
+                if state is not None:
+                    pending.append(MasteryProjectionService._to_row(key, state, first_at))
+                    projections += 1
+                    if len(pending) >= chunk_size:
+                        flush()
+                key = (ev_test_id, concept_id)
+                state = SimpleNamespace(
+                    concept_id=concept_id,
+                    **MasteryService.initial_record_values(answered_at)
+                )
+                first_at = answered_at
+
+            MasteryService.apply_answer(state, is_correct, time_taken, had_hint, now=answered_at)
+            events_replayed += 1
+
+        if state is not None:
+            pending.append(MasteryProjectionService._to_row(key, state, first_at))
+            projections += 1
+        flush()
+
+        db.commit()
+        MasteryService.invalidate_summary(test_id)
+        recommendation_states.invalidate(test_id)
+
+        return {
+            "events_replayed": events_replayed,
+            "projections_rebuilt": projections,
+            "records_skipped": len(skipped),
+            "skipped": [
+                {"test_id": str(t), "concept_id": c}
+                for t, c in sorted(skipped, key=str)[:MasteryProjectionService.SKIPPED_REPORT_LIMIT]
+            ]
+        }
+
+    @staticmethod
+    def reestimate_bkt(
+        db: Session,
+        test_id: Optional[uuid.UUID] = None
+    ) -> Dict:
+        """
+        Recompute BKT mastery for one student or the whole cohort from the
+        event log in one batched pass (e.g. after refitting parameters), and
+        write current_level / is_mastered back with one executemany UPDATE.
+
+        Returns:
+            Counts of events replayed and records updated
+        """
+        if settings.MASTERY_MODEL != "bkt":
+            raise ValueError("MASTERY_MODEL is not 'bkt'; re-estimating would mix mastery models")
+
+        events, keys = load_response_arrays(db, test_id)
+        if not keys:
+            return {"events_replayed": 0, "records_updated": 0}
+
+        concept_ids = sorted({concept_id for _, concept_id in keys})
+        concept_code = {c: i for i, c in enumerate(concept_ids)}
+        concept_of_sequence = np.array([concept_code[c] for _, c in keys], dtype=np.int64)
+
+        result = bkt.forward(
+            events.sequence_ids, events.is_correct,
+            concept_of_sequence, bkt.param_table(concept_ids)
+        )
+
+        threshold = MasteryService.MASTERY_THRESHOLD
+        rows = [
+            {
+                "b_test_id": keys[seq][0],
+                "b_concept_id": keys[seq][1],
+                "b_level": float(level),
+                "b_mastered": bool(level >= threshold),
+            }
+            for seq, level in zip(result["sequence_ids"].tolist(), result["p_known"].tolist())
+        ]
+
+        table = MasteryRecord.__table__
+        now = datetime.now()
+        # Core table update, so the rows go out as one executemany keyed on
+        # (test_id, concept_id) instead of an ORM update by primary key
+        stmt = (
+            update(table)
+            .where(
+                table.c.test_id == bindparam("b_test_id"),
+                table.c.concept_id == bindparam("b_concept_id")
+            )
+            .values(
+                current_level=bindparam("b_level"),
+                is_mastered=bindparam("b_mastered"),
+                mastery_achieved_date=case(
+                    (bindparam("b_mastered", type_=Boolean),
+                     func.coalesce(table.c.mastery_achieved_date, now)),
+                    else_=table.c.mastery_achieved_date
+                )
+            )
+        )
+        db.execute(stmt, rows)
+        db.commit()
+        MasteryService.invalidate_summary(test_id)
+        recommendation_states.invalidate(test_id)
+
+        return {
+            "events_replayed": len(events),
+            "records_updated": len(rows)
+        }
@@ -1,7 +1,14 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
+from sqlalchemy import and_, case, func, insert, update
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.models.concept import MasteryRecord, Concept
+from app.models.response_event import ResponseEvent
+from app.services import bkt
+from app.services.concept_catalog import concept_catalog
+import threading
 import uuid
 
 
@@ -16,6 +23,10 @@ class MasteryService:
     PROFICIENT_THRESHOLD = 0.6  # 60% = proficient
     DEVELOPING_THRESHOLD = 0.4  # 40% = developing
     
+    # Longest review interval; without a cap, long correct streaks grow the
+    # interval past what datetime can represent
+    MAX_INTERVAL_DAYS = 365
+    
     @staticmethod
     def calculate_mastery_level(correct: int, total: int) -> float:
         """Calculate mastery level (0.0-1.0) based on correct/total ratio."""
@@ -23,6 +34,23 @@ class MasteryService:
             return 0.0
         return min(1.0, correct / total)
     
+    @staticmethod
+    def estimate_mastery_level(record: MasteryRecord, is_correct: bool) -> float:
+        """
+        Mastery level after an answer already counted on the record, from the
+        configured model: the correct/attempted ratio, or the BKT probability
+        that the concept is known (O(1), from the previous level).
+        """
+        if settings.MASTERY_MODEL == "bkt":
+            params = bkt.get_params(getattr(record, "concept_id", None))
+            prior = record.current_level if record.questions_attempted > 1 else params.p_init
+            return params.update(prior, is_correct)
+        
+        return MasteryService.calculate_mastery_level(
+            record.questions_correct,
+            record.questions_attempted
+        )
+    
     @staticmethod
     def update_sm2_parameters(
         quality: int,  # 0-5 (0=complete blackout, 5=perfect response)
@@ -65,7 +93,10 @@ class MasteryService:
             elif new_repetitions == 2:
                 new_interval_days = 6
             else:
-                new_interval_days = int(interval_days * new_ease_factor)
+                new_interval_days = min(
+                    MasteryService.MAX_INTERVAL_DAYS,
+                    int(interval_days * new_ease_factor)
+                )
         
         return new_ease_factor, new_interval_days, new_repetitions
     
@@ -104,42 +135,76 @@ class MasteryService:
             return 3  # Okay - correct but slow
     
     @staticmethod
-    def update_mastery_record(
+    def initial_record_values(now: datetime) -> Dict:
+        """Column values of a mastery record before any answer is applied."""
+        return {
+            "current_level": 0.0,
+            "questions_attempted": 0,
+            "questions_correct": 0,
+            "streak_current": 0,
+            "streak_best": 0,
+            "ease_factor": 2.5,
+            "interval_days": 1,
+            "repetitions": 0,
+            "avg_time_to_correct": None,
+            "mastery_achieved_date": None,
+            "is_mastered": False,
+            "needs_review": False,
+            "last_practiced": now,
+            "next_review_due": now + timedelta(days=1)
+        }
+    
+    @staticmethod
+    def new_mastery_record(test_id: uuid.UUID, concept_id: str) -> MasteryRecord:
+        """Create an unsaved mastery record with its counters initialised."""
+        return MasteryRecord(
+            test_id=test_id,
+            concept_id=concept_id,
+            **MasteryService.initial_record_values(datetime.now())
+        )
+    
+    @staticmethod
+    def record_response_events(
         db: Session,
-        test_id: uuid.UUID,
-        concept_id: str,
+        events: List[Dict],
+        now: datetime
+    ) -> None:
+        """Append answer events to the response log with one batched INSERT."""
+        db.execute(insert(ResponseEvent), [
+            {
+                "test_id": e["test_id"],
+                "concept_id": e["concept_id"],
+                "question_id": e.get("question_id"),
+                "is_correct": e["is_correct"],
+                "time_taken_seconds": e["time_taken_seconds"],
+                "had_hint": e.get("had_hint", False),
+                "answered_at": now
+            }
+            for e in events
+        ])
+    
+    @staticmethod
+    def apply_answer(
+        record: MasteryRecord,
         is_correct: bool,
         time_taken_seconds: float,
-        had_hint: bool = False
+        had_hint: bool = False,
+        now: Optional[datetime] = None
     ) -> MasteryRecord:
         """
-        Update or create a mastery record for a concept.
+        Apply one answer to a mastery record in memory (no DB access).
         
         Args:
-            db: Database session
-            test_id: Test ID (for PII-minimal tracking)
-            concept_id: Concept identifier
+            record: Mastery record to update
             is_correct: Whether the answer was correct
             time_taken_seconds: Time taken to answer
             had_hint: Whether student used a hint
+            now: Timestamp of the answer (defaults to current time)
         
         Returns:
-            Updated MasteryRecord
+            The same record, updated
         """
-        # Get or create mastery record
-        record = db.query(MasteryRecord).filter(
-            MasteryRecord.test_id == test_id,
-            MasteryRecord.concept_id == concept_id
-        ).first()
-        
-        if not record:
-            record = MasteryRecord(
-                test_id=test_id,
-                concept_id=concept_id,
-                last_practiced=datetime.now(),
-                next_review_due=datetime.now() + timedelta(days=1)
-            )
-            db.add(record)
+        now = now or datetime.now()
         
         # Update attempt counts
         record.questions_attempted += 1
@@ -151,15 +216,12 @@ class MasteryService:
             record.streak_current = 0
         
         # Calculate mastery level
-        record.current_level = MasteryService.calculate_mastery_level(
-            record.questions_correct,
-            record.questions_attempted
-        )
+        record.current_level = MasteryService.estimate_mastery_level(record, is_correct)
         
         # Update mastery status
         if record.current_level >= MasteryService.MASTERY_THRESHOLD and not record.is_mastered:
             record.is_mastered = True
-            record.mastery_achieved_date = datetime.now()
+            record.mastery_achieved_date = now
         elif record.current_level < MasteryService.MASTERY_THRESHOLD:
             record.is_mastered = False
         
@@ -181,8 +243,8 @@ class MasteryService:
         record.ease_factor = new_ease
         record.interval_days = new_interval
         record.repetitions = new_reps
-        record.last_practiced = datetime.now()
-        record.next_review_due = datetime.now() + timedelta(days=new_interval)
+        record.last_practiced = now
+        record.next_review_due = now + timedelta(days=new_interval)
         record.needs_review = False
         
         # Update learning velocity
@@ -192,11 +254,133 @@ class MasteryService:
             # Exponential moving average
             record.avg_time_to_correct = 0.7 * record.avg_time_to_correct + 0.3 * time_taken_seconds
         
+        return record
+    
+    @staticmethod
+    def update_mastery_record(
+        db: Session,
+        test_id: uuid.UUID,
+        concept_id: str,
+        is_correct: bool,
+        time_taken_seconds: float,
+        had_hint: bool = False,
+        question_id: Optional[uuid.UUID] = None
+    ) -> MasteryRecord:
+        """
+        Update or create a mastery record for a concept.
+        
+        Args:
+            db: Database session
+            test_id: Test ID (for PII-minimal tracking)
+            concept_id: Concept identifier
+            is_correct: Whether the answer was correct
+            time_taken_seconds: Time taken to answer
+            had_hint: Whether student used a hint
+            question_id: Question answered (logged with the event)
+        
+        Returns:
+            Updated MasteryRecord
+        """
+        # Get or create mastery record
+        record = db.query(MasteryRecord).filter(
+            MasteryRecord.test_id == test_id,
+            MasteryRecord.concept_id == concept_id
+        ).first()
+        
+        if not record:
+            concept_catalog.ensure(db, [concept_id])
+            record = MasteryService.new_mastery_record(test_id, concept_id)
+            db.add(record)
+        
+        now = datetime.now()
+        MasteryService.apply_answer(record, is_correct, time_taken_seconds, had_hint, now=now)
+        MasteryService.record_response_events(db, [{
+            "test_id": test_id,
+            "concept_id": concept_id,
+            "question_id": question_id,
+            "is_correct": is_correct,
+            "time_taken_seconds": time_taken_seconds,
+            "had_hint": had_hint
+        }], now)
+        
         db.commit()
+        MasteryService.invalidate_summary(test_id)
         db.refresh(record)
         
         return record
     
+    @staticmethod
+    def apply_mastery_events(
+        db: Session,
+        events: List[Dict]
+    ) -> List[MasteryRecord]:
+        """
+        Apply an ordered batch of answer events in one query and one commit.
+        
+        Args:
+            db: Database session
+            events: Ordered dicts with test_id, concept_id, is_correct,
+                time_taken_seconds and optional had_hint / question_id
+        
+        Returns:
+            Updated MasteryRecords, one per (test_id, concept_id), in first-seen order
+        """
+        if not events:
+            return []
+        
+        test_ids = {e["test_id"] for e in events}
+        concept_ids = {e["concept_id"] for e in events}
+        
+        # One SELECT for every affected record; the IN filters may over-fetch
+        # across pairs, so index the rows by their exact key.
+        records = {
+            (r.test_id, r.concept_id): r
+            for r in db.query(MasteryRecord).filter(
+                MasteryRecord.test_id.in_(test_ids),
+                MasteryRecord.concept_id.in_(concept_ids)
+            ).all()
+        }
+        
+        # Concept rows must exist before new records reference them
+        concept_catalog.ensure(db, {
+            e["concept_id"] for e in events if (e["test_id"], e["concept_id"]) not in records
+        })
+        
+        touched: Dict[tuple, MasteryRecord] = {}
+        now = datetime.now()
+        for event in events:
+            key = (event["test_id"], event["concept_id"])
+            record = records.get(key)
+            if record is None:
+                record = MasteryService.new_mastery_record(*key)
+                db.add(record)
+                records[key] = record
+            
+            MasteryService.apply_answer(
+                record,
+                event["is_correct"],
+                event["time_taken_seconds"],
+                had_hint=event.get("had_hint", False),
+                now=now
+            )
+            touched.setdefault(key, record)
+        
+        MasteryService.record_response_events(db, events, now)
+        
+        # The updated values are already in memory; keep them instead of
+        # reloading every record after the commit
+        expire_on_commit = db.expire_on_commit
+        db.expire_on_commit = False
+        try:
+            db.commit()
+        finally:
+            db.expire_on_commit = expire_on_commit
+        
+        for touched_test_id in test_ids:
+            MasteryService.invalidate_summary(touched_test_id)
+        
+        return list(touched.values())
+    
     @staticmethod
     def get_concepts_due_for_review(
         db: Session,
@@ -210,44 +394,130 @@ class MasteryService:
             MasteryRecord.next_review_due <= now
         ).order_by(MasteryRecord.next_review_due).limit(limit).all()
     
+    @staticmethod
+    def flag_due_reviews(
+        db: Session,
+        now: Optional[datetime] = None
+    ) -> int:
+        """
+        Set needs_review on every record whose review time has passed,
+        in one bulk UPDATE.
+        
+        Returns:
+            Number of records flagged
+        """
+        now = now or datetime.now()
+        result = db.execute(
+            update(MasteryRecord)
+            .where(
+                MasteryRecord.needs_review == False,  # noqa: E712
+                MasteryRecord.next_review_due <= now
+            )
+            .values(needs_review=True)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+        return result.rowcount
+    
     @staticmethod
     def get_mastery_summary(
         db: Session,
         test_id: uuid.UUID
     ) -> Dict:
-        """Get overall mastery summary for a student."""
-        records = db.query(MasteryRecord).filter(
-            MasteryRecord.test_id == test_id
-        ).all()
-        
-        if not records:
-            return {
-                "total_concepts": 0,
-                "mastered": 0,
-                "proficient": 0,
-                "developing": 0,
-                "struggling": 0,
-                "overall_mastery": 0.0,
-                "best_streak": 0,
-                "concepts_due_review": 0
-            }
+        """
+        Get overall mastery summary for a student.
+        Computed by one conditional-aggregate query and cached per test_id.
+        """
+        now = datetime.now()
+        cached = _summary_cache.get(test_id, now)
+        if cached is not None:
+            return cached
         
-        mastered = sum(1 for r in records if r.current_level >= MasteryService.MASTERY_THRESHOLD)
-        proficient = sum(1 for r in records if MasteryService.PROFICIENT_THRESHOLD <= r.current_level < MasteryService.MASTERY_THRESHOLD)
-        developing = sum(1 for r in records if MasteryService.DEVELOPING_THRESHOLD <= r.current_level < MasteryService.PROFICIENT_THRESHOLD)
-        struggling = sum(1 for r in records if r.current_level < MasteryService.DEVELOPING_THRESHOLD)
+        level = MasteryRecord.current_level
+        due = MasteryRecord.next_review_due
         
-        overall_mastery = sum(r.current_level for r in records) / len(records)
-        best_streak = max((r.streak_best for r in records), default=0)
-        concepts_due = sum(1 for r in records if r.next_review_due <= datetime.now())
+        def count_where(condition):
+            return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
         
-        return {
-            "total_concepts": len(records),
+        row = db.query(
+            func.count(MasteryRecord.id),
+            count_where(level >= MasteryService.MASTERY_THRESHOLD),
+            count_where(and_(level >= MasteryService.PROFICIENT_THRESHOLD, level < MasteryService.MASTERY_THRESHOLD)),
+            count_where(and_(level >= MasteryService.DEVELOPING_THRESHOLD, level < MasteryService.PROFICIENT_THRESHOLD)),
+            count_where(level < MasteryService.DEVELOPING_THRESHOLD),
+            func.avg(level),
+            func.max(MasteryRecord.streak_best),
+            count_where(due <= now),
+            # Earliest future review: the due count changes at this moment
+            func.min(case((due > now, due))),
+        ).filter(MasteryRecord.test_id == test_id).one()
+        
+        total, mastered, proficient, developing, struggling, avg_level, best_streak, concepts_due, next_due = row
+        
+        summary = {
+            "total_concepts": total,
             "mastered": mastered,
             "proficient": proficient,
             "developing": developing,
             "struggling": struggling,
-            "overall_mastery": round(overall_mastery, 2),
-            "best_streak": best_streak,
+            "overall_mastery": round(avg_level or 0.0, 2),
+            "best_streak": best_streak or 0,
             "concepts_due_review": concepts_due
         }
+        _summary_cache.put(test_id, summary, now, next_due)
+        
+        return dict(summary)
+    
+    @staticmethod
+    def invalidate_summary(test_id: Optional[uuid.UUID] = None) -> None:
+        """Drop the cached summary for one student, or for everyone if None."""
+        _summary_cache.invalidate(test_id)
+
+
+class _MasterySummaryCache:
+    """
+    Per-process cache of mastery summaries.
+    
+    An entry lives until a mastery update for that test_id invalidates it, the
+    next review falls due (which changes concepts_due_review), or the TTL
+    passes. The TTL bounds staleness when several worker processes serve the
+    same student.
+    """
+    
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[uuid.UUID, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, test_id: uuid.UUID, now: datetime) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(test_id)
+            if entry is None:
+                return None
+            summary, expires_at = entry
+            if now >= expires_at:
+                del self._entries[test_id]
+                return None
+            self._entries.move_to_end(test_id)
+            return dict(summary)
+    
+    def put(self, test_id: uuid.UUID, summary: Dict, now: datetime, next_due: Optional[datetime]) -> None:
+        expires_at = now + self.ttl
+        if next_due is not None:
+            expires_at = min(expires_at, next_due)
+        with self._lock:
+            self._entries[test_id] = (dict(summary), expires_at)
+            self._entries.move_to_end(test_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, test_id: Optional[uuid.UUID] = None) -> None:
+        with self._lock:
+            if test_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(test_id, None)
+
+
+_summary_cache = _MasterySummaryCache(settings.MASTERY_SUMMARY_CACHE_TTL_SECONDS)
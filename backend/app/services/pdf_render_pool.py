@@ -0,0 +1,214 @@
+"""
+Process-pool PDF rendering.
+
+pisa.CreatePDF is CPU-bound and holds the GIL, so calling it from an async
+route blocks every other request on the worker. Render jobs are handed to a
+bounded pool of worker processes instead; once the pool and its wait queue
+are full, new jobs are rejected with PDFRenderBusyError so the API can answer
+503 + Retry-After rather than piling up work.
+"""
+import asyncio
+import math
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import settings
+from app.core.exceptions import PDFRenderBusyError, PDFRenderTimeoutError
+
+
+# Per-process renderer, created once by the pool initializer
+_worker_service = None
+
+
+def _init_worker():
+    """Build the precompiled PDFService once per worker process."""
+    global _worker_service
+    from app.services.pdf_service import get_pdf_service
+    _worker_service = get_pdf_service()
+
+
+def _render_job(
+    test_data: Dict[str, Any],
+    questions: List[Dict[str, Any]],
+    template_name: str
+) -> Optional[bytes]:
+    """Entry point executed inside a worker process."""
+    if _worker_service is None:
+        _init_worker()
+    return _worker_service.render_pdf_bytes(
+        test_data, questions, template_name=template_name
+    )
+
+
+def _render_batch_job(
+    jobs: List[Tuple[str, Dict[str, Any], List[Dict[str, Any]], str]]
+) -> List[Tuple[str, Optional[bytes]]]:
+    """Render several documents in one worker, sharing its parsed templates."""
+    if _worker_service is None:
+        _init_worker()
+    return [
+        (name, _worker_service.render_pdf_bytes(test_data, questions, template_name=template_name))
+        for name, test_data, questions, template_name in jobs
+    ]
+
+
+class PDFRenderPool:
+    """
+    Bounded process pool for PDF rendering.
+
+    Capacity is max_workers running jobs plus max_queue waiting jobs. A job
+    counts against capacity until its worker finishes it. A timeout means a
+    worker may be stuck in a render that never returns, so the whole
+    executor is recycled: its processes are terminated (other jobs on it
+    fail), every slot is released and the next job starts a fresh pool.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_queue: int,
+        timeout_seconds: float,
+        retry_after_seconds: int
+    ):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout_seconds = timeout_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = 0
+        self._generation = 0  # Bumped on recycle; stale completions don't release slots
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def start(self):
+        """Spawn the worker processes (idempotent)."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker
+            )
+
+    def shutdown(self):
+        """Stop the workers and drop queued jobs."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._in_flight = 0
+            self._generation += 1
+
+    def _recycle(self, executor: ProcessPoolExecutor):
+        """Terminate a pool whose job timed out and free all of its slots."""
+        if executor is not self._executor:
+            return  # Already recycled by another timed-out job
+        processes = list((getattr(executor, "_processes", None) or {}).values())
+        self.shutdown()
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    def _release(self, generation: int):
+        if generation == self._generation:
+            self._in_flight = max(0, self._in_flight - 1)
+
+    def _track(self, job, loop: asyncio.AbstractEventLoop):
+        """Hold a capacity slot until the worker finishes the job."""
+        self._in_flight += 1
+        generation = self._generation
+
+        def _on_done(_future):
+            # Release the slot on the event loop thread once the worker is done
+            try:
+                loop.call_soon_threadsafe(self._release, generation)
+            except RuntimeError:
+                pass  # Loop already closed during shutdown
+
+        job.add_done_callback(_on_done)
+
+    async def render(
+        self,
+        test_data: Dict[str, Any],
+        questions: List[Dict[str, Any]],
+        template_name: str = "test_template.html"
+    ) -> Optional[bytes]:
+        """
+        Render a PDF in a worker process and return its bytes.
+
+        Raises:
+            PDFRenderBusyError: If the pool and its queue are full
+            PDFRenderTimeoutError: If the job exceeds timeout_seconds
+        """
+        if self._in_flight >= self.capacity:
+            raise PDFRenderBusyError(self.retry_after_seconds)
+
+        self.start()
+        executor = self._executor
+        loop = asyncio.get_running_loop()
+
+        job = executor.submit(
+            _render_job, test_data, questions, template_name
+        )
+        self._track(job, loop)
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(job), timeout=self.timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            self._recycle(executor)
+            raise PDFRenderTimeoutError(self.timeout_seconds)
+
+    async def render_batch(
+        self,
+        jobs: List[Tuple[str, Dict[str, Any], List[Dict[str, Any]], str]]
+    ) -> List[Tuple[str, Optional[bytes]]]:
+        """
+        Render many (name, test_data, questions, template_name) jobs at once.
+
+        Jobs are split into one chunk per worker so every core is used and
+        each worker parses the templates once for the whole chunk. Each chunk
+        takes one slot; the timeout scales with the chunk size.
+
+        Returns:
+            (name, pdf_bytes) pairs in the order the jobs were given
+        """
+        if not jobs:
+            return []
+
+        chunk_count = min(self.max_workers, len(jobs))
+        if self._in_flight + chunk_count > self.capacity:
+            raise PDFRenderBusyError(self.retry_after_seconds)
+
+        self.start()
+        executor = self._executor
+        loop = asyncio.get_running_loop()
+
+        chunk_size = math.ceil(len(jobs) / chunk_count)
+        chunks = [jobs[i:i + chunk_size] for i in range(0, len(jobs), chunk_size)]
+
+        futures = []
+        for chunk in chunks:
+            job = executor.submit(_render_batch_job, chunk)
+            self._track(job, loop)
+            futures.append(asyncio.wrap_future(job))
+
+        timeout = self.timeout_seconds * chunk_size
+        try:
+            results = await asyncio.wait_for(asyncio.gather(*futures), timeout=timeout)
+        except asyncio.TimeoutError:
+            self._recycle(executor)
+            raise PDFRenderTimeoutError(timeout)
+
+        return [item for chunk_result in results for item in chunk_result]
+
+
+pdf_render_pool = PDFRenderPool(
+    max_workers=settings.PDF_RENDER_WORKERS,
+    max_queue=settings.PDF_RENDER_MAX_QUEUE,
+    timeout_seconds=settings.PDF_RENDER_TIMEOUT_SECONDS,
+    retry_after_seconds=settings.PDF_RENDER_RETRY_AFTER_SECONDS
+)
@@ -1,27 +1,107 @@
 from xhtml2pdf import pisa
-from jinja2 import Environment, FileSystemLoader
-from typing import List, Dict, Any
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+from typing import List, Dict, Any, Optional
+from app.config import settings
+import glob
 import os
 import io
+import tempfile
+import threading
+import time
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "..", "templates")
+
+# File name patterns the report routes used to leave in the temp directory
+LEGACY_TEMP_PATTERNS = ("EOG_Practice_*.pdf", "Results_*.pdf")
+
+# Tiny document used to make xhtml2pdf load its fonts and default CSS
+_WARM_UP_HTML = "<html><body><p>warm-up</p></body></html>"
 
 class PDFService:
-    def __init__(self):
-        # Set template directory relative to this file
-        template_dir = os.path.join(os.path.dirname(__file__), "..", "templates")
-        self.env = Environment(loader=FileSystemLoader(template_dir))
+    def __init__(self, template_dir: str = TEMPLATE_DIR, bytecode_cache_dir: Optional[str] = None):
+        bytecode_cache = None
+        if bytecode_cache_dir:
+            os.makedirs(bytecode_cache_dir, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(bytecode_cache_dir)
+        
+        # auto_reload re-parses a cached template only when its mtime changes
+        self.env = Environment(
+            loader=FileSystemLoader(template_dir),
+            bytecode_cache=bytecode_cache,
+            auto_reload=True
+        )
 
-    def generate_test_pdf(self, test_data: Dict[str, Any], questions: List[Dict[str, Any]], output_path: str, template_name: str = "test_template.html"):
-        # 1. Load the specified template
+    def precompile(self) -> List[str]:
+        """Parse every template up front so the first request doesn't pay for it."""
+        names = self.env.list_templates(extensions=["html"])
+        for name in names:
+            self.env.get_template(name)
+        return names
+
+    def warm_up(self):
+        """Run one throwaway conversion so xhtml2pdf loads fonts and default CSS."""
+        pisa.CreatePDF(_WARM_UP_HTML, dest=io.BytesIO())
+
+    def render_pdf_bytes(self, test_data: Dict[str, Any], questions: List[Dict[str, Any]], template_name: str = "test_template.html") -> Optional[bytes]:
+        """Render the template straight into an in-memory PDF. Returns None on failure."""
         template = self.env.get_template(template_name)
-        
-        # 2. Render HTML content
         html_content = template.render(test=test_data, questions=questions)
         
-        # 3. Convert HTML to PDF using xhtml2pdf
+        buffer = io.BytesIO()
+        pisa_status = pisa.CreatePDF(html_content, dest=buffer)
+        
+        return buffer.getvalue() if not pisa_status.err else None
+
+    def generate_test_pdf(self, test_data: Dict[str, Any], questions: List[Dict[str, Any]], output_path: str, template_name: str = "test_template.html"):
+        pdf_bytes = self.render_pdf_bytes(test_data, questions, template_name)
+        if pdf_bytes is None:
+            return None
+        
         with open(output_path, "wb") as output_file:
-            pisa_status = pisa.CreatePDF(
-                html_content,
-                dest=output_file
-            )
+            output_file.write(pdf_bytes)
             
-        return output_path if not pisa_status.err else None
+        return output_path
+
+
+_pdf_service: Optional[PDFService] = None
+_pdf_service_lock = threading.Lock()
+
+
+def get_pdf_service() -> PDFService:
+    """
+    Process-wide PDFService, precompiled and warmed on first use.
+    The bytecode cache lives on disk, so every worker process after the first
+    loads compiled templates instead of re-parsing them.
+    """
+    global _pdf_service
+    if _pdf_service is None:
+        with _pdf_service_lock:
+            if _pdf_service is None:
+                service = PDFService(bytecode_cache_dir=settings.PDF_TEMPLATE_CACHE_DIR)
+                service.precompile()
+                service.warm_up()
+                _pdf_service = service
+    return _pdf_service
+
+
+def sweep_legacy_pdf_files(max_age_seconds: float, temp_dir: Optional[str] = None) -> int:
+    """
+    Delete report PDFs left in the temp directory by the old FileResponse flow.
+    
+    Returns:
+        Number of files removed
+    """
+    temp_dir = temp_dir or tempfile.gettempdir()
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    
+    for pattern in LEGACY_TEMP_PATTERNS:
+        for path in glob.glob(os.path.join(temp_dir, pattern)):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue  # Already gone or not ours to delete
+    
+    return removed
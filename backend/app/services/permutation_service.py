@@ -0,0 +1,127 @@
+import random
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import uuid
+
+
+@dataclass(frozen=True)
+class TestPermutation:
+    """
+    A deterministic shuffle of one test for one attempt.
+
+    question_order[d] is the canonical index shown at display position d.
+    option_maps[c] maps display label -> canonical label for canonical
+    question c (None when its options are not shuffled).
+    """
+    question_order: Tuple[int, ...]
+    option_maps: Tuple[Optional[Dict[str, str]], ...]
+
+    @property
+    def is_identity(self) -> bool:
+        return (
+            self.question_order == tuple(range(len(self.question_order)))
+            and all(m is None for m in self.option_maps)
+        )
+
+    def apply(self, questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Return the questions in display order with options relabelled."""
+        shuffled = []
+        for position, canonical_idx in enumerate(self.question_order, start=1):
+            q = dict(questions[canonical_idx])
+            q["sequence"] = position
+            option_map = self.option_maps[canonical_idx]
+            if option_map:
+                # canonical label -> display label for the answer-keyed fields
+                to_display = {c: d for d, c in option_map.items()}
+                q["options"] = {d: q["options"][c] for d, c in option_map.items()}
+                if q.get("correct_answer") in to_display:
+                    q["correct_answer"] = to_display[q["correct_answer"]]
+                if q.get("explanation_wrong"):
+                    q["explanation_wrong"] = {
+                        to_display.get(k, k): v for k, v in q["explanation_wrong"].items()
+                    }
+            shuffled.append(q)
+        return shuffled
+
+    def to_canonical(self, answers: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Map answers keyed by display position back to canonical order.
+        Each answer is two table lookups, so scoring costs the same as an
+        unshuffled submission.
+        """
+        canonical = {}
+        for key, answer in answers.items():
+            try:
+                display_idx = int(key)
+            except (TypeError, ValueError):
+                continue
+            if not 0 <= display_idx < len(self.question_order):
+                continue
+            canonical_idx = self.question_order[display_idx]
+            option_map = self.option_maps[canonical_idx]
+            if option_map and answer in option_map:
+                answer = option_map[answer]
+            canonical[str(canonical_idx)] = answer
+        return canonical
+
+
+class PermutationService:
+    """
+    Service for per-attempt question and option shuffling.
+    Permutations are derived from (test_id, attempt key), so nothing per
+    student is stored: the same attempt always sees the same order.
+    """
+
+    @staticmethod
+    def option_signature(questions: List[Dict[str, Any]]) -> Tuple[Optional[Tuple[str, ...]], ...]:
+        """Hashable summary of each question's option labels."""
+        return tuple(
+            tuple(sorted(q["options"].keys())) if q.get("options") else None
+            for q in questions
+        )
+
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def build_permutation(
+        test_id: uuid.UUID,
+        attempt_key: str,
+        option_signature: Tuple[Optional[Tuple[str, ...]], ...],
+        shuffle_questions: bool,
+        shuffle_options: bool
+    ) -> TestPermutation:
+        """Build (and memoize) the permutation for one attempt."""
+        # String seeds are hashed with SHA-512, so this is stable across processes
+        rng = random.Random(f"{test_id}:{attempt_key}")
+
+        order = list(range(len(option_signature)))
+        if shuffle_questions:
+            rng.shuffle(order)
+
+        option_maps = []
+        for labels in option_signature:
+            if not shuffle_options or not labels:
+                option_maps.append(None)
+                continue
+            shuffled = list(labels)
+            rng.shuffle(shuffled)
+            option_maps.append(dict(zip(labels, shuffled)))
+
+        return TestPermutation(tuple(order), tuple(option_maps))
+
+    @staticmethod
+    def for_attempt(
+        test_id: uuid.UUID,
+        attempt_key: Any,
+        questions: List[Dict[str, Any]],
+        shuffle_questions: bool,
+        shuffle_options: bool
+    ) -> TestPermutation:
+        """Permutation for an attempt over the given canonical questions."""
+        return PermutationService.build_permutation(
+            test_id,
+            str(attempt_key),
+            PermutationService.option_signature(questions),
+            bool(shuffle_questions),
+            bool(shuffle_options)
+        )
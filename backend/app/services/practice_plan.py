@@ -0,0 +1,232 @@
+"""
+Nightly precomputation of daily practice plans.
+
+Building every student's queue on demand at login piles the whole morning's
+traffic onto generate_practice_session. The batch instead walks all active
+students in chunks across worker processes (one mastery query per chunk) and
+stores a compact plan per student; the read path serves that row and only
+recomputes for students who have answered questions since it was written.
+"""
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import repeat
+from typing import Dict, Iterator, List, Optional
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db.session import SessionLocal
+from app.models.concept import MasteryRecord
+from app.models.practice_plan import PracticePlan
+from app.services.adaptive_difficulty import PersonalizedPracticeQueue
+from app.services.concept_catalog import concept_catalog
+import uuid
+
+_SECTION_BY_PRIORITY = {
+    priority: section
+    for section, (_, priority) in PersonalizedPracticeQueue.SECTIONS.items()
+}
+
+
+def _init_worker():
+    """
+    Workers are spawned, not forked: the batch runs inside the API process,
+    whose threads and locks a forked child would inherit mid-use. A spawned
+    worker starts with an empty concept cache, so warm it once here for the
+    prerequisite lookups of pack concepts.
+    """
+    db = SessionLocal()
+    try:
+        concept_catalog.warm(db)
+    finally:
+        db.close()
+
+
+def _plan_chunk(test_ids: List[uuid.UUID], now: datetime) -> List[Dict]:
+    """Entry point executed inside a worker process: plans for one chunk of students."""
+    db = SessionLocal()
+    try:
+        records = db.query(MasteryRecord).filter(MasteryRecord.test_id.in_(test_ids)).all()
+    finally:
+        db.close()
+
+    by_student: Dict[uuid.UUID, List[MasteryRecord]] = {}
+    for record in records:
+        by_student.setdefault(record.test_id, []).append(record)
+
+    return [
+        PracticePlanService.plan_row(test_id, student_records, now)
+        for test_id, student_records in by_student.items()
+    ]
+
+
+class PracticePlanService:
+    """Service for precomputed daily practice plans."""
+
+    @staticmethod
+    def compact(queue: List[Dict]) -> List[List]:
+        """Queue items as [concept_id, section, difficulty_score, current_mastery]."""
+        return [
+            [
+                item["concept_id"],
+                _SECTION_BY_PRIORITY[item["priority"]],
+                round(item["difficulty_score"], 3),
+                round(item["current_mastery"], 3)
+            ]
+            for item in queue
+        ]
+
+    @staticmethod
+    def expand(items: List[List]) -> List[Dict]:
+        """Inverse of compact(): the same dicts generate_practice_session returns."""
+        queue = []
+        for concept_id, section, difficulty, mastery in items:
+            reason, priority = PersonalizedPracticeQueue.SECTIONS[section]
+            queue.append({
+                "concept_id": concept_id,
+                "difficulty_score": difficulty,
+                "reason": reason,
+                "current_mastery": mastery,
+                "priority": priority
+            })
+        return queue
+
+    @staticmethod
+    def plan_row(test_id: uuid.UUID, records: List[MasteryRecord], now: datetime) -> Dict:
+        """practice_plan row for one student's mastery records."""
+        queue = PersonalizedPracticeQueue.build_queue(
+            records,
+            target_questions=settings.PRACTICE_PLAN_TARGET_QUESTIONS,
+            now=now
+        )
+        return {
+            "test_id": test_id,
+            "items": PracticePlanService.compact(queue),
+            "computed_at": now,
+            "source_updated_at": max(
+                (r.last_practiced for r in records if r.last_practiced), default=None
+            )
+        }
+
+    @staticmethod
+    def _save_rows(db: Session, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        db.execute(delete(PracticePlan).where(
+            PracticePlan.test_id.in_([row["test_id"] for row in rows])
+        ))
+        db.execute(insert(PracticePlan), rows)
+        db.commit()
+
+    @staticmethod
+    def active_test_ids(db: Session, since: datetime) -> List[uuid.UUID]:
+        """Students who practiced since the given time."""
+        return list(db.execute(
+            select(MasteryRecord.test_id)
+            .where(MasteryRecord.last_practiced >= since)
+            .distinct()
+        ).scalars())
+
+    @staticmethod
+    def _chunks(items: List, size: int) -> Iterator[List]:
+        for start in range(0, len(items), size):
+            yield items[start:start + size]
+
+    @staticmethod
+    def run_batch(
+        db: Session,
+        now: Optional[datetime] = None,
+        workers: Optional[int] = None,
+        chunk_size: Optional[int] = None
+    ) -> Dict:
+        """
+        Precompute plans for every active student.
+
+        Args:
+            db: Database session (used by this process to write the plans)
+            now: Time the plans are scored at (defaults to current time)
+            workers: Worker processes (PRACTICE_PLAN_WORKERS; 1 runs inline)
+            chunk_size: Students per worker task (PRACTICE_PLAN_CHUNK_SIZE)
+
+        Returns:
+            Counts and timing for the run
+        """
+        started = time.perf_counter()
+        now = now or datetime.now()
+        workers = workers or settings.PRACTICE_PLAN_WORKERS
+        chunk_size = chunk_size or settings.PRACTICE_PLAN_CHUNK_SIZE
+
+        test_ids = PracticePlanService.active_test_ids(
+            db, now - timedelta(days=settings.PRACTICE_PLAN_ACTIVE_DAYS)
+        )
+        chunks = list(PracticePlanService._chunks(test_ids, chunk_size))
+
+        planned = 0
+        if workers <= 1 or len(chunks) <= 1:
+            results = map(_plan_chunk, chunks, repeat(now))
+            for rows in results:
+                PracticePlanService._save_rows(db, rows)
+                planned += len(rows)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(chunks)),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            ) as pool:
+                # Plans are written here as chunks finish, so workers never
+                # contend for write locks
+                for rows in pool.map(_plan_chunk, chunks, repeat(now)):
+                    PracticePlanService._save_rows(db, rows)
+                    planned += len(rows)
+
+        return {
+            "students_planned": planned,
+            "chunks": len(chunks),
+            "seconds": round(time.perf_counter() - started, 3)
+        }
+
+    @staticmethod
+    def get_plan(
+        db: Session,
+        test_id: uuid.UUID,
+        now: Optional[datetime] = None
+    ) -> Dict:
+        """
+        Today's plan for a student: the precomputed one if it is from today
+        and the student has not practiced since, otherwise computed now (and
+        stored, so the next read is served from the table).
+        """
+        now = now or datetime.now()
+        last_update = (
+            select(func.max(MasteryRecord.last_practiced))
+            .where(MasteryRecord.test_id == test_id)
+            .scalar_subquery()
+        )
+        row = db.execute(
+            select(PracticePlan, last_update).where(PracticePlan.test_id == test_id)
+        ).first()
+
+        if row is not None:
+            plan, last_practiced = row
+            if plan.computed_at.date() == now.date() and (
+                last_practiced is None or last_practiced <= plan.computed_at
+            ):
+                return {
+                    "practice_queue": PracticePlanService.expand(plan.items),
+                    "computed_at": plan.computed_at.isoformat(),
+                    "source": "precomputed"
+                }
+
+        records = db.query(MasteryRecord).filter(MasteryRecord.test_id == test_id).all()
+        if not records:
+            queue = PersonalizedPracticeQueue.generate_practice_session(db, test_id)
+            return {"practice_queue": queue, "computed_at": now.isoformat(), "source": "on_demand"}
+
+        plan_row = PracticePlanService.plan_row(test_id, records, now)
+        PracticePlanService._save_rows(db, [plan_row])
+        return {
+            "practice_queue": PracticePlanService.expand(plan_row["items"]),
+            "computed_at": now.isoformat(),
+            "source": "on_demand"
+        }
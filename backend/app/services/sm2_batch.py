@@ -0,0 +1,296 @@
+"""
+Vectorized SM-2 replay and parameter-tuning simulator.
+
+MasteryService applies SM-2 one answer at a time. For offline work (tuning
+thresholds, re-scoring a cohort) the same update is replayed over whole arrays:
+sequences are sorted longest-first so the sequences still active at step k
+are always a prefix, and each step updates that prefix with a handful of
+NumPy operations. Results match the scalar implementation exactly.
+"""
+from dataclasses import dataclass, asdict, replace
+from itertools import product
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models.response_event import ResponseEvent
+from app.services.mastery_service import MasteryService
+import uuid
+
+
+@dataclass(frozen=True)
+class SM2Params:
+    """Tunable scheduler parameters. Defaults reproduce MasteryService."""
+    initial_ease_factor: float = 2.5
+    min_ease_factor: float = 1.3
+    pass_quality: int = 3  # quality below this resets repetitions
+    max_interval_days: int = MasteryService.MAX_INTERVAL_DAYS
+    mastery_threshold: float = MasteryService.MASTERY_THRESHOLD
+    expected_time_seconds: float = 60.0
+    fast_ratio: float = 0.5  # time ratio below this scores 5
+    normal_ratio: float = 1.0  # time ratio below this scores 4
+
+
+@dataclass
+class ResponseArrays:
+    """Flat event arrays, grouped by sequence and in answer order within each."""
+    sequence_ids: np.ndarray  # int, one id per (student, concept)
+    is_correct: np.ndarray  # bool
+    time_taken_seconds: np.ndarray  # float
+    had_hint: np.ndarray  # bool
+
+    def __len__(self) -> int:
+        return len(self.sequence_ids)
+
+
+def quality_scores(
+    is_correct: np.ndarray,
+    time_taken_seconds: np.ndarray,
+    had_hint: np.ndarray,
+    params: SM2Params = SM2Params()
+) -> np.ndarray:
+    """Vectorized MasteryService.calculate_quality_score."""
+    expected = params.expected_time_seconds
+    time_ratio = time_taken_seconds / expected
+
+    correct_quality = np.where(
+        had_hint, 3,
+        np.where(time_ratio < params.fast_ratio, 5,
+                 np.where(time_ratio < params.normal_ratio, 4, 3))
+    )
+    wrong_quality = np.where(time_taken_seconds > expected * 2, 0, 1)
+
+    return np.where(is_correct, correct_quality, wrong_quality).astype(np.int64)
+
+
+def replay(events: ResponseArrays, params: SM2Params = SM2Params()) -> Dict[str, np.ndarray]:
+    """
+    Replay SM-2 and mastery updates over every sequence at once.
+
+    Returns:
+        Final state per sequence, keyed like MasteryRecord columns, plus
+        "sequence_ids" giving the sequence each row belongs to
+    """
+    seq_ids = np.asarray(events.sequence_ids)
+    unique_ids, starts, counts = np.unique(seq_ids, return_index=True, return_counts=True)
+
+    # Longest sequences first, so the active set at each step is a prefix
+    order = np.argsort(-counts, kind="stable")
+    unique_ids, starts, counts = unique_ids[order], starts[order], counts[order]
+    n = len(unique_ids)
+
+    quality = quality_scores(
+        np.asarray(events.is_correct, dtype=bool),
+        np.asarray(events.time_taken_seconds, dtype=np.float64),
+        np.asarray(events.had_hint, dtype=bool),
+        params
+    )
+    correct_flags = np.asarray(events.is_correct, dtype=bool)
+    times = np.asarray(events.time_taken_seconds, dtype=np.float64)
+
+    ease = np.full(n, params.initial_ease_factor, dtype=np.float64)
+    interval = np.ones(n, dtype=np.int64)
+    reps = np.zeros(n, dtype=np.int64)
+    attempted = np.zeros(n, dtype=np.int64)
+    correct = np.zeros(n, dtype=np.int64)
+    streak = np.zeros(n, dtype=np.int64)
+    streak_best = np.zeros(n, dtype=np.int64)
+    avg_time = np.zeros(n, dtype=np.float64)
+    has_avg = np.zeros(n, dtype=bool)
+
+    # active[k] = number of sequences with more than k events
+    max_len = int(counts[0]) if n else 0
+    active_counts = np.searchsorted(-counts, -np.arange(max_len), side="left") if n else []
+
+    for step in range(max_len):
+        a = int(active_counts[step])
+        idx = starts[:a] + step
+        q = quality[idx]
+        ok = correct_flags[idx]
+        t = times[idx]
+
+        # Counts and streaks
+        attempted[:a] += 1
+        correct[:a] += ok
+        streak[:a] = np.where(ok, streak[:a] + 1, 0)
+        np.maximum(streak_best[:a], streak[:a], out=streak_best[:a])
+
+        # SM-2 (same operation order as the scalar version, for exact floats)
+        miss = 5 - q
+        new_ease = ease[:a] + (0.1 - miss * (0.08 + miss * 0.02))
+        new_ease = np.maximum(params.min_ease_factor, new_ease)
+
+        passed = q >= params.pass_quality
+        new_reps = np.where(passed, reps[:a] + 1, 0)
+        grown = np.minimum(params.max_interval_days, (interval[:a] * new_ease).astype(np.int64))
+        new_interval = np.where(
+            ~passed | (new_reps == 1), 1,
+            np.where(new_reps == 2, 6, grown)
+        )
+        ease[:a], reps[:a], interval[:a] = new_ease, new_reps, new_interval
+
+        # Learning velocity (EMA of time to correct)
+        ema = np.where(has_avg[:a], 0.7 * avg_time[:a] + 0.3 * t, t)
+        avg_time[:a] = np.where(ok, ema, avg_time[:a])
+        has_avg[:a] |= ok
+
+    level = np.minimum(1.0, correct / np.maximum(attempted, 1))
+
+    return {
+        "sequence_ids": unique_ids,
+        "questions_attempted": attempted,
+        "questions_correct": correct,
+        "current_level": level,
+        "is_mastered": level >= params.mastery_threshold,
+        "streak_current": streak,
+        "streak_best": streak_best,
+        "ease_factor": ease,
+        "interval_days": interval,
+        "repetitions": reps,
+        "avg_time_to_correct": np.where(has_avg, avg_time, np.nan),
+    }
+
+
+def load_response_arrays(
+    db: Session,
+    test_id: Optional[uuid.UUID] = None
+) -> Tuple[ResponseArrays, List[Tuple[uuid.UUID, str]]]:
+    """
+    Load the recorded response log as arrays.
+
+    Returns:
+        (arrays, keys) where keys[i] is the (test_id, concept_id) of sequence i
+    """
+    stmt = select(
+        ResponseEvent.test_id,
+        ResponseEvent.concept_id,
+        ResponseEvent.is_correct,
+        ResponseEvent.time_taken_seconds,
+        ResponseEvent.had_hint,
+    ).order_by(ResponseEvent.test_id, ResponseEvent.concept_id, ResponseEvent.id)
+    if test_id is not None:
+        stmt = stmt.where(ResponseEvent.test_id == test_id)
+
+    keys: List[Tuple[uuid.UUID, str]] = []
+    sequence_ids, is_correct, time_taken, had_hint = [], [], [], []
+    for ev_test_id, concept_id, ok, t, hint in db.execute(stmt):
+        key = (ev_test_id, concept_id)
+        if not keys or keys[-1] != key:
+            keys.append(key)
+        sequence_ids.append(len(keys) - 1)
+        is_correct.append(ok)
+        time_taken.append(t)
+        had_hint.append(hint)
+
+    arrays = ResponseArrays(
+        np.asarray(sequence_ids, dtype=np.int64),
+        np.asarray(is_correct, dtype=bool),
+        np.asarray(time_taken, dtype=np.float64),
+        np.asarray(had_hint, dtype=bool)
+    )
+    return arrays, keys
+
+
+def synthetic_cohort(
+    n_students: int,
+    n_concepts: int,
+    events_per_sequence: int,
+    seed: int = 0
+) -> ResponseArrays:
+    """
+    Generate a cohort whose accuracy improves with practice, for tuning runs
+    when no recorded log is at hand.
+    """
+    rng = np.random.default_rng(seed)
+    n_seq = n_students * n_concepts
+    n_events = n_seq * events_per_sequence
+
+    sequence_ids = np.repeat(np.arange(n_seq), events_per_sequence)
+    step = np.tile(np.arange(events_per_sequence), n_seq)
+
+    skill = rng.beta(2, 2, size=n_seq)[sequence_ids]
+    p_correct = 1 - (1 - skill) * np.exp(-step / 8)
+    is_correct = rng.random(n_events) < p_correct
+
+    time_taken = rng.lognormal(mean=np.log(45), sigma=0.5, size=n_events)
+    had_hint = rng.random(n_events) < 0.1
+
+    return ResponseArrays(sequence_ids, is_correct, time_taken, had_hint)
+
+
+def simulate(
+    events: ResponseArrays,
+    grid: Dict[str, Iterable],
+    base: SM2Params = SM2Params()
+) -> List[Dict]:
+    """
+    Sweep every combination of parameter values in grid over one cohort.
+
+    Args:
+        events: Recorded or synthetic response arrays
+        grid: SM2Params field name -> values to try, e.g.
+            {"mastery_threshold": [0.7, 0.8], "initial_ease_factor": [2.3, 2.5]}
+        base: Parameters for fields not in the grid
+
+    Returns:
+        One dict per combination with the parameters and cohort metrics
+    """
+    names = list(grid)
+    results = []
+    for values in product(*(grid[name] for name in names)):
+        params = replace(base, **dict(zip(names, values)))
+        state = replay(events, params)
+        results.append({
+            **asdict(params),
+            "mastered_rate": float(state["is_mastered"].mean()) if len(state["is_mastered"]) else 0.0,
+            "mean_interval_days": float(state["interval_days"].mean()) if len(state["interval_days"]) else 0.0,
+            "mean_ease_factor": float(state["ease_factor"].mean()) if len(state["ease_factor"]) else 0.0,
+            "mean_repetitions": float(state["repetitions"].mean()) if len(state["repetitions"]) else 0.0,
+        })
+    return results
+
+
+def check_scalar_equivalence(events: ResponseArrays, limit: Optional[int] = None) -> int:
+    """
+    Replay sequences one answer at a time through MasteryService.apply_answer
+    and assert the vectorized state matches exactly. replay() computes the
+    ratio mastery level, so level columns are only compared under that model.
+
+    Returns:
+        Number of sequences compared
+    """
+    from types import SimpleNamespace
+    from datetime import datetime
+
+    vector = replay(events)
+    row_of = {int(s): i for i, s in enumerate(vector["sequence_ids"])}
+
+    scalar: Dict[int, SimpleNamespace] = {}
+    now = datetime.now()
+    for seq, ok, t, hint in zip(events.sequence_ids, events.is_correct,
+                                events.time_taken_seconds, events.had_hint):
+        seq = int(seq)
+        if seq not in scalar:
+            if limit is not None and len(scalar) >= limit:
+                continue
+            scalar[seq] = SimpleNamespace(**MasteryService.initial_record_values(now))
+        MasteryService.apply_answer(scalar[seq], bool(ok), float(t), bool(hint), now=now)
+
+    columns = ["questions_attempted", "questions_correct", "streak_current", "streak_best",
+               "ease_factor", "interval_days", "repetitions"]
+    if settings.MASTERY_MODEL == "ratio":
+        columns += ["current_level", "is_mastered"]
+
+    for seq, state in scalar.items():
+        i = row_of[seq]
+        for column in columns:
+            expected = getattr(state, column)
+            actual = vector[column][i].item()
+            assert expected == actual, f"sequence {seq}: {column} {expected!r} != {actual!r}"
+        expected_avg = state.avg_time_to_correct
+        actual_avg = vector["avg_time_to_correct"][i].item()
+        assert (expected_avg is None and np.isnan(actual_avg)) or expected_avg == actual_avg, \
+            f"sequence {seq}: avg_time_to_correct {expected_avg!r} != {actual_avg!r}"
+
+    return len(scalar)
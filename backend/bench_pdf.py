@@ -0,0 +1,51 @@
+"""
+Microbenchmark: cold vs warm PDF rendering.
+
+cold - a fresh PDFService per render (the old per-request behaviour)
+warm - the precompiled, process-wide service from get_pdf_service()
+
+Usage: python bench_pdf.py [iterations]
+"""
+import sys
+import time
+from app.models.test import SubjectEnum
+from app.services.pdf_service import PDFService, get_pdf_service
+
+TEST_DATA = {
+    "title": "Benchmark Test",
+    "grade_level": 5,
+    "subject": SubjectEnum.MATH,
+    "standard_focus": "Fractions"
+}
+QUESTIONS = [
+    {
+        "sequence": i + 1,
+        "question_text": f"What is {i} + {i}?",
+        "options": {"A": str(i), "B": str(2 * i), "C": str(3 * i), "D": str(4 * i)},
+        "correct_answer": "B",
+        "cognitive_level": "apply"
+    }
+    for i in range(20)
+]
+
+
+def _time(render, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        render()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def main(iterations: int = 10):
+    cold = _time(lambda: PDFService().render_pdf_bytes(TEST_DATA, QUESTIONS), iterations)
+
+    service = get_pdf_service()
+    warm = _time(lambda: service.render_pdf_bytes(TEST_DATA, QUESTIONS), iterations)
+
+    print(f"cold: {cold:8.2f} ms/render")
+    print(f"warm: {warm:8.2f} ms/render")
+    print(f"speedup: {cold / warm:.2f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,106 @@
+"""
+Concurrency check for attempt counters: many threads start attempts for the
+same (test, session) at once; exactly max_attempts must succeed, with attempt
+numbers 1..max_attempts and no duplicates. Exits non-zero on a violation.
+
+Usage: python check_attempt_counter.py [database_url] [threads] [max_attempts] [rounds]
+
+Defaults to a throwaway SQLite file; pass a PostgreSQL URL to check row
+locking there (tables are created if missing, the test rows are removed).
+"""
+import os
+import sys
+import tempfile
+import threading
+import uuid
+from collections import Counter
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+from app.models.base_class import Base
+from app.models.test import Test
+from app.models.exam_attempt import AttemptCounter, ExamAttempt
+from app.services.access_code_service import AccessCodeService
+
+
+def run_round(Session, max_attempts: int, threads: int) -> list:
+    db = Session()
+    code = uuid.uuid4().hex[:8].upper()  # access_code is unique
+    test = Test(title="attempt counter check", access_code=code, max_attempts=max_attempts, is_active=True)
+    db.add(test)
+    db.commit()
+    test_id = test.id
+    db.close()
+
+    session_hash = uuid.uuid4().hex
+    barrier = threading.Barrier(threads)
+    numbers, errors = [], []
+    lock = threading.Lock()
+
+    def worker():
+        db = Session()
+        try:
+            barrier.wait()
+            attempt = AccessCodeService.start_exam_attempt(db, test_id, code, session_hash)
+            if attempt is not None:
+                with lock:
+                    numbers.append(attempt.attempt_number)
+        except Exception as e:  # Any error is a failure of the check
+            with lock:
+                errors.append(repr(e))
+        finally:
+            db.close()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+
+    db = Session()
+    stored = sorted(
+        n for (n,) in db.query(ExamAttempt.attempt_number).filter(ExamAttempt.test_id == test_id)
+    )
+    counter = AccessCodeService.get_attempts_used(db, test_id, session_hash)
+    db.execute(delete(ExamAttempt).where(ExamAttempt.test_id == test_id))
+    db.execute(delete(AttemptCounter).where(AttemptCounter.test_id == test_id))
+    db.execute(delete(Test).where(Test.id == test_id))
+    db.commit()
+    db.close()
+
+    problems = list(errors)
+    expected = list(range(1, max_attempts + 1))
+    if sorted(numbers) != expected:
+        duplicates = [n for n, c in Counter(numbers).items() if c > 1]
+        problems.append(f"granted {sorted(numbers)}, expected {expected} (duplicates: {duplicates})")
+    if stored != expected:
+        problems.append(f"stored attempt numbers {stored}, expected {expected}")
+    if counter != max_attempts:
+        problems.append(f"counter is {counter}, expected {max_attempts}")
+    return problems
+
+
+def main(database_url: str = None, threads: int = 32, max_attempts: int = 3, rounds: int = 20):
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(), "attempt_counter.db")
+        database_url = f"sqlite:///{path}"
+    connect_args = {"check_same_thread": False, "timeout": 30} if database_url.startswith("sqlite") else {}
+    engine = create_engine(database_url, connect_args=connect_args, pool_size=threads, max_overflow=0)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    failed = 0
+    for i in range(rounds):
+        problems = run_round(Session, max_attempts, threads)
+        if problems:
+            failed += 1
+            print(f"round {i + 1}: FAIL")
+            for problem in problems:
+                print(f"  {problem}")
+    print(f"{rounds - failed}/{rounds} rounds ok ({threads} threads, max_attempts={max_attempts}, {engine.dialect.name})")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    url = args[0] if args else None
+    sys.exit(main(url, *(int(a) for a in args[1:4])))
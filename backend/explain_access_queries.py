@@ -0,0 +1,173 @@
+"""
+Query-plan check for the access-control queries: runs the access code
+service and admin endpoints against a seeded database, captures every SQL
+statement they issue, EXPLAINs each one and fails if any of them scans
+exam_attempt, attempt_request, attempt_counter or test in full.
+
+Usage: python explain_access_queries.py [database_url] [-v]
+
+Defaults to a throwaway SQLite file. A PostgreSQL URL should point at a
+scratch database: tables are created from the models and seeded. There,
+sequential scans are disabled for the EXPLAIN so the small seeded tables
+still show whether an index can serve each query. -v prints every plan.
+"""
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+import uuid
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+import app.models  # noqa: F401 (registers every table for create_all)
+from app.api.v1.access_control import approve_attempt_request, get_pending_requests
+from app.models.base_class import Base
+from app.models.test import Test
+from app.services.access_code_service import AccessCodeService, invalidate_test_gate
+
+WATCHED_TABLES = {"exam_attempt", "attempt_request", "attempt_counter", "test"}
+SEED_TESTS = 20
+SEED_SESSIONS = 10  # per test, each with two attempts
+SEED_REQUESTS = 50  # per status
+
+
+def seed(db) -> list:
+    """Tests with attempts and requests, so the tables aren't trivially empty."""
+    tests = []
+    for _ in range(SEED_TESTS):
+        code = uuid.uuid4().hex[:8].upper()
+        test = Test(title="plan check", access_code=code, max_attempts=3, is_active=True)
+        db.add(test)
+        db.flush()
+        tests.append((test.id, code))
+    db.commit()
+    for test_id, code in tests:
+        for s in range(SEED_SESSIONS):
+            session_hash = f"seed-{s}"
+            for _ in range(2):
+                attempt = AccessCodeService.start_exam_attempt(db, test_id, code, session_hash)
+                AccessCodeService.complete_exam_attempt(db, attempt.id, {}, 0.5, 60)
+    for i in range(2 * SEED_REQUESTS):
+        test_id, code = tests[i % len(tests)]
+        request = AccessCodeService.request_additional_attempts(db, test_id, code, f"seed-{i}", 5)
+        if i % 2:
+            request.status = "approved"
+    db.commit()
+    return tests
+
+
+@contextmanager
+def capture(engine, statements: list):
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE"):
+            statements.append((statement, parameters[0] if executemany else parameters))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def exercise(Session, tests: list) -> None:
+    """The query shapes of access_code_service.py and access_control.py."""
+    test_id, code = tests[0]
+    session_hash = "plan-check"
+    db = Session()
+    try:
+        invalidate_test_gate()
+        AccessCodeService.check_access(db, test_id, code, session_hash)  # gate + aggregate
+        AccessCodeService.check_access(db, test_id, code, session_hash)  # aggregate only
+        attempt = AccessCodeService.start_exam_attempt(db, test_id, code, session_hash)
+        AccessCodeService.complete_exam_attempt(db, attempt.id, {}, 0.9, 60)
+        AccessCodeService.get_attempt_summary(db, test_id, session_hash)
+        request = AccessCodeService.request_additional_attempts(db, test_id, code, session_hash, 5)
+        asyncio.run(get_pending_requests(db=db))
+        asyncio.run(approve_attempt_request(str(request.id), db=db))
+    finally:
+        db.close()
+
+
+def partial_indexes() -> set:
+    return {
+        index.name
+        for table in Base.metadata.tables.values()
+        for index in table.indexes
+        if index.dialect_options["sqlite"]["where"] is not None
+    }
+
+
+def explain(conn, statement: str, parameters):
+    """
+    Full scans in the plan as (table, plan detail) pairs, and the raw plan.
+    Walking a whole partial index (e.g. only the pending requests) is the
+    point of having one and doesn't count.
+    """
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+        scans = []
+        for row in rows:
+            match = re.match(r"SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?", row[3])
+            if match and match.group(1) in WATCHED_TABLES and match.group(2) not in partial_indexes():
+                scans.append((match.group(1), row[3]))
+        return scans, "\n".join(row[3] for row in rows)
+
+    if conn.dialect.name == "postgresql":
+        plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        scans, stack = [], [plan[0]["Plan"]]
+        while stack:
+            node = stack.pop()
+            if node["Node Type"] == "Seq Scan" and node.get("Relation Name") in WATCHED_TABLES:
+                scans.append((node["Relation Name"], f"Seq Scan on {node['Relation Name']}"))
+            stack.extend(node.get("Plans", []))
+        return scans, json.dumps(plan, indent=2)
+
+    raise NotImplementedError(f"No EXPLAIN support for {conn.dialect.name}")
+
+
+def main(database_url: str = None, verbose: bool = False) -> int:
+    if database_url is None:
+        path = os.path.join(tempfile.mkdtemp(), "access_plans.db")
+        database_url = f"sqlite:///{path}"
+    connect_args = {"check_same_thread": False} if database_url.startswith("sqlite") else {}
+    engine = create_engine(database_url, connect_args=connect_args)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    db = Session()
+    tests = seed(db)
+    db.close()
+
+    statements = []
+    with capture(engine, statements):
+        exercise(Session, tests)
+
+    failures = 0
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        unique = {}
+        for statement, parameters in statements:
+            unique.setdefault(statement, parameters)
+        for statement, parameters in unique.items():
+            scans, plan = explain(conn, statement, parameters)
+            sql = " ".join(statement.split())
+            if scans:
+                failures += 1
+                print(f"FULL SCAN ({', '.join(table for table, _ in scans)}): {sql}")
+                print("  " + plan.replace("\n", "\n  "))
+            elif verbose:
+                print(f"ok: {sql}\n  " + plan.replace("\n", "\n  "))
+
+    print(f"{len(unique)} statements checked on {engine.dialect.name}: "
+          f"{failures} full scan{'s' if failures != 1 else ''}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if a != "-v"]
+    sys.exit(main(args[0] if args else None, verbose="-v" in sys.argv[1:]))
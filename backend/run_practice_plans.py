@@ -0,0 +1,25 @@
+"""
+Precompute daily practice plans for all active students.
+
+The API schedules this itself at PRACTICE_PLAN_BATCH_HOUR; with several API
+processes, set PRACTICE_PLAN_BATCH_ENABLED=false and run it from cron instead.
+
+Usage: python run_practice_plans.py [workers] [chunk_size]
+"""
+import sys
+from app.db.session import SessionLocal
+from app.services.practice_plan import PracticePlanService
+
+
+def main(workers: int = None, chunk_size: int = None):
+    db = SessionLocal()
+    try:
+        result = PracticePlanService.run_batch(db, workers=workers, chunk_size=chunk_size)
+    finally:
+        db.close()
+    print(f"planned {result['students_planned']:,} students "
+          f"in {result['chunks']} chunks ({result['seconds']}s)")
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))